@@ -0,0 +1,361 @@
+import asyncio
+import time
+from collections import deque, namedtuple
+from compile_message import TOKEN_PATTERN, SoundRef, compile_message
+from fix_numbers import NUMBER_PATTERN, number_to_words
+from logger import logger
+from metrics import metrics
+from scheduler import FairScheduler, parse_lane_weights
+
+
+POLICIES = ('reject', 'truncate', 'drop_oldest')
+
+# Effect ID -> (duration factor, seconds added) per repetition
+EFFECT_DURATION = {
+    9: (1.0, 1.0),  # ghost pads half a second on both ends
+    11: (2.0, 0.0),
+    12: (1 / 1.5, 0.0),
+}
+
+# Effect ID -> seconds of rendering per second of audio per repetition, measured with the NumPy backend
+EFFECT_RENDER_SECONDS = {
+    1: 0.003, 2: 0.012, 3: 0.003, 4: 0.006, 5: 0.009, 6: 0.004,
+    7: 0.003, 8: 0.0, 9: 0.007, 10: 0.001, 11: 0.011, 12: 0.003,
+}
+
+# Weight of the newest observation in the learned speech rate
+SPEECH_RATE_SMOOTHING = 0.1
+
+# Truncated messages shorter than this are rejected instead
+MIN_TRUNCATED_AUDIO = 2.0
+
+
+class CostEstimate(namedtuple('CostEstimate', 'audio_seconds render_seconds')):
+    """
+    Predicted cost of a message - how long it plays and how much effect rendering it needs.
+    """
+    __slots__ = ()
+
+
+def spoken_length(text, max_digits):
+    """
+    Get the length of a text as sent to TTS, with numbers written out in words.
+
+    Args:
+        text (str): Text of a message
+        max_digits (int): Longer numbers are read digit by digit
+
+    Returns:
+        int: Number of characters
+    """
+    length = len(text)
+    for match in NUMBER_PATTERN.finditer(text):
+        length += len(number_to_words(match.group(), max_digits)) - len(match.group())
+    return length
+
+
+def estimate_plan(plan, speech_seconds_per_char, max_digits=15):
+    """
+    Estimate the cost of a compiled message without rendering it.
+
+    Text is timed by its spoken length, sounds by their duration, and effects
+    stretch or pad the audio of their segment.
+
+    Args:
+        plan (MessagePlan): The compiled message
+        speech_seconds_per_char (float): Seconds of speech per character of text
+        max_digits (int): Longer numbers are read digit by digit
+
+    Returns:
+        CostEstimate: The estimate
+    """
+    audio_seconds = 0.0
+    render_seconds = 0.0
+    for segment in plan.segments:
+        seconds = 0.0
+        for item in segment.items:
+            if isinstance(item, SoundRef):
+                seconds += item.info.duration
+            else:
+                seconds += spoken_length(item.text, max_digits) * speech_seconds_per_char
+        for effect_id, count in segment.effects.items():
+            factor, padding = EFFECT_DURATION.get(effect_id, (1.0, 0.0))
+            for _ in range(count):
+                render_seconds += seconds * EFFECT_RENDER_SECONDS.get(effect_id, 0.0)
+                seconds = seconds * factor + padding
+        audio_seconds += seconds
+    return CostEstimate(audio_seconds, render_seconds)
+
+
+class AdmissionQueue(asyncio.Queue):
+    """
+    Sound queue with admission control and fair scheduling.
+
+    Every message is costed before it is queued, and the queue tracks the audio
+    waiting to be played - queued messages and the ones being rendered or played.
+    A message that would push the backlog over `max_queued_audio`, or would start
+    later than `max_queue_latency`, is handled by the admission policy:
+    - reject: the message is not queued
+    - truncate: the message is cut to fit the remaining audio budget
+    - drop_oldest: the oldest waiting messages are dropped to make room
+
+    The speech rate used for estimates is learned from synthesized audio.
+
+    Admitted messages are served by a FairScheduler - weighted priority lanes,
+    and equal air time for every sender within a lane. With a journal, they are
+    recorded until `finish` is called for them, so they survive a crash.
+    """
+
+    def __init__(self, sounds, cfg, journal=None):
+        """
+        Initialize the queue.
+
+        Args:
+            sounds (dict): Available sounds, name -> SoundInfo
+            cfg (Config): Configuration
+            journal (Journal): Journal of accepted messages, None to keep them in memory only
+        """
+        self.lane_weights = parse_lane_weights(cfg.tts.lane_weights)
+        super().__init__()
+        if cfg.tts.admission_policy not in POLICIES:
+            raise ValueError(f'Unknown admission policy: {cfg.tts.admission_policy}, expected one of {", ".join(POLICIES)}')
+
+        self.sounds = sounds
+        self.sound_cap = cfg.tts.sound_cap
+        self.max_effect_repetitions = cfg.tts.max_effect_repetitions
+        self.max_number_digits = cfg.tts.max_number_digits
+        self.policy = cfg.tts.admission_policy
+        self.max_queued_audio = cfg.tts.max_queued_audio
+        self.max_queue_latency = cfg.tts.max_queue_latency
+        self.speech_seconds_per_char = cfg.tts.speech_seconds_per_char
+        self.journal = journal
+
+        # Totals of the messages waiting in the queue
+        self.queued_audio = 0.0
+        self.queued_render = 0.0
+        # Messages taken from the queue and not finished yet, in the order they were taken
+        self.in_flight = deque()
+        self.in_flight_audio = 0.0
+        self.in_flight_render = 0.0
+
+        self.outcomes = dict.fromkeys(('admitted', 'rejected', 'truncated', 'dropped', 'expired'), 0)
+
+        metrics.add_listener(self._learn_speech_rate)
+        metrics.gauge('tts_queue_predicted_wait_seconds', self.predicted_wait)
+        metrics.gauge('tts_queued_audio_seconds', lambda: self.queued_audio + self.in_flight_audio)
+        for outcome in self.outcomes:
+            metrics.gauge('tts_admission_messages', lambda outcome=outcome: self.outcomes[outcome], outcome=outcome)
+        for lane in self._queue.lanes.values():
+            metrics.gauge('tts_lane_queued_messages', lambda lane=lane: lane.size, lane=lane.name)
+
+    def _learn_speech_rate(self, name, value, labels):
+        if name == 'tts_speech_seconds_per_char':
+            self.speech_seconds_per_char += SPEECH_RATE_SMOOTHING * (value - self.speech_seconds_per_char)
+
+    def estimate(self, text):
+        """
+        Estimate the cost of a message.
+
+        Args:
+            text (str): The message
+
+        Returns:
+            CostEstimate: The estimate
+        """
+        # The message is compiled again for rendering, which reports its problems
+        plan = compile_message(text, self.sounds, self.sound_cap, self.max_effect_repetitions, warn=False)
+        return estimate_plan(plan, self.speech_seconds_per_char, self.max_number_digits)
+
+    def predicted_wait(self):
+        """
+        Predict how long a message queued now waits before it starts playing.
+
+        Rendering runs alongside playback, so the wait is set by the slower of the two.
+
+        Returns:
+            float: Seconds
+        """
+        return max(self.queued_audio + self.in_flight_audio, self.queued_render + self.in_flight_render)
+
+    def _fits(self, estimate, waiting=True):
+        """
+        Check if a message fits the limits.
+
+        Args:
+            estimate (CostEstimate): Cost of the message
+            waiting (bool): Count the messages waiting in the queue, False to check against in-flight ones only
+        """
+        backlog = self.in_flight_audio + (self.queued_audio if waiting else 0.0)
+        render_backlog = self.in_flight_render + (self.queued_render if waiting else 0.0)
+        if self.max_queued_audio and backlog + estimate.audio_seconds > self.max_queued_audio:
+            return False
+        if self.max_queue_latency and max(backlog, render_backlog) > self.max_queue_latency:
+            return False
+        return True
+
+    def _truncate(self, job):
+        """
+        Cut a message at the last token that keeps it within the audio budget.
+
+        Returns:
+            bool: True if a long enough part of the message fits
+        """
+        if self.max_queue_latency and self.predicted_wait() > self.max_queue_latency:
+            return False
+
+        ends = [match.end() for match in TOKEN_PATTERN.finditer(job.text)]
+        # Binary search for the longest prefix that fits - estimates grow with the prefix
+        low, high = 0, len(ends)
+        while low < high:
+            middle = (low + high) // 2
+            if self._fits(self.estimate(job.text[:ends[middle]])):
+                low = middle + 1
+            else:
+                high = middle
+        if low == 0:
+            return False
+
+        text = job.text[:ends[low - 1]]
+        estimate = self.estimate(text)
+        if estimate.audio_seconds < MIN_TRUNCATED_AUDIO:
+            return False
+
+        logger.warning(f'Queue is full, truncated message from {job.sender} to "{text}"')
+        job.text = text
+        job.estimate = estimate
+        self.outcomes['truncated'] += 1
+        return True
+
+    def _remove_queued(self, job):
+        if self._queue:
+            self.queued_audio -= job.estimate.audio_seconds
+            self.queued_render -= job.estimate.render_seconds
+        else:
+            # No rounding errors left behind once the queue is empty
+            self.queued_audio = self.queued_render = 0.0
+
+    def _drop_oldest(self):
+        """
+        Drop the oldest message waiting in the queue.
+        """
+        job = self._queue.pop_oldest()
+        self._remove_queued(job)
+        self.outcomes['dropped'] += 1
+        logger.warning(f'Queue is full, dropped message from {job.sender}: "{job.text}"')
+        # Dropped messages are never taken from the queue, so they are done now
+        if self.journal:
+            self.journal.done(job.journal_id)
+        self.task_done()
+
+    def admit(self, job):
+        """
+        Queue a message if the admission policy lets it in.
+
+        Args:
+            job (MessageJob): The message
+
+        Returns:
+            bool: True if the message, possibly truncated, was queued
+        """
+        job.estimate = self.estimate(job.text)
+
+        if not self._fits(job.estimate):
+            if self.policy == 'drop_oldest' and self._fits(job.estimate, waiting=False):
+                while self._queue and not self._fits(job.estimate):
+                    self._drop_oldest()
+            elif self.policy == 'truncate':
+                self._truncate(job)
+
+        if not self._fits(job.estimate):
+            self.outcomes['rejected'] += 1
+            logger.warning(
+                f'Queue is full, rejected message from {job.sender} '
+                f'({job.estimate.audio_seconds:.1f}s of audio, predicted wait {self.predicted_wait():.1f}s): "{job.text}"'
+            )
+            return False
+
+        if self.journal:
+            job.journal_id = self.journal.add(job)
+        self.put_nowait(job)
+        self.outcomes['admitted'] += 1
+        return True
+
+    def restore(self, job):
+        """
+        Queue a message replayed from the journal, bypassing admission - it was admitted before.
+
+        Args:
+            job (MessageJob): The message, with its journal ID set
+        """
+        self.put_nowait(job)
+
+    def expired(self, job):
+        """
+        Check if a message taken from the queue waited longer than `max_queue_latency`.
+
+        Estimates can be wrong, so this catches the messages they let through.
+
+        Args:
+            job (MessageJob): Message taken from the queue
+
+        Returns:
+            bool: True if the message should be skipped
+        """
+        if not self.max_queue_latency or time.perf_counter() - job.enqueued_at <= self.max_queue_latency:
+            return False
+        self.outcomes['expired'] += 1
+        logger.warning(f'Skipped message from {job.sender} after waiting over {self.max_queue_latency}s: "{job.text}"')
+        return True
+
+    def stats(self):
+        """
+        Get the backlog and admission counters.
+
+        Returns:
+            dict: Queued messages, backlog seconds, predicted wait, learned speech rate and outcome counts
+        """
+        return {
+            'queued': self.qsize(),
+            'in_flight': len(self.in_flight),
+            'queued_audio_seconds': round(self.queued_audio + self.in_flight_audio, 1),
+            'predicted_wait_seconds': round(self.predicted_wait(), 1),
+            'speech_seconds_per_char': round(self.speech_seconds_per_char, 4),
+            **self.outcomes,
+        }
+
+    # asyncio.Queue storage hooks, keeping the totals in step with the queue contents
+
+    def _init(self, maxsize):
+        self._queue = FairScheduler(self.lane_weights)
+
+    def _put(self, job):
+        if job.estimate is None:
+            job.estimate = self.estimate(job.text)
+        self._queue.push(job)
+        self.queued_audio += job.estimate.audio_seconds
+        self.queued_render += job.estimate.render_seconds
+
+    def _get(self):
+        job = self._queue.pop()
+        self._remove_queued(job)
+        self.in_flight.append(job)
+        self.in_flight_audio += job.estimate.audio_seconds
+        self.in_flight_render += job.estimate.render_seconds
+        return job
+
+    def finish(self, job):
+        """
+        Mark a message taken from the queue as played or skipped, in place of task_done.
+
+        Args:
+            job (MessageJob): The message
+        """
+        self.in_flight.remove(job)
+        if self.in_flight:
+            self.in_flight_audio -= job.estimate.audio_seconds
+            self.in_flight_render -= job.estimate.render_seconds
+        else:
+            self.in_flight_audio = self.in_flight_render = 0.0
+        if self.journal:
+            self.journal.done(job.journal_id)
+        self.task_done()
@@ -0,0 +1,212 @@
+import os
+import struct
+import wave
+import numpy as np
+from io import BytesIO
+
+
+# Sample format used for all audio processing - matches the TTS model and sounds
+SAMPLE_RATE = 22050
+CHANNELS = 1
+
+# WAV format tags - extensible files carry one of the others as their subformat
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def pcm_to_float(data, sample_width, channels=1, format_tag=WAVE_FORMAT_PCM):
+    """
+    Convert raw little-endian PCM to float32 samples in range [-1, 1].
+
+    Args:
+        data (bytes): Raw PCM frames
+        sample_width (int): Bytes per sample (1, 2, 3 or 4, 4 or 8 for float)
+        channels (int): Number of interleaved channels, mixed down to mono
+        format_tag (int): WAVE_FORMAT_PCM for integer samples, WAVE_FORMAT_IEEE_FLOAT for float
+
+    Returns:
+        np.ndarray: float32 mono samples
+    """
+    if format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        if sample_width not in (4, 8):
+            raise ValueError(f'Unsupported float sample width: {sample_width}')
+        samples = np.frombuffer(data, dtype=f'<f{sample_width}').astype(np.float32)
+    elif format_tag != WAVE_FORMAT_PCM:
+        raise ValueError(f'Unsupported WAV format: {format_tag:#06x}')
+    elif sample_width == 1:
+        samples = (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif sample_width == 2:
+        samples = np.frombuffer(data, dtype='<i2').astype(np.float32) / 32768
+    elif sample_width == 3:
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        samples = ((raw[:, 0] << 8 | raw[:, 1] << 16 | raw[:, 2] << 24) >> 8).astype(np.float32) / 8388608
+    elif sample_width == 4:
+        samples = np.frombuffer(data, dtype='<i4').astype(np.float32) / 2147483648
+    else:
+        raise ValueError(f'Unsupported sample width: {sample_width}')
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples
+
+
+def float_to_pcm16(samples):
+    """
+    Convert float32 samples to 16-bit PCM, clipping out of range values.
+
+    Args:
+        samples (np.ndarray): float32 samples
+
+    Returns:
+        np.ndarray: int16 samples
+    """
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2')
+
+
+def resample(samples, length):
+    """
+    Linear interpolation resampling to `length` samples.
+
+    Args:
+        samples (np.ndarray): float32 samples
+        length (int): Number of output samples
+
+    Returns:
+        np.ndarray: Resampled float32 samples
+    """
+    if not len(samples) or length == len(samples):
+        return samples
+    positions = np.linspace(0, len(samples) - 1, length, dtype=np.float32)
+    return np.interp(positions, np.arange(len(samples), dtype=np.float32), samples).astype(np.float32)
+
+
+def parse_wav_header(f):
+    """
+    Read the format and data location of a WAV file, leaving `f` at the start of the samples.
+
+    Args:
+        f: Binary file object positioned at the start of the file
+
+    Returns:
+        tuple: (format_tag, channels, sample_rate, bits_per_sample, data_offset, data_size),
+            with the subformat as format tag of WAVE_FORMAT_EXTENSIBLE files
+    """
+    riff, _, wave_id = struct.unpack('<4sI4s', f.read(12))
+    if riff != b'RIFF' or wave_id != b'WAVE':
+        raise ValueError('not a RIFF/WAVE file')
+
+    fmt = None
+    while True:
+        chunk_header = f.read(8)
+        if len(chunk_header) < 8:
+            raise ValueError('no data chunk')
+        chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+
+        if chunk_id == b'fmt ':
+            fmt_data = f.read(chunk_size + (chunk_size & 1))
+            fmt = struct.unpack_from('<HHIIHH', fmt_data)
+            if fmt[0] == WAVE_FORMAT_EXTENSIBLE:
+                # cbSize, valid bits and channel mask, then the subformat GUID starting with the format tag
+                if chunk_size < 40:
+                    raise ValueError('truncated WAVE_FORMAT_EXTENSIBLE fmt chunk')
+                fmt = struct.unpack_from('<H', fmt_data, 24) + fmt[1:]
+        elif chunk_id == b'data':
+            if fmt is None:
+                raise ValueError('data chunk before fmt chunk')
+            format_tag, channels, sample_rate, _, _, bits_per_sample = fmt
+            # Streamed WAVs, e.g. from TTS servers, may not know their data size
+            data_offset = f.tell()
+            data_size = min(chunk_size, f.seek(0, os.SEEK_END) - data_offset)
+            f.seek(data_offset)
+            return format_tag, channels, sample_rate, bits_per_sample, data_offset, data_size
+        else:
+            # Chunks are word aligned
+            f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+
+def read_wav(source):
+    """
+    Read a WAV file into float32 mono samples, decoding by its format tag.
+
+    Args:
+        source: Path or binary file object
+
+    Returns:
+        tuple: (np.ndarray samples, int sample rate)
+    """
+    if isinstance(source, (str, bytes, os.PathLike)):
+        with open(source, 'rb') as f:
+            return read_wav(f)
+    format_tag, channels, sample_rate, bits_per_sample, _, data_size = parse_wav_header(source)
+    data = source.read(data_size)
+    return pcm_to_float(data, bits_per_sample // 8, channels, format_tag), sample_rate
+
+
+def write_wav(destination, samples, sample_rate=SAMPLE_RATE):
+    """
+    Write float32 mono samples as a 16-bit WAV file.
+
+    Args:
+        destination: Path or binary file object
+        samples (np.ndarray): float32 samples
+        sample_rate (int): Sample rate in Hz
+    """
+    with wave.open(destination, 'wb') as wav:
+        wav.setnchannels(CHANNELS)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(float_to_pcm16(samples).tobytes())
+
+
+def decode_wav(data):
+    """
+    Decode WAV bytes in memory into samples in the processing format.
+
+    Args:
+        data (bytes): WAV file contents, e.g. a TTS server response
+
+    Returns:
+        np.ndarray: float32 mono samples at SAMPLE_RATE
+    """
+    samples, sample_rate = read_wav(BytesIO(data))
+    if sample_rate != SAMPLE_RATE:
+        samples = resample(samples, int(round(len(samples) * SAMPLE_RATE / sample_rate)))
+    return samples
+
+
+def _read_data(info):
+    with open(info.path, 'rb') as f:
+        f.seek(info.data_offset)
+        return f.read(info.data_size)
+
+
+def load_sound(info):
+    """
+    Read the samples of an indexed sound file with a single read of its data chunk.
+
+    Args:
+        info (SoundInfo): Header information from list_sounds
+
+    Returns:
+        np.ndarray: float32 mono samples
+    """
+    return pcm_to_float(_read_data(info), info.bits_per_sample // 8, info.channels, info.format_tag)
+
+
+def load_sound_pcm(info):
+    """
+    Read an indexed sound file as 16-bit PCM ready for the audio sink.
+
+    Sounds stored as 16-bit integer mono have their data chunk used as it is.
+
+    Args:
+        info (SoundInfo): Header information from list_sounds
+
+    Returns:
+        bytes: 16-bit mono PCM
+    """
+    data = _read_data(info)
+    if info.format_tag == WAVE_FORMAT_PCM and info.bits_per_sample == 16 and info.channels == 1:
+        return data[:len(data) & ~1]
+    return float_to_pcm16(pcm_to_float(data, info.bits_per_sample // 8, info.channels, info.format_tag)).tobytes()
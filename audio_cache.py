@@ -0,0 +1,256 @@
+import asyncio
+import hashlib
+import os
+from collections import OrderedDict
+from logger import logger
+
+
+class AudioCache:
+    """
+    Content-addressed audio cache with a memory tier and a disk tier.
+
+    Both tiers are bounded by size in bytes and evict least recently used entries.
+    The disk tier survives restarts - recency is persisted in file modification times.
+    Disk reads and writes run in an executor, only memory lookups happen on the event loop.
+    """
+
+    def __init__(self, directory, memory_bytes, disk_bytes, name='cache', generation=None, executor=None):
+        """
+        Initialize the cache and load the disk tier index.
+
+        Args:
+            directory (str): Directory of the disk tier
+            memory_bytes (int): Size limit of the memory tier, 0 disables it
+            disk_bytes (int): Size limit of the disk tier, 0 disables it
+            name (str): Name used in log messages
+            generation (str): Identity of the data the entries were made from, the disk
+                tier is wiped when it differs from the previous run
+            executor (Executor): Executor for disk reads and writes, the event loop's default if not given
+        """
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.name = name
+        self.generation = generation
+        self.executor = executor
+
+        self.memory = OrderedDict()  # key -> data, least recently used first
+        self.memory_size = 0
+        self.disk = OrderedDict()  # key -> size, least recently used first
+        self.disk_size = 0
+        self.writes = {}  # key -> task writing it to disk
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.disk_bytes:
+            self._load_index()
+
+    @staticmethod
+    def make_key(*parts):
+        """
+        Build a cache key from the identity of the cached audio.
+
+        Args:
+            *parts: Values identifying the audio, e.g. voice and normalized text
+
+        Returns:
+            str: Hex digest usable as a file name
+        """
+        return hashlib.sha256('\0'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.bin')
+
+    def _load_index(self):
+        """
+        Rebuild the disk tier index from the cache directory.
+        """
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+
+        if self.generation is not None:
+            self._check_generation()
+
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.bin'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self.disk[key] = size
+            self.disk_size += size
+
+        self._remove(self._evict_disk())
+        logger.info(f'Loaded {self.name} - {len(self.disk)} entries, {self.disk_size / 1024 / 1024:.1f} MB')
+
+    def _check_generation(self):
+        """
+        Remove all disk entries if they were made from different data than the current generation.
+        """
+        generation_path = os.path.join(self.directory, 'generation')
+        try:
+            with open(generation_path, 'r', encoding='utf-8') as f:
+                previous = f.read().strip()
+        except OSError:
+            previous = None
+
+        if previous == self.generation:
+            return
+
+        if previous is not None:
+            logger.info(f'{self.name} - source data changed, clearing cache')
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.bin'):
+                try:
+                    os.remove(entry.path)
+                except OSError as e:
+                    logger.warning(f'{self.name} - could not remove entry {entry.name}: {e}')
+
+        try:
+            with open(generation_path, 'w', encoding='utf-8') as f:
+                f.write(self.generation)
+        except OSError as e:
+            logger.warning(f'{self.name} - could not write generation: {e}')
+
+    async def get(self, key):
+        """
+        Look up cached audio.
+
+        Args:
+            key (str): Cache key from make_key
+
+        Returns:
+            bytes: Cached data, or None on a miss
+        """
+        data = self.memory.get(key)
+        if data is not None:
+            self.memory.move_to_end(key)
+            self.memory_hits += 1
+            return data
+
+        if key in self.disk:
+            try:
+                data = await asyncio.get_running_loop().run_in_executor(self.executor, self._read, key)
+            except OSError as e:
+                logger.warning(f'{self.name} - could not read entry {key}: {e}')
+                if key in self.disk:
+                    self.disk_size -= self.disk.pop(key)
+            else:
+                # Evicted while it was read - still a hit, but not brought back to the index
+                if key in self.disk:
+                    self.disk.move_to_end(key)
+                self.disk_hits += 1
+                self._put_memory(key, data)
+                return data
+
+        self.misses += 1
+        return None
+
+    def put(self, key, data):
+        """
+        Store audio in both tiers.
+
+        The memory tier is updated right away, the disk write happens in the background.
+
+        Args:
+            key (str): Cache key from make_key
+            data (bytes): Data to store
+        """
+        self._put_memory(key, data)
+
+        if not self.disk_bytes or key in self.disk or key in self.writes or len(data) > self.disk_bytes:
+            return
+
+        task = asyncio.get_running_loop().create_task(self._write(key, data))
+        self.writes[key] = task
+        task.add_done_callback(lambda _: self.writes.pop(key, None))
+
+    async def close(self):
+        """
+        Wait for pending disk writes.
+        """
+        if self.writes:
+            await asyncio.gather(*self.writes.values(), return_exceptions=True)
+
+    def _read(self, key):
+        with open(self._path(key), 'rb') as f:
+            data = f.read()
+        os.utime(self._path(key))
+        return data
+
+    def _write_file(self, key, data):
+        temp_path = f'{self._path(key)}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, self._path(key))
+
+    async def _write(self, key, data):
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.executor, self._write_file, key, data)
+        except OSError as e:
+            logger.warning(f'{self.name} - could not write entry {key}: {e}')
+            return
+
+        self.disk[key] = len(data)
+        self.disk_size += len(data)
+        evicted = self._evict_disk()
+        if evicted:
+            await loop.run_in_executor(self.executor, self._remove, evicted)
+
+    def _put_memory(self, key, data):
+        if not self.memory_bytes or len(data) > self.memory_bytes:
+            return
+
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return
+
+        self.memory[key] = data
+        self.memory_size += len(data)
+        while self.memory_size > self.memory_bytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_size -= len(evicted)
+
+    def _evict_disk(self):
+        """
+        Drop least recently used entries from the disk tier index until it fits.
+
+        Returns:
+            list: Keys of the evicted entries, whose files are removed by _remove
+        """
+        evicted = []
+        while self.disk_size > self.disk_bytes:
+            key, size = self.disk.popitem(last=False)
+            self.disk_size -= size
+            evicted.append(key)
+        return evicted
+
+    def _remove(self, keys):
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except OSError as e:
+                logger.warning(f'{self.name} - could not remove entry {key}: {e}')
+
+    def stats(self):
+        """
+        Get cache counters.
+
+        Returns:
+            dict: Hit/miss counters and tier sizes
+        """
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            'memory_entries': len(self.memory),
+            'memory_bytes': self.memory_size,
+            'disk_entries': len(self.disk),
+            'disk_bytes': self.disk_size,
+        }
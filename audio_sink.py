@@ -0,0 +1,295 @@
+import asyncio
+import os
+import time
+import uuid
+import wave
+from collections import deque
+from audio import CHANNELS, SAMPLE_RATE
+from logger import logger
+from platform import system
+from simpleSound import play
+
+
+# Raw PCM format accepted by all sinks - signed 16-bit little-endian
+SAMPLE_WIDTH = 2
+BYTES_PER_SECOND = SAMPLE_RATE * CHANNELS * SAMPLE_WIDTH
+
+# Chunk size of the sink buffer - 100 ms of audio
+CHUNK_BYTES = BYTES_PER_SECOND // 10
+
+# Marks the end of a clip in the buffer
+END_OF_CLIP = None
+
+
+class AudioSink:
+    """
+    Long-lived audio output accepting raw PCM chunks through a bounded buffer.
+
+    A background task moves chunks from the buffer to the backend, so producers
+    only wait when the buffer is full. Backends implement open, output and shutdown.
+    """
+
+    def __init__(self, buffer_seconds=2.0):
+        """
+        Initialize the sink.
+
+        Args:
+            buffer_seconds (float): Amount of audio buffered before writers have to wait
+        """
+        self.buffer = asyncio.Queue(maxsize=max(1, int(buffer_seconds * BYTES_PER_SECOND / CHUNK_BYTES)))
+        self.writer_task = None
+        self.bytes_written = 0
+        self.clip_callbacks = deque()  # Called as clips are handed to the backend, in order
+
+    async def start(self):
+        """
+        Open the backend and start moving buffered audio to it.
+        """
+        await self.open()
+        self.writer_task = asyncio.create_task(self._writer())
+
+    async def write(self, data):
+        """
+        Queue raw PCM for output, waiting while the buffer is full.
+
+        Args:
+            data (bytes): Signed 16-bit little-endian mono PCM at SAMPLE_RATE
+        """
+        for offset in range(0, len(data), CHUNK_BYTES):
+            await self.buffer.put(data[offset:offset + CHUNK_BYTES])
+
+    async def end_clip(self, on_done=None):
+        """
+        Mark the end of a clip. Backends that play whole clips play it now.
+
+        Args:
+            on_done (callable): Called once the whole clip was handed to the backend
+        """
+        self.clip_callbacks.append(on_done)
+        await self.buffer.put(END_OF_CLIP)
+
+    async def drain(self):
+        """
+        Wait until everything queued so far was handed to the backend.
+        """
+        await self.buffer.join()
+
+    async def close(self, timeout=5.0):
+        """
+        Flush the buffer and shut the backend down.
+
+        Args:
+            timeout (float): Seconds to wait for buffered audio to be handed to the backend
+        """
+        if self.writer_task:
+            # The writer was cancelled along with every other task on shutdown - nothing will drain the buffer
+            if not self.writer_task.done():
+                try:
+                    await asyncio.wait_for(self.drain(), timeout)
+                except asyncio.TimeoutError:
+                    logger.warning(f'{type(self).__name__} - dropping audio still buffered after {timeout:g}s')
+            self.writer_task.cancel()
+            await asyncio.gather(self.writer_task, return_exceptions=True)
+            self.writer_task = None
+        await self.shutdown()
+
+    async def _writer(self):
+        while True:
+            chunk = await self.buffer.get()
+            try:
+                if chunk is END_OF_CLIP:
+                    await self.clip_done()
+                    on_done = self.clip_callbacks.popleft()
+                    if on_done:
+                        on_done()
+                else:
+                    await self.output(chunk)
+                    self.bytes_written += len(chunk)
+            except Exception as e:
+                logger.error(f'{type(self).__name__} - error writing audio: {e}')
+            finally:
+                self.buffer.task_done()
+
+    # Backend interface
+
+    async def open(self):
+        pass
+
+    async def output(self, chunk):
+        raise NotImplementedError
+
+    async def clip_done(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+
+class AplaySink(AudioSink):
+    """
+    Plays through one persistent aplay process reading raw PCM from a pipe.
+    """
+
+    COMMAND = ['aplay', '-q', '-t', 'raw', '-f', 'S16_LE', '-r', str(SAMPLE_RATE), '-c', str(CHANNELS), '-']
+
+    def __init__(self, buffer_seconds=2.0):
+        super().__init__(buffer_seconds)
+        self.process = None
+
+    async def open(self):
+        self.process = await asyncio.create_subprocess_exec(
+            *self.COMMAND, stdin=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+
+    async def output(self, chunk):
+        # Restart the player if it died, e.g. after the audio device went away
+        if self.process is None or self.process.returncode is not None:
+            if self.process is not None:
+                logger.warning(f'aplay exited with code {self.process.returncode}. Restarting...')
+            await self.open()
+        self.process.stdin.write(chunk)
+        await self.process.stdin.drain()
+
+    async def shutdown(self):
+        if self.process and self.process.returncode is None:
+            self.process.stdin.close()
+            await self.process.wait()
+        self.process = None
+
+
+class SimpleSoundSink(AudioSink):
+    """
+    Collects each clip and plays it from a temporary file - simpleSound can only play files.
+    """
+
+    def __init__(self, buffer_seconds=2.0):
+        super().__init__(buffer_seconds)
+        self.clip = bytearray()
+
+    async def output(self, chunk):
+        self.clip += chunk
+
+    async def clip_done(self):
+        if not self.clip:
+            return
+        data = bytes(self.clip)
+        self.clip.clear()
+        await asyncio.to_thread(self._play, data)
+
+    @staticmethod
+    def _play(data):
+        file_path = os.path.join('tmp', f'{uuid.uuid4()}.wav')
+        with wave.open(file_path, 'wb') as wav:
+            wav.setnchannels(CHANNELS)
+            wav.setsampwidth(SAMPLE_WIDTH)
+            wav.setframerate(SAMPLE_RATE)
+            wav.writeframes(data)
+        try:
+            play(file_path)
+        finally:
+            os.remove(file_path)
+
+
+class FileSink(AudioSink):
+    """
+    Appends raw PCM to a file. Useful for tests and for piping into other players.
+    """
+
+    def __init__(self, path, buffer_seconds=2.0):
+        super().__init__(buffer_seconds)
+        self.path = path
+        self.file = None
+
+    async def open(self):
+        self.file = open(self.path, 'ab')
+
+    async def output(self, chunk):
+        self.file.write(chunk)
+
+    async def clip_done(self):
+        self.file.flush()
+
+    async def shutdown(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+class NullSink(AudioSink):
+    """
+    Discards audio, optionally at playback speed to imitate a real device.
+    """
+
+    def __init__(self, buffer_seconds=2.0, realtime=False):
+        super().__init__(buffer_seconds)
+        self.realtime = realtime
+        self.play_until = 0.0
+
+    async def output(self, chunk):
+        if self.realtime:
+            now = time.monotonic()
+            self.play_until = max(self.play_until, now) + len(chunk) / BYTES_PER_SECOND
+            await asyncio.sleep(self.play_until - now)
+
+
+class NetworkSink(AudioSink):
+    """
+    Streams raw PCM over TCP, e.g. to `nc -l 9000 | aplay -t raw -f S16_LE -r 22050 -c 1`.
+    """
+
+    def __init__(self, host, port, buffer_seconds=2.0):
+        super().__init__(buffer_seconds)
+        self.host = host
+        self.port = port
+        self.writer = None
+
+    async def open(self):
+        try:
+            _, self.writer = await asyncio.open_connection(self.host, self.port)
+        except OSError as e:
+            logger.error(f'Could not connect audio sink to {self.host}:{self.port}: {e}')
+            self.writer = None
+
+    async def output(self, chunk):
+        # Reconnect after the receiver went away
+        if self.writer is None or self.writer.is_closing():
+            await self.open()
+            if self.writer is None:
+                return
+        self.writer.write(chunk)
+        await self.writer.drain()
+
+    async def shutdown(self):
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+
+
+def create_sink(kind, target=None, buffer_seconds=2.0):
+    """
+    Create an audio sink from configuration.
+
+    Args:
+        kind (str): auto, aplay, simplesound, file, null or tcp
+        target (str): File path for file, host:port for tcp, realtime for null at playback speed
+        buffer_seconds (float): Amount of audio buffered before writers have to wait
+
+    Returns:
+        AudioSink: The sink, not started yet
+    """
+    if kind == 'auto':
+        kind = 'simplesound' if system() == 'Windows' else 'aplay'
+
+    if kind == 'aplay':
+        return AplaySink(buffer_seconds)
+    if kind == 'simplesound':
+        return SimpleSoundSink(buffer_seconds)
+    if kind == 'file':
+        return FileSink(target or 'output.pcm', buffer_seconds)
+    if kind == 'null':
+        return NullSink(buffer_seconds, realtime=target == 'realtime')
+    if kind == 'tcp':
+        host, port = (target or 'localhost:9000').rsplit(':', 1)
+        return NetworkSink(host, int(port), buffer_seconds)
+
+    raise ValueError(f'Unknown audio sink: {kind}')
@@ -0,0 +1,119 @@
+"""
+Microbenchmark message parsing: split_message plus re-parsing vs compile_message.
+
+Uses a corpus of chat messages from `benchmarks/chat_messages.txt`.
+Run with `python -m benchmarks.compile_message` from the repository root.
+"""
+import argparse
+import logging
+import os
+import re
+import time
+from compile_message import compile_message
+from logger import logger
+
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'chat_messages.txt')
+SOUNDS = {name: object() for name in ('150', 'airhorn', 'bruh', 'xd', 'beep', 'scream')}
+SOUND_CAP = 20
+MAX_EFFECT_REPETITIONS = 3
+
+
+def old_split_message(text):
+    """
+    The previous split_message - pattern compiled per call, two re.match per token.
+    """
+    pattern = r'\[[^\]]*\]|\{[^\}]*\}|[^\[\]\{\} ]+'
+    tokens = re.findall(pattern, text)
+    merged_tokens = []
+    for token in tokens:
+        if (merged_tokens and
+                not re.match(r'(\[.*\]|\{.*\})', token) and
+                not re.match(r'(\[.*\]|\{.*\})', merged_tokens[-1])):
+            merged_tokens[-1] += ' ' + token
+        else:
+            merged_tokens.append(token)
+    return merged_tokens
+
+
+def old_parse(text):
+    """
+    The previous process_message/process_segment parsing of split_message tokens.
+    """
+    segments = []
+    segment = []
+    effect_ids = []
+    sound_count = 0
+
+    for token in old_split_message(text):
+        if re.match(r'\{\d+\}', token):
+            if segment:
+                segments.append((segment, list(effect_ids)))
+                segment = []
+            effect_ids.append(int(token[1:-1]))
+        elif token == '{.}':
+            if segment:
+                segments.append((segment, list(effect_ids)))
+                segment = []
+            effect_ids = []
+        else:
+            segment.append(token)
+    if segment:
+        segments.append((segment, list(effect_ids)))
+
+    inputs = []
+    for segment, effect_ids in segments:
+        for text in segment:
+            # Sound names are stored without brackets
+            if text.startswith('[') and text.endswith(']') and text[1:-1] in SOUNDS:
+                if sound_count < SOUND_CAP:
+                    inputs.append(f'sounds/{text[1:-1]}.wav')
+                    sound_count += 1
+            else:
+                inputs.append(text)
+    return segments, inputs
+
+
+def new_parse(text):
+    return compile_message(text, SOUNDS, SOUND_CAP, MAX_EFFECT_REPETITIONS)
+
+
+def bench(parse, corpus, rounds, repeats):
+    """
+    Returns:
+        float: Best time of `repeats` runs, in seconds
+    """
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for message in corpus:
+                parse(message)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark message parsing')
+    parser.add_argument('--rounds', type=int, default=2000)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    # The old path didn't warn about unknown effects while parsing
+    logger.setLevel(logging.ERROR)
+
+    with open(CORPUS_PATH, 'r', encoding='utf-8') as f:
+        corpus = [line.strip() for line in f if line.strip()]
+
+    messages = len(corpus) * args.rounds
+    old_time = bench(old_parse, corpus, args.rounds, args.repeats)
+    new_time = bench(new_parse, corpus, args.rounds, args.repeats)
+
+    print(f'{messages} messages ({len(corpus)} distinct)')
+    print(f'split_message + re-parse: {messages / old_time:10.0f} messages/s ({old_time / messages * 1e6:.1f} us/message)')
+    print(f'compile_message:          {messages / new_time:10.0f} messages/s ({new_time / messages * 1e6:.1f} us/message)')
+    print(f'speedup:                  {old_time / new_time:10.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark voice effects: NumPy engine vs sox subprocess, per effect.
+
+Run with `python -m benchmarks.effects` from the repository root.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from audio import SAMPLE_RATE, read_wav, write_wav
+from benchmarks.stand_in_tts import synthesize_wav
+from collections import Counter
+from effects import EFFECT_NAMES, apply_effects, sox_transformer
+from io import BytesIO
+
+
+def make_clip(seconds):
+    """
+    Deterministic test clip of the given length.
+    """
+    samples, _ = read_wav(BytesIO(synthesize_wav('x' * int(seconds / 0.06))))
+    return samples
+
+
+def time_numpy(samples, effect_counts, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        apply_effects(samples, SAMPLE_RATE, effect_counts)
+    return (time.perf_counter() - start) / repeats
+
+
+def time_sox(samples, effect_counts, repeats, tmp_dir):
+    """
+    Old path - sox build from file to file, including writing the input and reading the output.
+    """
+    input_file = os.path.join(tmp_dir, 'input.wav')
+    output_file = os.path.join(tmp_dir, 'output.wav')
+    start = time.perf_counter()
+    for _ in range(repeats):
+        write_wav(input_file, samples)
+        sox_transformer(effect_counts).build(input_file, output_file)
+        read_wav(output_file)
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark voice effect backends')
+    parser.add_argument('--seconds', type=float, nargs='+', default=[1.0, 3.0, 8.0], help='Clip lengths')
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    has_sox = shutil.which('sox') is not None
+    if not has_sox:
+        print('sox not found in PATH - only timing the NumPy engine')
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for seconds in args.seconds:
+            samples = make_clip(seconds)
+            print(f'\nclip length: {seconds}s')
+            print(f'{"effect":<16}{"numpy ms":>10}{"sox ms":>10}{"speedup":>10}')
+            for effect_id, name in EFFECT_NAMES.items():
+                effect_counts = Counter({effect_id: 1})
+                numpy_time = time_numpy(samples, effect_counts, args.repeats)
+                if has_sox:
+                    sox_time = time_sox(samples, effect_counts, args.repeats, tmp_dir)
+                    print(f'{name:<16}{numpy_time * 1000:>10.1f}{sox_time * 1000:>10.1f}{sox_time / numpy_time:>9.1f}x')
+                else:
+                    print(f'{name:<16}{numpy_time * 1000:>10.1f}{"n/a":>10}{"n/a":>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Microbenchmark number normalization: the previous character-by-character
+fix_numbers vs the regex substitution with memoized conversions.
+
+Uses long, number-heavy chat messages built from numbers chat keeps repeating.
+Run with `python -m benchmarks.fix_numbers` from the repository root.
+"""
+import argparse
+import asyncio
+import random
+import time
+from fix_numbers import fix_numbers, number_to_words
+from num2words import num2words
+
+
+COMMON_NUMBERS = ['2137', '100', '69', '420', '1', '2', '3', '10', '50', '1000', '7', '21', '37', '2024', '99']
+WORDS = ['xd', 'ale', 'to', 'jest', 'gra', 'lol', 'chat', 'kappa', 'no', 'i', 'co']
+
+
+async def old_fix_numbers(text):
+    """
+    The previous fix_numbers - walks the text per character, converts every number.
+    """
+    symbols = []
+    symbol_buffer = ''
+    for symbol in text:
+        if symbol.isnumeric():
+            symbol_buffer += symbol
+        else:
+            if symbol_buffer:
+                symbols.append(num2words(int(symbol_buffer), lang='pl'))
+                symbol_buffer = ''
+            symbols.append(symbol)
+    if symbol_buffer:
+        symbols.append(num2words(int(symbol_buffer), lang='pl'))
+    return ''.join(symbols)
+
+
+def make_message(rng, words):
+    """
+    Build a message where roughly every third word is a number, mostly common ones.
+    """
+    parts = []
+    for _ in range(words):
+        if rng.random() < 0.35:
+            parts.append(rng.choice(COMMON_NUMBERS) if rng.random() < 0.8 else str(rng.randint(0, 99999)))
+        else:
+            parts.append(rng.choice(WORDS))
+    return ' '.join(parts)
+
+
+async def bench(normalize, corpus, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for message in corpus:
+            await normalize(message)
+    return time.perf_counter() - start
+
+
+async def run(args):
+    rng = random.Random(2137)
+    corpus = [make_message(rng, args.words) for _ in range(args.messages)]
+    total = len(corpus) * args.rounds
+    characters = sum(len(message) for message in corpus) * args.rounds
+
+    old_time = await bench(old_fix_numbers, corpus, args.rounds)
+    number_to_words.cache_clear()
+    new_time = await bench(fix_numbers, corpus, args.rounds)
+    cache = number_to_words.cache_info()
+
+    print(f'{total} messages of {args.words} words, {characters / total:.0f} characters on average')
+    print(f'old fix_numbers:  {total / old_time:10.0f} messages/s ({characters / old_time / 1e6:.2f} M chars/s)')
+    print(f'new fix_numbers:  {total / new_time:10.0f} messages/s ({characters / new_time / 1e6:.2f} M chars/s)')
+    print(f'speedup:          {old_time / new_time:10.1f}x')
+    print(f'memo: {cache.hits} hits, {cache.misses} misses, {cache.currsize}/{cache.maxsize} entries')
+
+    # Long digit runs - spoken length with and without the guard
+    digits = ''.join(rng.choice('0123456789') for _ in range(args.long_digits))
+    try:
+        old_length = len(await old_fix_numbers(digits))
+    except Exception as e:
+        old_length = f'error ({type(e).__name__})'
+    new_length = len(await fix_numbers(digits))
+    print(f'{args.long_digits} digit run: {old_length} characters before, {new_length} with the guard')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark fix_numbers')
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--words', type=int, default=60, help='Words per message')
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--long-digits', type=int, default=60, help='Length of the long digit run')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""
+Benchmark redemption ingestion - the EventSub and PubSub callbacks.
+
+Replays redemption payloads through the callbacks as they were (a JSON
+round-trip of every payload, a debug log of it, one reward name) and as they
+are now (fields read directly, a set of reward names), reporting events per
+second and bytes allocated per event. Payloads are generated with
+benchmarks/redemptions.py, a fifth of them for other rewards, or read from a
+file of recorded ones with `--payloads` - one JSON object per line with
+`source` (eventsub or pubsub) and `payload`.
+
+Run with `python -m benchmarks.ingest` from the repository root.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+import tracemalloc
+from benchmarks.redemptions import REWARD_NAME, eventsub_payload, generate_messages, pubsub_payload
+from logger import logger
+from main import TwitchTTSBot
+from message_job import MessageJob
+from metrics import metrics
+from parsed_config import Config, validate_config
+from twitchAPI.object.eventsub import ChannelPointsCustomRewardRedemptionAddEvent
+
+
+async def legacy_callback_wrapped(bot, uuid, data):
+    """
+    callback_wrapped before the lean ingestion path.
+    """
+    try:
+        ingest_start = time.perf_counter()
+        callback = json.loads(json.dumps(data))
+        logger.debug(callback)
+
+        if 'whispers'.lower() in sys.argv:
+            if 'body' in callback['data_object']:
+                message = callback['data_object']['body']
+                logger.info(f'message: {message}')
+                if bot.sound_queue.admit(MessageJob(message, lane='priority')):
+                    metrics.stage('ingest', time.perf_counter() - ingest_start)
+        else:
+            if callback['data']['redemption']['reward']['title'] == bot.reward_name:
+                if bot.is_duplicate(callback['data']['redemption'].get('id')):
+                    return
+                message = callback['data']['redemption']['user_input']
+                sender = callback['data']['redemption']['user']['display_name']
+                logger.info(f'{sender} said: {message}')
+                if bot.sound_queue.admit(MessageJob(message, sender, bot.lane_for(sender))):
+                    metrics.stage('ingest', time.perf_counter() - ingest_start)
+                    logger.debug(f'callback_wrapped - Added "{message}" to queue. Queue size: {bot.sound_queue.qsize()}, '
+                                 f'predicted wait: {bot.sound_queue.predicted_wait():.1f}s')
+    except KeyError as e:
+        logger.error(f'callback_wrapped - Error in message Body - {callback}: {e}')
+
+
+async def legacy_eventsub_on_bezio(bot, data):
+    """
+    eventsub_on_bezio before the lean ingestion path.
+    """
+    try:
+        ingest_start = time.perf_counter()
+        callback = json.loads(json.dumps(data.to_dict()))
+        logger.debug(callback)
+
+        if 'title' in callback['event']['reward']:
+            if callback['event']['reward']['title'] == bot.reward_name:
+                if bot.is_duplicate(callback['event'].get('id')):
+                    return
+                sender = callback['event']['user_name']
+                message = callback['event']['user_input']
+                logger.info(f'{sender} said: {message}')
+                if bot.sound_queue.admit(MessageJob(message, sender, bot.lane_for(sender))):
+                    metrics.stage('ingest', time.perf_counter() - ingest_start)
+                    logger.debug(f'eventsub_on_bezio - Added "{message}" to queue. Queue size: {bot.sound_queue.qsize()}, '
+                                 f'predicted wait: {bot.sound_queue.predicted_wait():.1f}s')
+    except KeyError as e:
+        logger.error(f'eventsub_on_bezio - Error in message Body: {e}')
+
+
+def make_bot():
+    cfg = Config.from_dict({
+        'twitch': {
+            'default_runner': 'eventsub', 'channel': 'streamer', 'client_id': 'benchmark', 'client_secret': 'secret',
+            'auth_file': 'tokens.tmp',
+        },
+        'tts': {
+            'reward_name': REWARD_NAME, 'sound_cap': 20, 'max_effect_repetitions': 3,
+            'max_queued_audio': 0.0, 'max_queue_latency': 0.0, 'journal': False, 'metrics_log_interval': 0,
+        },
+    })
+    if not validate_config(cfg):
+        raise ValueError('Invalid benchmark configuration')
+    return TwitchTTSBot(cfg, sounds={})
+
+
+def generate_payloads(count, other_rewards, seed):
+    """
+    Returns:
+        list: (source, payload) tuples, alternating between EventSub and PubSub
+    """
+    rng = random.Random(seed)
+    payloads = []
+    for i, (_, text) in enumerate(generate_messages(count, seed=seed)):
+        reward = 'Hydrate' if rng.random() < other_rewards else REWARD_NAME
+        source = 'eventsub' if i % 2 == 0 else 'pubsub'
+        build = eventsub_payload if source == 'eventsub' else pubsub_payload
+        payloads.append((source, build(text, f'viewer{rng.randrange(200)}', reward)))
+    return payloads
+
+
+def read_payloads(path):
+    with open(path, encoding='utf-8') as f:
+        return [(record['source'], record['payload']) for record in map(json.loads, f) if record]
+
+
+def make_calls(bot, payloads, legacy):
+    """
+    Build the callback calls of the payloads, with EventSub payloads parsed into event objects like twitchAPI does.
+
+    Returns:
+        dict: Source -> list of zero-argument coroutine functions
+    """
+    calls = {'eventsub': [], 'pubsub': []}
+    for source, payload in payloads:
+        if source == 'eventsub':
+            event = ChannelPointsCustomRewardRedemptionAddEvent(**payload)
+            if legacy:
+                calls[source].append(lambda event=event: legacy_eventsub_on_bezio(bot, event))
+            else:
+                calls[source].append(lambda event=event: bot.eventsub_on_bezio(event))
+        else:
+            if legacy:
+                calls[source].append(lambda payload=payload: legacy_callback_wrapped(bot, None, payload))
+            else:
+                calls[source].append(lambda payload=payload: bot.callback_wrapped(None, payload))
+    return calls
+
+
+def reset(bot):
+    """
+    Empty the sound queue and forget seen redemptions, so every replay does the same work.
+    """
+    while not bot.sound_queue.empty():
+        bot.sound_queue.finish(bot.sound_queue.get_nowait())
+    bot.seen_redemptions.clear()
+
+
+async def measure(bot, calls, repeats):
+    """
+    Returns:
+        tuple: (events per second, bytes allocated per event)
+    """
+    best = float('inf')
+    for _ in range(repeats):
+        reset(bot)
+        start = time.perf_counter()
+        for call in calls:
+            await call()
+        best = min(best, time.perf_counter() - start)
+
+    reset(bot)
+    allocated = 0
+    tracemalloc.start()
+    for call in calls:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        await call()
+        allocated += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    reset(bot)
+    return len(calls) / best, allocated / len(calls)
+
+
+async def run(args):
+    bot = make_bot()
+    payloads = read_payloads(args.payloads) if args.payloads else generate_payloads(args.events, args.other_rewards, args.seed)
+    print(f'{len(payloads)} payloads, {"recorded" if args.payloads else f"{args.other_rewards:.0%} for other rewards"}')
+    results = {}
+    for label, legacy in (('previous', True), ('lean', False)):
+        for source, calls in make_calls(bot, payloads, legacy).items():
+            if calls:
+                results[source, label] = await measure(bot, calls, args.repeats)
+
+    print(f'{"":<20} {"events/s":>10} {"bytes/event":>12}')
+    for (source, label), (rate, allocated) in results.items():
+        print(f'{source + " " + label:<20} {rate:>10.0f} {allocated:>12.0f}')
+    for source in ('eventsub', 'pubsub'):
+        if (source, 'lean') in results:
+            previous, lean = results[source, 'previous'], results[source, 'lean']
+            print(f'{source}: {lean[0] / previous[0]:.2f}x events/s, {previous[1] / lean[1]:.2f}x fewer bytes allocated')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark redemption ingestion')
+    parser.add_argument('--events', type=int, default=2000, help='Generated payloads, half EventSub and half PubSub')
+    parser.add_argument('--other-rewards', type=float, default=0.2, help='Fraction of generated payloads for other rewards')
+    parser.add_argument('--payloads', help='File of recorded payloads to replay instead')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    # Logging I/O is measured by benchmarks.load_test, here only the callbacks are
+    logger.setLevel(logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
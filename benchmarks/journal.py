@@ -0,0 +1,150 @@
+"""
+Benchmark the write-ahead journal of the sound queue.
+
+Measures how long a restart takes to replay a journal of 10k messages (half of
+them already played), what journaling adds to accepting a message - batched
+fsync against an fsync per record - and how long compaction takes.
+
+Run with `python -m benchmarks.journal` from the repository root.
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from benchmarks.redemptions import generate_messages
+from journal import Journal
+from message_job import MessageJob
+
+
+def make_jobs(count, seed):
+    rng = random.Random(seed)
+    return [MessageJob(text, f'user{rng.randrange(500)}') for _, text in generate_messages(count, {'chat': 1.0}, seed)]
+
+
+def write_journal(path, jobs, done_fraction, seed):
+    """
+    Write a journal of `jobs` with `done_fraction` of them completed, without compacting.
+
+    Returns:
+        int: File size in bytes
+    """
+    rng = random.Random(seed)
+    journal = Journal(path, compact_bytes=float('inf'))
+    journal.replay()
+    for job in jobs:
+        job.journal_id = journal.add(job)
+    for job in jobs:
+        if rng.random() < done_fraction:
+            journal.done(job.journal_id)
+    journal.close()
+    return os.path.getsize(path)
+
+
+def time_replay(path, repeats):
+    """
+    Returns:
+        tuple: (best replay seconds, undelivered messages)
+    """
+    best = float('inf')
+    for _ in range(repeats):
+        journal = Journal(path, compact_bytes=float('inf'))
+        start = time.perf_counter()
+        records = journal.replay()
+        best = min(best, time.perf_counter() - start)
+        journal.close()
+    return best, len(records)
+
+
+async def time_ingestion(path, jobs, flush_interval):
+    """
+    Accept messages the way the callbacks do, with the journal flushing in the background.
+
+    Returns:
+        tuple: (microseconds per message on the event loop, seconds until everything is on disk)
+    """
+    journal = Journal(path, flush_interval=flush_interval)
+    journal.replay()
+    flusher = asyncio.create_task(journal.run())
+    elapsed = 0.0
+    start = time.perf_counter()
+    for i, job in enumerate(jobs):
+        step = time.perf_counter()
+        job.journal_id = journal.add(job)
+        elapsed += time.perf_counter() - step
+        if i % 100 == 99:
+            # Let the flusher run, like the event loop does between redemptions
+            await asyncio.sleep(0)
+    while journal.buffer or (journal.writing and not journal.writing.done()):
+        await asyncio.sleep(flush_interval)
+    durable = time.perf_counter() - start
+    flusher.cancel()
+    await asyncio.gather(flusher, return_exceptions=True)
+    return elapsed / len(jobs) * 1e6, durable
+
+
+def time_fsync_per_record(path, jobs):
+    """
+    Returns:
+        float: Microseconds per message when every record is fsynced on its own
+    """
+    journal = Journal(path)
+    journal.replay()
+    start = time.perf_counter()
+    for job in jobs:
+        job.journal_id = journal.add(job)
+        lines, journal.buffer = journal.buffer, []
+        journal._append(lines)
+    elapsed = time.perf_counter() - start
+    journal.close()
+    return elapsed / len(jobs) * 1e6
+
+
+def time_compaction(path, jobs, done_fraction, seed):
+    """
+    Returns:
+        tuple: (seconds, bytes before, bytes after)
+    """
+    before = write_journal(path, jobs, done_fraction, seed)
+    journal = Journal(path)
+    journal.replay()
+    start = time.perf_counter()
+    journal._rewrite(list(journal.live.values()))
+    elapsed = time.perf_counter() - start
+    journal.close()
+    return elapsed, before, os.path.getsize(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the sound queue journal')
+    parser.add_argument('--entries', type=int, default=10000, help='Messages in the replayed journal')
+    parser.add_argument('--done', type=float, default=0.5, help='Fraction of them already played')
+    parser.add_argument('--ingest', type=int, default=2000, help='Messages accepted in the ingestion test')
+    parser.add_argument('--flush-interval', type=float, default=0.05)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'journal.log')
+
+        size = write_journal(path, make_jobs(args.entries, args.seed), args.done, args.seed)
+        replay, undelivered = time_replay(path, args.repeats)
+        print(f'replay of {args.entries} messages ({size / 1024:.0f} KiB, {undelivered} undelivered): {replay * 1000:.1f} ms')
+
+        os.remove(path)
+        batched, durable = asyncio.run(time_ingestion(path, make_jobs(args.ingest, args.seed), args.flush_interval))
+        os.remove(path)
+        per_record = time_fsync_per_record(path, make_jobs(args.ingest, args.seed))
+        print(f'append, batched fsync every {args.flush_interval * 1000:.0f} ms: {batched:8.1f} us/message on the event loop, '
+              f'all {args.ingest} durable after {durable * 1000:.0f} ms')
+        print(f'append, fsync per record:            {per_record:8.1f} us/message, {per_record / batched:.0f}x')
+
+        os.remove(path)
+        compaction, before, after = time_compaction(path, make_jobs(args.entries, args.seed), args.done, args.seed)
+        print(f'compaction of {args.entries} messages: {compaction * 1000:.1f} ms, {before / 1024:.0f} KiB -> {after / 1024:.0f} KiB')
+
+
+if __name__ == '__main__':
+    main()
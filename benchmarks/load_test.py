@@ -0,0 +1,316 @@
+"""
+End-to-end load test of the bot.
+
+Synthetic redemptions go through the real ingestion path
+(`TwitchTTSBot.eventsub_on_bezio` or `callback_wrapped`) at a configurable rate
+and message mix. The stand-in TTS server runs in a separate process, and audio
+goes to a null sink. The test reports throughput, p50/p95/p99 end-to-end and
+first-sound latency, admission outcomes and peak memory. Results are written as JSON, and
+`--compare` prints the change against an earlier result file.
+
+Run with `python -m benchmarks.load_test` from the repository root.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from audio import SAMPLE_RATE, write_wav
+from benchmarks.effects import make_clip
+from benchmarks.redemptions import (REWARD_NAME, SOUND_NAMES, eventsub_payload, generate_messages, parse_mix,
+                                    pubsub_payload)
+from logger import logger
+from main import TwitchTTSBot
+from metrics import metrics
+from parsed_config import Config, validate_config, value_types
+from sound_bank import build as build_sound_bank
+from sound_play import sound_play
+from twitchAPI.object.eventsub import ChannelPointsCustomRewardRedemptionAddEvent
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIRECTORY = os.path.join(REPOSITORY_ROOT, 'benchmarks', 'results')
+
+# Result fields compared by --compare, and whether higher is better
+COMPARED_FIELDS = [
+    ('throughput_messages_per_second', True),
+    ('end_to_end_p50_ms', False),
+    ('end_to_end_p95_ms', False),
+    ('end_to_end_p99_ms', False),
+    ('first_sound_p95_ms', False),
+    ('peak_rss_mb', False),
+]
+
+
+def percentile(values, percent):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process and of its finished children (render workers), in MB.
+    """
+    if resource is None:
+        return None
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return {
+        'self': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        'children': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPOSITORY_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_tts_server(args):
+    """
+    Start the stand-in TTS server in its own process and wait until it accepts connections.
+
+    Returns:
+        tuple: (subprocess.Popen, url)
+    """
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.stand_in_tts', '--port', str(port), '--latency', str(args.tts_latency)],
+        cwd=REPOSITORY_ROOT, stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return process, f'http://127.0.0.1:{port}/api/tts'
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('Stand-in TTS server did not start')
+
+
+def make_sounds(directory):
+    """
+    Create the sounds referenced by the message mix.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for i, name in enumerate(SOUND_NAMES):
+        write_wav(os.path.join(directory, f'{name}.wav'), make_clip(0.3 + 0.4 * i), SAMPLE_RATE)
+
+
+def make_config(args, tts_url):
+    """
+    Build the bot configuration for the test, applying --set overrides to the [tts] section.
+    """
+    tts = {
+        'reward_name': REWARD_NAME,
+        'sound_cap': 20,
+        'max_effect_repetitions': 3,
+        'tts_url': tts_url,
+        'audio_sink': 'null',
+        'audio_sink_target': 'realtime' if args.realtime else '',
+        'metrics_log_interval': 0,
+    }
+    for override in args.set:
+        key, value = override.split('=', 1)
+        tts[key] = value_types['tts'].get(key, str)(value)
+
+    cfg = Config.from_dict({
+        'twitch': {
+            'default_runner': args.source, 'channel': 'load_test', 'client_id': 'load_test',
+            'client_secret': 'load_test', 'auth_file': 'tokens.tmp',
+        },
+        'tts': tts,
+    })
+    if not validate_config(cfg):
+        raise ValueError('Invalid load test configuration')
+    return cfg
+
+
+async def drive(bot, args, messages):
+    """
+    Deliver redemptions to the bot's callbacks at the configured rate.
+    """
+    rng = random.Random(args.seed)
+    users = [f'viewer{i}' for i in range(args.users)]
+    start = time.perf_counter()
+    at = 0.0
+    for _, text in messages:
+        delay = start + at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        user = rng.choice(users)
+        if args.source == 'pubsub':
+            await bot.callback_wrapped(uuid.uuid4(), pubsub_payload(text, user))
+        else:
+            await bot.eventsub_on_bezio(ChannelPointsCustomRewardRedemptionAddEvent(**eventsub_payload(text, user)))
+        at += rng.expovariate(args.rate) if args.arrival == 'poisson' else 1 / args.rate
+    return start
+
+
+async def run(args):
+    messages = generate_messages(args.messages, parse_mix(args.mix) if args.mix else None, args.seed)
+    tts_process, tts_url = start_tts_server(args)
+    working_directory = os.getcwd()
+
+    # Caches, sounds and temporary files of the bot live in a fresh directory
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            make_sounds('sounds')
+            cfg = make_config(args, tts_url)
+            bot = TwitchTTSBot(cfg)
+            if args.sound_bank:
+                build_sound_bank(bot.sounds)
+
+            observed = {'end_to_end': [], 'first_sound': []}
+            completed_at = []
+
+            def on_observation(name, value, labels):
+                stage = labels.get('stage')
+                if stage in observed:
+                    observed[stage].append(value)
+                    if stage == 'end_to_end':
+                        completed_at.append(time.perf_counter())
+
+            metrics.add_listener(on_observation)
+
+            bot.replay_journal()
+            sound_task = asyncio.create_task(sound_play(bot.sound_queue, bot.sounds, bot.cfg))
+            monitor_task = asyncio.create_task(bot.loop_monitor.run())
+            background = [sound_task, monitor_task]
+            if bot.journal:
+                background.append(asyncio.create_task(bot.journal.run()))
+
+            start = await drive(bot, args, messages)
+            await bot.sound_queue.join()
+
+            # Wait for the sink to finish the last clips
+            previous = -1
+            while previous != len(completed_at):
+                previous = len(completed_at)
+                await asyncio.sleep(cfg.tts.audio_sink_buffer + 0.5 if args.realtime else 0.2)
+            end = completed_at[-1] if completed_at else time.perf_counter()
+
+            loop_lag = bot.loop_monitor.stats()
+            admission = bot.sound_queue.stats()
+            for task in background:
+                task.cancel()
+            await asyncio.gather(*background, return_exceptions=True)
+        finally:
+            os.chdir(working_directory)
+            tts_process.terminate()
+            tts_process.wait()
+
+    completed = len(observed['end_to_end'])
+    memory = peak_rss_mb()
+    results = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'parameters': vars(args),
+        'messages': len(messages),
+        'completed': completed,
+        'elapsed_seconds': round(end - start, 3),
+        'throughput_messages_per_second': round(completed / (end - start), 2) if end > start else None,
+        **{
+            f'{stage}_p{p}_ms': round(percentile(values, p) * 1000, 1) if values else None
+            for stage, values in observed.items() for p in (50, 95, 99)
+        },
+        'peak_rss_mb': memory['self'] if memory else None,
+        'peak_rss_children_mb': memory['children'] if memory else None,
+        'loop_lag_max_ms': round(loop_lag['max_lag_ms'], 1),
+        'loop_lag_avg_ms': round(loop_lag['avg_lag_ms'], 2),
+        'admission': {outcome: admission[outcome] for outcome in ('admitted', 'rejected', 'truncated', 'dropped', 'expired')},
+        'stages': metrics.snapshot()['histograms'].get('tts_stage_seconds', {}),
+    }
+    return results
+
+
+def compare(results, previous_path):
+    with open(previous_path, 'r', encoding='utf-8') as f:
+        previous = json.load(f)
+    print(f'\nCompared to {previous.get("commit")} ({previous_path}):')
+    for field, higher_is_better in COMPARED_FIELDS:
+        old, new = previous.get(field), results.get(field)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old * 100 if old else 0.0
+        better = (change > 0) == higher_is_better
+        verdict = '' if abs(change) < 5 else (' better' if better else ' WORSE')
+        print(f'  {field:<34} {old:>10} -> {new:>10} ({change:+.1f}%){verdict}')
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(description='End-to-end load test of the TTS bot')
+    parser.add_argument('--messages', type=int, default=200, help='Number of redemptions')
+    parser.add_argument('--rate', type=float, default=5.0, help='Redemptions per second')
+    parser.add_argument('--arrival', choices=['poisson', 'constant'], default='poisson')
+    parser.add_argument('--mix', help='Message mix, e.g. chat=0.5,numbers=0.2,soundboard=0.15,effects=0.15')
+    parser.add_argument('--source', choices=['eventsub', 'pubsub'], default='eventsub')
+    parser.add_argument('--users', type=int, default=50, help='Number of distinct redeeming users')
+    parser.add_argument('--tts-latency', type=float, default=0.1, help='Stand-in TTS server delay per request')
+    parser.add_argument('--sound-bank', action='store_true', help='Pack the sounds into a sound bank first')
+    parser.add_argument('--realtime', action='store_true', help='Null sink consumes audio at playback speed')
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE', help='Override a [tts] option')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Result file, benchmarks/results/load_test_<commit>.json by default')
+    parser.add_argument('--compare', metavar='RESULT_FILE', help='Earlier result file to compare with')
+    parser.add_argument('--verbose', action='store_true', help='Keep the bot logging at its normal level')
+    return parser
+
+
+def main():
+    args = make_parser().parse_args()
+
+    if not args.verbose:
+        logger.setLevel(logging.WARNING)
+
+    results = asyncio.run(run(args))
+
+    print(f'{results["completed"]}/{results["messages"]} messages in {results["elapsed_seconds"]} s - '
+          f'{results["throughput_messages_per_second"]} messages/s')
+    for stage in ('end_to_end', 'first_sound'):
+        print(f'{stage:<12} p50 {results[f"{stage}_p50_ms"]} ms, p95 {results[f"{stage}_p95_ms"]} ms, '
+              f'p99 {results[f"{stage}_p99_ms"]} ms')
+    print(f'peak RSS {results["peak_rss_mb"]} MB (render workers {results["peak_rss_children_mb"]} MB), '
+          f'max loop lag {results["loop_lag_max_ms"]} ms')
+    print('admission ' + ', '.join(f'{outcome} {count}' for outcome, count in results['admission'].items()))
+
+    output = args.output or os.path.join(RESULTS_DIRECTORY, f'load_test_{results["commit"] or "unknown"}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f'Results written to {output}')
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark event loop lag caused by logging during a redemption burst.
+
+Runs the end-to-end load test (benchmarks/load_test.py) with debug logging
+through the previous synchronous handlers - console and file written on the
+event loop thread - and through the queue pipeline of logger.py, where a
+listener thread formats records and does the I/O. Console writes go to a sink
+that takes `--write-latency` seconds per write, like a slow terminal.
+
+Run with `python -m benchmarks.logging_lag` from the repository root.
+"""
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from benchmarks import load_test
+from logger import EXTERNAL_LOGGERS, LOG_FORMAT, logger, setup_logging
+
+
+class SlowStream:
+    """
+    Text stream discarding what is written, after a delay per write.
+    """
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def reset_logging():
+    """
+    Detach all handlers of the bot's and twitchAPI's loggers.
+    """
+    for name in [logger.name, *EXTERNAL_LOGGERS]:
+        target = logging.getLogger(name)
+        for handler in list(target.handlers):
+            target.removeHandler(handler)
+
+
+def previous_logging(stream, folder):
+    """
+    Attach handlers the way logger.py did before the queue pipeline - synchronous
+    console and file handlers on the bot's logger, called on the event loop thread.
+    """
+    reset_logging()
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = logging.FileHandler(os.path.join(folder, 'previous.log'), encoding='utf-8')
+    file_handler.setFormatter(formatter)
+    console_handler = logging.StreamHandler(stream)
+    console_handler.setFormatter(formatter)
+    logger.addHandler(console_handler)
+    logger.addHandler(file_handler)
+    logger.setLevel(logging.DEBUG)
+    return [file_handler]
+
+
+def queue_logging(stream, folder):
+    """
+    Attach the queue pipeline of logger.py, with its console handlers writing to `stream`.
+    """
+    reset_logging()
+    stderr = sys.stderr
+    sys.stderr = stream
+    try:
+        setup_logging(True, logs_folder=folder)
+    finally:
+        sys.stderr = stderr
+    return []
+
+
+def main():
+    parser = load_test.make_parser()
+    parser.description = 'Benchmark event loop lag caused by debug logging during a redemption burst'
+    parser.add_argument('--write-latency', type=float, default=0.001, help='Seconds per console write')
+    parser.set_defaults(messages=300, rate=100.0)
+    args = parser.parse_args()
+    args.output = None
+
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for label, setup in (('synchronous handlers', previous_logging), ('queue pipeline', queue_logging)):
+            stream = SlowStream(args.write_latency)
+            handlers = setup(stream, folder)
+            try:
+                outcome = asyncio.run(load_test.run(args))
+            finally:
+                for handler in handlers:
+                    handler.close()
+            results[label] = (outcome, stream.writes)
+        reset_logging()
+
+    print(f'{args.messages} redemptions at {args.rate:.0f}/s, debug logging, {args.write_latency * 1000:.1f} ms per console write')
+    print(f'{"":<22} {"loop lag max":>13} {"avg":>9} {"first sound p95":>16} {"end to end p95":>15} {"lines":>7}')
+    for label, (outcome, writes) in results.items():
+        print(f'{label:<22} {outcome["loop_lag_max_ms"]:>10.1f} ms {outcome["loop_lag_avg_ms"]:>6.2f} ms '
+              f'{outcome["first_sound_p95_ms"]:>13.1f} ms {outcome["end_to_end_p95_ms"]:>12.1f} ms {writes:>7}')
+
+
+if __name__ == '__main__':
+    main()
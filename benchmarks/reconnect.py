@@ -0,0 +1,190 @@
+"""
+Benchmark reconnecting to Twitch in `local` mode.
+
+Measures reconnect-to-ready time - from deciding to reconnect until the new
+EventSub subscription is active - for the previous reconnect (serial teardown,
+new client, authentication and user lookup, websocket start on the event loop)
+and the fast one reusing the authenticated client and cached user ID, along
+with the longest event loop stall during each. Then drops the EventSub
+connection while redemptions keep coming, with and without the standby
+connection, and counts the redemptions missed and received twice.
+
+By default it runs against a stand-in for the Twitch CLI endpoints. With `--cli`
+the reconnect times are measured against a running Twitch CLI mock API and
+websocket server (`twitch mock-api start`, `twitch event websocket start-server -p 4000`)
+at the addresses the bot uses in `local` mode; the drop scenarios need the stand-in.
+
+Run with `python -m benchmarks.reconnect` from the repository root.
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+from benchmarks.redemptions import REWARD_NAME
+from benchmarks.stand_in_twitch import StandInTwitchServer
+from logger import EXTERNAL_LOGGERS, logger
+from main import LOCAL_ENDPOINTS, TwitchTTSBot
+from parsed_config import Config, validate_config
+from twitchAPI.eventsub.websocket import EventSubWebsocket
+from twitchAPI.helper import first
+from twitchAPI.oauth import UserAuthenticator
+from twitchAPI.twitch import Twitch
+
+
+CLIENT_ID = 'benchmark-client'
+
+
+def make_bot(args, server, standby=False):
+    cfg = Config.from_dict({
+        'twitch': {
+            'default_runner': 'eventsub', 'channel': 'streamer', 'client_id': CLIENT_ID, 'client_secret': 'secret',
+            'auth_file': 'tokens.tmp', 'mock_user_id': args.user_id, 'eventsub_standby': standby,
+        },
+        'tts': {
+            'reward_name': REWARD_NAME, 'sound_cap': 20, 'max_effect_repetitions': 3,
+            'max_queued_audio': 0.0, 'max_queue_latency': 0.0, 'journal': False, 'metrics_log_interval': 0,
+        },
+    })
+    if not validate_config(cfg):
+        raise ValueError('Invalid benchmark configuration')
+    bot = TwitchTTSBot(cfg, sounds={})
+    bot.local = True
+    endpoints = server.endpoints if server else LOCAL_ENDPOINTS
+    bot.base_url = endpoints['base_url']
+    bot.auth_base_url = endpoints['auth_base_url']
+    bot.connection_url = endpoints['connection_url']
+    bot.subscription_url = endpoints['subscription_url']
+    return bot
+
+
+async def legacy_reconnect(bot):
+    """
+    Reconnect the way connect_to_twitch did before the fast path - serial teardown,
+    then a new client, authentication, user lookup and a websocket started on the event loop.
+    """
+    if bot.twitch:
+        await bot.twitch.close()
+        bot.twitch = None
+    if bot.eventsub:
+        await bot.eventsub.stop()
+        bot.eventsub = None
+    bot.twitch = await Twitch(bot.app_id, bot.app_secret, base_url=bot.base_url, auth_base_url=bot.auth_base_url)
+    bot.twitch.auto_refresh_auth = False
+    authenticated_twitch = UserAuthenticator(bot.twitch, bot.eventsub_scope, auth_base_url=bot.auth_base_url)
+    token = await authenticated_twitch.mock_authenticate(bot.mock_user_id)
+    await bot.twitch.set_user_authentication(token, bot.eventsub_scope)
+    user = await first(bot.twitch.get_users())
+    bot.eventsub = EventSubWebsocket(bot.twitch, connection_url=bot.connection_url, subscription_url=bot.subscription_url)
+    bot.eventsub.start()
+    await bot.eventsub.listen_channel_points_custom_reward_redemption_add(user.id, bot.forward_eventsub)
+    return True
+
+
+async def time_reconnects(args, server):
+    """
+    Returns:
+        dict: Mode -> (median reconnect seconds, median longest loop stall seconds)
+    """
+    bot = make_bot(args, server)
+    loop_monitor = asyncio.create_task(bot.loop_monitor.run())
+    results = {}
+    try:
+        if not await bot.connect_to_twitch():
+            raise RuntimeError('Could not connect to the Twitch endpoints')
+        modes = (
+            ('previous reconnect', lambda: legacy_reconnect(bot)),
+            ('fast reconnect', bot.connect_to_twitch),
+        )
+        for label, reconnect in modes:
+            times, stalls = [], []
+            for _ in range(args.repeats):
+                bot.loop_monitor.reset()
+                start = time.perf_counter()
+                if not await reconnect():
+                    raise RuntimeError(f'{label} failed')
+                times.append(time.perf_counter() - start)
+                await asyncio.sleep(bot.loop_monitor.interval * 2)
+                stalls.append(bot.loop_monitor.max_lag)
+            results[label] = (statistics.median(times), statistics.median(stalls))
+    finally:
+        loop_monitor.cancel()
+        await bot.cleanup()
+    return results
+
+
+async def drop_scenario(args, server, standby):
+    """
+    Send redemptions at a steady rate and drop the primary connection a third of the way in.
+
+    Returns:
+        dict: Redemptions sent, queued, missed and received twice
+    """
+    bot = make_bot(args, server, standby)
+    chat = asyncio.create_task(bot.run_chat())
+    try:
+        while not bot.eventsub or (standby and not bot.standby):
+            await asyncio.sleep(0.05)
+
+        count = int(args.rate * args.duration)
+        drop_at = count // 3
+        for i in range(count):
+            if i == drop_at:
+                await server.call(server.drop(bot.eventsub.active_session.id, args.outage))
+            await server.call(server.send_redemption(f'redemption {i}', f'viewer{i % 20}'))
+            await asyncio.sleep(1 / args.rate)
+        await asyncio.sleep(0.5)
+    finally:
+        chat.cancel()
+        await asyncio.gather(chat, return_exceptions=True)
+    queued = bot.sound_queue.qsize()
+    return {'sent': count, 'queued': queued, 'missed': count - queued, 'duplicates': bot.duplicates}
+
+
+async def run(args, server):
+    results = await time_reconnects(args, server)
+    print(f'reconnect to ready, median of {args.repeats}:')
+    for label, (seconds, stall) in results.items():
+        print(f'  {label:<20} {seconds * 1000:8.1f} ms, longest event loop stall {stall * 1000:6.1f} ms')
+    previous, fast = results['previous reconnect'][0], results['fast reconnect'][0]
+    print(f'  {previous / fast:.1f}x faster')
+
+    if server is None:
+        return
+    print(f'\nprimary connection dropped during {args.rate:.0f} redemptions/s for {args.duration:.0f} s, '
+          f'new connections refused for {args.outage:.0f} s:')
+    for standby in (False, True):
+        outcome = await drop_scenario(args, server, standby)
+        label = 'with standby' if standby else 'without standby'
+        print(f'  {label:<16} sent {outcome["sent"]}, queued {outcome["queued"]}, missed {outcome["missed"]}, '
+              f'duplicates dropped {outcome["duplicates"]}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark reconnecting to Twitch')
+    parser.add_argument('--cli', action='store_true', help='Use a running Twitch CLI instead of the stand-in')
+    parser.add_argument('--user-id', default='37989705', help='Mocked user ID, from `twitch mock-api generate` with --cli')
+    parser.add_argument('--latency', type=float, default=0.02, help='Stand-in API response delay in seconds')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--rate', type=float, default=20.0, help='Redemptions per second in the drop scenarios')
+    parser.add_argument('--duration', type=float, default=9.0, help='Seconds of redemptions in the drop scenarios')
+    parser.add_argument('--outage', type=float, default=3.0, help='Seconds new connections are refused after the drop')
+    args = parser.parse_args()
+
+    logger.setLevel(logging.ERROR)
+    for name in EXTERNAL_LOGGERS:
+        logging.getLogger(name).setLevel(logging.CRITICAL)
+
+    server = None
+    if not args.cli:
+        server = StandInTwitchServer(latency=args.latency)
+        server.start_background(CLIENT_ID)
+    try:
+        asyncio.run(run(args, server))
+    finally:
+        if server:
+            server.stop_background()
+
+
+if __name__ == '__main__':
+    main()
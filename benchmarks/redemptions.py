@@ -0,0 +1,133 @@
+"""
+Synthetic channel point redemptions for benchmarks.
+
+Builds EventSub and PubSub payloads shaped like the ones Twitch sends, with
+messages drawn from a configurable mix of chat, number-heavy, soundboard and
+effect-heavy messages.
+"""
+import random
+import uuid
+import zlib
+from datetime import datetime, timezone
+
+
+REWARD_NAME = 'TTS'
+SOUND_NAMES = ['airhorn', 'bruh', '150', 'beep']
+
+WORDS = [
+    'siema', 'wszystkim', 'co', 'tam', 'u', 'was', 'ale', 'to', 'jest', 'dobra', 'gra', 'zagraj', 'jeszcze',
+    'raz', 'pozdrawiam', 'cały', 'czat', 'dzisiaj', 'jutro', 'stream', 'był', 'świetny', 'dzięki', 'za',
+]
+
+# Message kind -> generator taking a random.Random
+MESSAGE_KINDS = {
+    'chat': lambda rng: ' '.join(rng.choices(WORDS, k=rng.randint(3, 15))),
+    'numbers': lambda rng: ' '.join(
+        str(rng.choice([2137, 69, 100, 420, rng.randint(0, 99999)])) if rng.random() < 0.4 else rng.choice(WORDS)
+        for _ in range(rng.randint(3, 12))
+    ),
+    'soundboard': lambda rng: ''.join(f'[{rng.choice(SOUND_NAMES)}]' for _ in range(rng.randint(1, 4))),
+    'effects': lambda rng: ' '.join([
+        ''.join(f'{{{rng.randint(1, 12)}}}' for _ in range(rng.randint(1, 3))),
+        ' '.join(rng.choices(WORDS, k=rng.randint(2, 6))),
+        f'[{rng.choice(SOUND_NAMES)}]',
+        '{.}',
+        ' '.join(rng.choices(WORDS, k=rng.randint(1, 4))),
+    ]),
+}
+
+DEFAULT_MIX = {'chat': 0.5, 'numbers': 0.2, 'soundboard': 0.15, 'effects': 0.15}
+
+
+def parse_mix(text):
+    """
+    Parse a message mix like `chat=0.5,soundboard=0.5`.
+
+    Returns:
+        dict: Message kind -> weight
+    """
+    mix = {}
+    for part in text.split(','):
+        kind, weight = part.split('=')
+        if kind not in MESSAGE_KINDS:
+            raise ValueError(f'Unknown message kind: {kind}, expected one of {", ".join(MESSAGE_KINDS)}')
+        mix[kind] = float(weight)
+    return mix
+
+
+def generate_messages(count, mix=None, seed=0):
+    """
+    Generate chat messages from a message mix.
+
+    Args:
+        count (int): Number of messages
+        mix (dict): Message kind -> weight, DEFAULT_MIX if not given
+        seed (int): Seed, the same seed gives the same messages
+
+    Returns:
+        list: (kind, text) tuples
+    """
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    kinds = rng.choices(list(mix), weights=list(mix.values()), k=count)
+    return [(kind, MESSAGE_KINDS[kind](rng)) for kind in kinds]
+
+
+def eventsub_payload(text, user='viewer', reward_name=REWARD_NAME, redemption_id=None):
+    """
+    Build a channel.channel_points_custom_reward_redemption.add notification.
+
+    Returns:
+        dict: Payload accepted by ChannelPointsCustomRewardRedemptionAddEvent(**payload)
+    """
+    now = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+    return {
+        'subscription': {
+            'id': str(uuid.uuid4()),
+            'type': 'channel.channel_points_custom_reward_redemption.add',
+            'version': '1',
+            'status': 'enabled',
+            'cost': 0,
+            'condition': {'broadcaster_user_id': '1234', 'reward_id': ''},
+            'transport': {'method': 'websocket', 'session_id': 'load-test'},
+            'created_at': now,
+        },
+        'event': {
+            'id': redemption_id or str(uuid.uuid4()),
+            'broadcaster_user_id': '1234',
+            'broadcaster_user_login': 'streamer',
+            'broadcaster_user_name': 'Streamer',
+            'user_id': str(zlib.crc32(user.encode('utf-8'))),
+            'user_login': user.lower(),
+            'user_name': user,
+            'user_input': text,
+            'status': 'unfulfilled',
+            'reward': {'id': 'reward-tts', 'title': reward_name, 'cost': 100, 'prompt': ''},
+            'redeemed_at': now,
+        },
+    }
+
+
+def pubsub_payload(text, user='viewer', reward_name=REWARD_NAME, redemption_id=None):
+    """
+    Build a channel-points-channel-v1 reward-redeemed message.
+
+    Returns:
+        dict: Payload as passed to PubSub callbacks
+    """
+    now = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+    return {
+        'type': 'reward-redeemed',
+        'data': {
+            'timestamp': now,
+            'redemption': {
+                'id': redemption_id or str(uuid.uuid4()),
+                'user': {'id': str(zlib.crc32(user.encode('utf-8'))), 'login': user.lower(), 'display_name': user},
+                'channel_id': '1234',
+                'redeemed_at': now,
+                'reward': {'id': 'reward-tts', 'channel_id': '1234', 'title': reward_name, 'cost': 100},
+                'user_input': text,
+                'status': 'UNFULFILLED',
+            },
+        },
+    }
@@ -0,0 +1,59 @@
+"""
+Benchmark effect rendering throughput of RenderPool by number of worker processes.
+
+Reports rendered audio seconds per wall-clock second for an effect-heavy chain.
+Run with `python -m benchmarks.render_pool` from the repository root.
+"""
+import argparse
+import asyncio
+import os
+import time
+from audio import SAMPLE_RATE
+from benchmarks.effects import make_clip
+from collections import Counter
+from render_pool import RenderPool
+
+
+async def measure(workers, clips, effect_counts):
+    pool = RenderPool(workers)
+    try:
+        # Start the worker processes before timing
+        await asyncio.gather(*(pool.render(clips[0][:SAMPLE_RATE], SAMPLE_RATE, effect_counts) for _ in range(pool.workers)))
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(pool.render(clip, SAMPLE_RATE, effect_counts) for clip in clips))
+        elapsed = time.perf_counter() - start
+    finally:
+        pool.shutdown()
+
+    return sum(len(result) for result in results) / SAMPLE_RATE, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark RenderPool scaling')
+    parser.add_argument('--segments', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=4.0, help='Length of each segment')
+    parser.add_argument('--effects', default='9,2,11', help='Comma separated effect IDs')
+    parser.add_argument('--workers', type=int, nargs='+', help='Worker counts to test, default 1, 2, 4 ... cores')
+    args = parser.parse_args()
+
+    effect_counts = Counter(int(effect_id) for effect_id in args.effects.split(','))
+    clips = [make_clip(args.seconds) for _ in range(args.segments)]
+
+    workers = args.workers
+    if not workers:
+        cores = os.cpu_count() or 1
+        workers = sorted({1, cores} | {2 ** i for i in range(1, cores.bit_length()) if 2 ** i < cores})
+
+    print(f'{args.segments} segments of {args.seconds}s, effects {dict(effect_counts)}')
+    print(f'{"workers":>8}{"audio s":>10}{"wall s":>10}{"audio s/s":>12}{"scaling":>10}')
+    baseline = None
+    for count in workers:
+        audio_seconds, elapsed = asyncio.run(measure(count, clips, effect_counts))
+        throughput = audio_seconds / elapsed
+        baseline = baseline or throughput
+        print(f'{count:>8}{audio_seconds:>10.1f}{elapsed:>10.2f}{throughput:>12.1f}{throughput / baseline:>9.2f}x')
+
+
+if __name__ == '__main__':
+    main()
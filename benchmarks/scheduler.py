@@ -0,0 +1,105 @@
+"""
+Benchmark the fair scheduler of the sound queue.
+
+Measures the cost of a push + pop at growing queue depths against a plain FIFO,
+and shows what a single user spamming redemptions does to everyone else's wait
+under both.
+
+Run with `python -m benchmarks.scheduler` from the repository root.
+"""
+import argparse
+import random
+import time
+from collections import deque
+from admission import CostEstimate
+from message_job import MessageJob
+from scheduler import FairScheduler, parse_lane_weights
+
+
+def make_job(rng, sender, lane='normal'):
+    job = MessageJob('x', sender, lane)
+    job.estimate = CostEstimate(rng.uniform(2.0, 10.0), 0.0)
+    return job
+
+
+def time_operations(depth, operations, users, seed):
+    """
+    Time push + pop pairs on a queue kept at a constant depth.
+
+    Returns:
+        tuple: (FIFO microseconds, fair scheduler microseconds) per push + pop
+    """
+    rng = random.Random(seed)
+    jobs = [make_job(rng, f'user{rng.randrange(users)}', 'priority' if rng.random() < 0.1 else 'normal')
+            for _ in range(depth + operations)]
+
+    fifo = deque(jobs[:depth])
+    start = time.perf_counter()
+    for job in jobs[depth:]:
+        fifo.append(job)
+        fifo.popleft()
+    fifo_time = time.perf_counter() - start
+
+    scheduler = FairScheduler(parse_lane_weights('priority=4,normal=1'))
+    for job in jobs[:depth]:
+        scheduler.push(job)
+    start = time.perf_counter()
+    for job in jobs[depth:]:
+        scheduler.push(job)
+        scheduler.pop()
+    fair_time = time.perf_counter() - start
+
+    return fifo_time / operations * 1e6, fair_time / operations * 1e6
+
+
+def spam_scenario(spam, others, seed):
+    """
+    One user queues `spam` messages, then `others` users queue one message each.
+
+    Returns:
+        tuple: (FIFO, fair) seconds of audio played before the last other user is heard
+    """
+    rng = random.Random(seed)
+    jobs = [make_job(rng, 'spammer') for _ in range(spam)]
+    jobs += [make_job(rng, f'viewer{i}') for i in range(others)]
+
+    def wait_for_others(order):
+        played = 0.0
+        remaining = others
+        for job in order:
+            if job.sender != 'spammer':
+                remaining -= 1
+                if not remaining:
+                    return played
+            played += job.estimate.audio_seconds
+        return played
+
+    scheduler = FairScheduler(parse_lane_weights('normal=1'))
+    for job in jobs:
+        scheduler.push(job)
+    fair_order = [scheduler.pop() for _ in range(len(jobs))]
+    return wait_for_others(jobs), wait_for_others(fair_order)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the fair sound queue scheduler')
+    parser.add_argument('--depths', default='100,1000,10000,100000', help='Comma separated queue depths')
+    parser.add_argument('--operations', type=int, default=20000, help='Push + pop pairs timed per depth')
+    parser.add_argument('--users', type=int, default=500, help='Distinct senders in the queue')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f'{"depth":>8} {"FIFO us/op":>12} {"fair us/op":>12}')
+    for depth in (int(depth) for depth in args.depths.split(',')):
+        fifo, fair = time_operations(depth, args.operations, args.users, args.seed)
+        print(f'{depth:>8} {fifo:>12.2f} {fair:>12.2f}')
+
+    spam, others = 50, 10
+    fifo_wait, fair_wait = spam_scenario(spam, others, args.seed)
+    print(f'\nOne user queues {spam} messages, then {others} others queue one each - '
+          f'audio played before the last of them is heard:')
+    print(f'  FIFO {fifo_wait:.0f} s, fair {fair_wait:.0f} s')
+
+
+if __name__ == '__main__':
+    main()
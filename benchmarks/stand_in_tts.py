@@ -0,0 +1,195 @@
+"""
+Local stand-in for the TTS server, used by the benchmarks.
+
+Serves `/api/tts?text=...` like tts-server does, but returns deterministic
+22050 Hz mono WAVs whose length depends on the text, after a configurable delay.
+Like tts-server, sentences are synthesized separately and joined with silence.
+Slow responses and failures can be injected to exercise the TTS client, and a
+per-character synthesis cost with serial processing imitates a single model.
+
+Run standalone with `python -m benchmarks.stand_in_tts --port 5002`.
+"""
+import argparse
+import asyncio
+import io
+import math
+import random
+import re
+import threading
+import wave
+import zlib
+from array import array
+from aiohttp import web
+
+
+SAMPLE_RATE = 22050
+SECONDS_PER_CHAR = 0.06
+# Silence tts-server puts between sentences
+SENTENCE_GAP_FRAMES = 10000
+SENTENCE_PATTERN = re.compile(r'(?<=[.!?])\s+')
+
+
+def synthesize_wav(text, seconds_per_char=SECONDS_PER_CHAR):
+    """
+    Generate a deterministic WAV for the given text, a tone per sentence.
+
+    Args:
+        text (str): Text to "synthesize"
+        seconds_per_char (float): Length of audio per character of text
+
+    Returns:
+        bytes: 16-bit mono WAV
+    """
+    samples = array('h')
+    for i, sentence in enumerate(sentence for sentence in SENTENCE_PATTERN.split(text.strip()) if sentence):
+        if i:
+            samples.extend(array('h', bytes(2 * SENTENCE_GAP_FRAMES)))
+        frames = max(1, int(len(sentence) * seconds_per_char * SAMPLE_RATE))
+        frequency = 200 + zlib.crc32(sentence.encode('utf-8')) % 400
+        period = round(SAMPLE_RATE / frequency)
+        tile = array('h', (int(8000 * math.sin(2 * math.pi * j / period)) for j in range(period)))
+        samples.extend((tile * (frames // period + 1))[:frames])
+    if not samples:
+        samples.append(0)
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+class StandInTTSServer:
+    """
+    Minimal HTTP server imitating the TTS server API.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, failure_rate=0.0, slow_rate=0.0, slow_latency=5.0, seed=None,
+                 char_latency=0.0, serial=False):
+        """
+        Initialize the stand-in server. Injection settings can also be changed while it runs.
+
+        Args:
+            host (str): Address to bind to
+            port (int): Port to bind to, 0 picks a free port
+            latency (float): Delay added to every response in seconds
+            failure_rate (float): Fraction of requests answered with HTTP 500
+            slow_rate (float): Fraction of requests delayed by slow_latency instead of latency
+            slow_latency (float): Delay of slow requests in seconds
+            seed (int): Seed of the injection randomness
+            char_latency (float): Synthesis time per character of text in seconds
+            serial (bool): Handle one request at a time, like a single model on one GPU
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.random = random.Random(seed)
+        self.char_latency = char_latency
+        self.lock = asyncio.Lock() if serial else None
+        self.requests = 0
+        self.failures = 0
+        self.runner = None
+        self.thread = None
+        self.loop = None
+
+    @property
+    def url(self):
+        return f'http://{self.host}:{self.port}/api/tts'
+
+    async def handle_tts(self, request):
+        if self.lock:
+            async with self.lock:
+                return await self.respond(request)
+        return await self.respond(request)
+
+    async def respond(self, request):
+        self.requests += 1
+        text = request.query.get('text', '')
+        latency = self.slow_latency if self.random.random() < self.slow_rate else self.latency
+        latency += len(text) * self.char_latency
+        if latency:
+            await asyncio.sleep(latency)
+        if self.random.random() < self.failure_rate:
+            self.failures += 1
+            return web.Response(status=500, text='Injected failure')
+        return web.Response(body=synthesize_wav(text), content_type='audio/wav')
+
+    async def start(self):
+        """
+        Start serving on the current event loop.
+        """
+        app = web.Application()
+        app.router.add_get('/api/tts', self.handle_tts)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """
+        Stop serving.
+        """
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+    def start_background(self):
+        """
+        Start serving on a separate thread with its own event loop.
+
+        Needed when the code under test blocks the caller's event loop.
+        """
+        started = threading.Event()
+        self.loop = asyncio.new_event_loop()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.loop.run_until_complete(self.start())
+            started.set()
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        started.wait()
+
+    def stop_background(self):
+        """
+        Stop a server started with start_background.
+        """
+        asyncio.run_coroutine_threadsafe(self.stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+async def serve_forever(args):
+    server = StandInTTSServer(args.host, args.port, args.latency, args.failure_rate, args.slow_rate, args.slow_latency,
+                              char_latency=args.char_latency, serial=args.serial)
+    await server.start()
+    print(f'Stand-in TTS server listening on {server.url}')
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Stand-in TTS server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5002)
+    parser.add_argument('--latency', type=float, default=0.0, help='Delay per response in seconds')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Fraction of requests failing with HTTP 500')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='Fraction of requests delayed by --slow-latency')
+    parser.add_argument('--slow-latency', type=float, default=5.0, help='Delay of slow requests in seconds')
+    parser.add_argument('--char-latency', type=float, default=0.0, help='Synthesis time per character in seconds')
+    parser.add_argument('--serial', action='store_true', help='Handle one request at a time')
+    try:
+        asyncio.run(serve_forever(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,276 @@
+"""
+Local stand-in for the Twitch CLI mock API and EventSub websocket server, used by the benchmarks.
+
+Serves the endpoints the bot uses in `local` mode - app and mocked user tokens
+under `/auth/`, users under `/mock/`, the EventSub websocket on `/ws` and
+creating and listing subscriptions on `/eventsub/subscriptions` - on a single port. Redemptions are
+sent to every subscribed websocket, connections can be dropped, and new
+connections refused for a while to imitate an outage.
+
+Run standalone with `python -m benchmarks.stand_in_twitch --port 8080`.
+"""
+import argparse
+import asyncio
+import threading
+import uuid
+from datetime import datetime, timezone
+from aiohttp import WSCloseCode, web
+from benchmarks.redemptions import eventsub_payload
+
+
+USER = {
+    'id': '37989705', 'login': 'streamer', 'display_name': 'Streamer', 'type': '', 'broadcaster_type': 'partner',
+    'description': '', 'profile_image_url': '', 'offline_image_url': '', 'view_count': 0,
+    'created_at': '2020-01-01T00:00:00Z',
+}
+SCOPES = ['channel:read:redemptions', 'chat:read', 'whispers:read']
+
+
+def now():
+    return datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+class StandInTwitchServer:
+    """
+    Minimal HTTP and websocket server imitating the Twitch CLI endpoints.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, keepalive=10):
+        """
+        Initialize the stand-in server.
+
+        Args:
+            host (str): Address to bind to
+            port (int): Port to bind to, 0 picks a free port
+            latency (float): Delay added to every API response in seconds
+            keepalive (int): Seconds between websocket keepalive messages
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.keepalive = keepalive
+        self.sessions = {}  # session ID -> websocket
+        self.subscriptions = {}  # subscription ID -> (session ID, subscription)
+        self.refuse_until = 0.0  # Loop time until which new websockets are refused
+        self.requests = 0
+        self.sent = 0
+        self.runner = None
+        self.thread = None
+        self.loop = None
+
+    @property
+    def url(self):
+        return f'http://{self.host}:{self.port}/'
+
+    @property
+    def endpoints(self):
+        """
+        Returns:
+            dict: base_url, auth_base_url, connection_url and subscription_url of the bot in local mode
+        """
+        return {
+            'base_url': f'{self.url}mock/',
+            'auth_base_url': f'{self.url}auth/',
+            'connection_url': f'ws://{self.host}:{self.port}/ws',
+            'subscription_url': self.url,
+        }
+
+    async def respond(self, data, status=200):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return web.json_response(data, status=status)
+
+    async def handle_token(self, request):
+        return await self.respond({'access_token': 'app-token', 'expires_in': 86400, 'token_type': 'bearer'})
+
+    async def handle_authorize(self, request):
+        return await self.respond({'access_token': 'user-token', 'refresh_token': '', 'scope': SCOPES})
+
+    async def handle_validate(self, request):
+        return await self.respond({
+            'client_id': request.app['client_id'] or request.headers.get('Client-Id', ''),
+            'login': USER['login'], 'user_id': USER['id'], 'scopes': SCOPES, 'expires_in': 86400,
+        })
+
+    async def handle_users(self, request):
+        return await self.respond({'data': [USER]})
+
+    async def handle_subscribe(self, request):
+        body = await request.json()
+        session_id = body['transport']['session_id']
+        if session_id not in self.sessions:
+            return await self.respond({'error': 'Bad Request', 'message': 'session does not exist'}, status=400)
+        subscription_id = str(uuid.uuid4())
+        subscription = {
+            'id': subscription_id, 'status': 'enabled', 'type': body['type'], 'version': body['version'],
+            'condition': body['condition'], 'transport': body['transport'], 'created_at': now(), 'cost': 0,
+        }
+        self.subscriptions[subscription_id] = (session_id, subscription)
+        return await self.respond({
+            'data': [subscription], 'total': len(self.subscriptions), 'total_cost': 0, 'max_total_cost': 10,
+        }, status=202)
+
+    async def handle_list_subscriptions(self, request):
+        subscription_type = request.query.get('type')
+        subscriptions = [
+            subscription for _, subscription in self.subscriptions.values()
+            if subscription_type is None or subscription['type'] == subscription_type
+        ]
+        return await self.respond({
+            'data': subscriptions, 'total': len(subscriptions), 'total_cost': 0, 'max_total_cost': 10, 'pagination': {},
+        })
+
+    async def handle_websocket(self, request):
+        if asyncio.get_running_loop().time() < self.refuse_until:
+            return web.Response(status=503, text='Outage')
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        session_id = str(uuid.uuid4())
+        self.sessions[session_id] = ws
+        await ws.send_json({
+            'metadata': {'message_id': str(uuid.uuid4()), 'message_type': 'session_welcome', 'message_timestamp': now()},
+            'payload': {'session': {
+                'id': session_id, 'status': 'connected', 'connected_at': now(),
+                'keepalive_timeout_seconds': self.keepalive, 'reconnect_url': None,
+            }},
+        })
+        keepalive = asyncio.create_task(self.send_keepalives(ws))
+        try:
+            async for _ in ws:
+                pass
+        finally:
+            keepalive.cancel()
+            self.sessions.pop(session_id, None)
+            for subscription_id in [key for key, value in self.subscriptions.items() if value[0] == session_id]:
+                del self.subscriptions[subscription_id]
+        return ws
+
+    async def send_keepalives(self, ws):
+        while not ws.closed:
+            await asyncio.sleep(self.keepalive)
+            await ws.send_json({
+                'metadata': {'message_id': str(uuid.uuid4()), 'message_type': 'session_keepalive', 'message_timestamp': now()},
+                'payload': {},
+            })
+
+    async def send_redemption(self, text, user='viewer', reward_name=None, redemption_id=None):
+        """
+        Send a redemption to every subscribed websocket, like Twitch does.
+
+        Returns:
+            int: Websockets it was sent to
+        """
+        payload = eventsub_payload(text, user, **({'reward_name': reward_name} if reward_name else {}),
+                                   redemption_id=redemption_id or str(uuid.uuid4()))
+        sent = 0
+        for subscription_id, (session_id, _) in list(self.subscriptions.items()):
+            ws = self.sessions.get(session_id)
+            if ws is None or ws.closed:
+                continue
+            payload['subscription']['id'] = subscription_id
+            payload['subscription']['transport']['session_id'] = session_id
+            await ws.send_json({
+                'metadata': {
+                    'message_id': str(uuid.uuid4()), 'message_type': 'notification', 'message_timestamp': now(),
+                    'subscription_type': payload['subscription']['type'], 'subscription_version': '1',
+                },
+                'payload': payload,
+            })
+            sent += 1
+        self.sent += 1
+        return sent
+
+    async def drop(self, session_id, outage=0.0):
+        """
+        Close a websocket, refusing new ones for `outage` seconds.
+        """
+        self.refuse_until = asyncio.get_running_loop().time() + outage
+        ws = self.sessions.get(session_id)
+        if ws is not None:
+            await ws.close(code=WSCloseCode.GOING_AWAY)
+
+    async def start(self, client_id=''):
+        """
+        Start serving on the current event loop.
+
+        Args:
+            client_id (str): Client ID returned by token validation, the requesting client's if empty
+        """
+        app = web.Application()
+        app['client_id'] = client_id
+        app.router.add_post('/auth/token', self.handle_token)
+        app.router.add_post('/auth/authorize', self.handle_authorize)
+        app.router.add_get('/auth/validate', self.handle_validate)
+        app.router.add_get('/mock/users', self.handle_users)
+        app.router.add_post('/eventsub/subscriptions', self.handle_subscribe)
+        app.router.add_get('/eventsub/subscriptions', self.handle_list_subscriptions)
+        app.router.add_get('/ws', self.handle_websocket)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """
+        Stop serving.
+        """
+        for ws in list(self.sessions.values()):
+            await ws.close()
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+    def start_background(self, client_id=''):
+        """
+        Start serving on a separate thread with its own event loop.
+        """
+        started = threading.Event()
+        self.loop = asyncio.new_event_loop()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.loop.run_until_complete(self.start(client_id))
+            started.set()
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        started.wait()
+
+    def call(self, coroutine):
+        """
+        Run a coroutine on the server's thread from another event loop.
+        """
+        return asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, self.loop))
+
+    def stop_background(self):
+        """
+        Stop a server started with start_background.
+        """
+        asyncio.run_coroutine_threadsafe(self.stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+async def serve_forever(args):
+    server = StandInTwitchServer(args.host, args.port, args.latency)
+    await server.start()
+    print(f'Stand-in Twitch server listening on {server.url}')
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Stand-in Twitch CLI mock API and EventSub websocket server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help='Delay per API response in seconds')
+    try:
+        asyncio.run(serve_forever(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
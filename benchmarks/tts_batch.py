@@ -0,0 +1,102 @@
+"""
+Benchmark batched TTS synthesis: one request per text run vs one request per message.
+
+The stand-in server charges a fixed overhead per request plus time per character,
+and handles one request at a time like a single model does. Messages mix text with
+sounds and effects, so they have several text runs each. Split audio is checked
+against the audio of the same runs synthesized one by one - they only differ by
+near-silent samples trimmed at the split points.
+
+Run with `python -m benchmarks.tts_batch` from the repository root.
+"""
+import argparse
+import asyncio
+import re
+import time
+from benchmarks.redemptions import SOUND_NAMES, generate_messages
+from benchmarks.stand_in_tts import StandInTTSServer
+from compile_message import TextRun, compile_message
+from fix_numbers import fix_numbers
+from tts_batch import TTSBatcher, read_pcm16
+from tts_client import TTSClient
+
+
+async def message_runs(messages):
+    """
+    Get the text runs of each message as synthesize_text sends them.
+    """
+    sounds = dict.fromkeys(SOUND_NAMES, object())
+    runs = []
+    for text in messages:
+        plan = compile_message(text, sounds, sound_cap=20, max_effect_repetitions=3)
+        texts = []
+        for token in plan.tokens:
+            if isinstance(token, TextRun):
+                run = await fix_numbers(token.text)
+                texts.append(run if re.match(r'.*(\.|!|\?)$', run) else run + '.')
+        runs.append(texts)
+    return [texts for texts in runs if texts]
+
+
+async def render(synthesize, runs, group):
+    """
+    Synthesize the runs of `group` messages at a time, like the render loop does with lookahead.
+
+    Returns:
+        tuple: (seconds per message, list of audio per run)
+    """
+    results = []
+    start = time.perf_counter()
+    for i in range(0, len(runs), group):
+        batch = [text for texts in runs[i:i + group] for text in texts]
+        results.extend(await asyncio.gather(*(synthesize(text) for text in batch)))
+    return (time.perf_counter() - start) / len(runs), results
+
+
+async def run(args, url, server):
+    messages = [text for kind, text in generate_messages(args.messages, {'effects': 0.7, 'chat': 0.3}, args.seed)]
+    runs = await message_runs(messages)
+    print(f'{len(runs)} messages, {sum(len(texts) for texts in runs) / len(runs):.1f} text runs per message, '
+          f'server overhead {args.overhead * 1000:.0f} ms + {args.char_latency * 1000:.1f} ms per character, serial')
+
+    client = TTSClient(url, concurrency=4)
+    try:
+        server.requests = 0
+        single_time, expected = await render(client.synthesize, runs, 1)
+        single_requests = server.requests
+        print(f'{"per run":<24} {single_time * 1000:8.1f} ms/message, {single_requests / len(runs):5.2f} requests/message')
+
+        for label, group, window in (('batched per message', 1, 0.0), (f'batched {args.group} messages', args.group, 0.005)):
+            batcher = TTSBatcher(client, window=window)
+            server.requests = 0
+            batch_time, results = await render(batcher.synthesize, runs, group)
+            difference = max(
+                abs(len(read_pcm16(result)[0]) - len(read_pcm16(reference)[0])) for result, reference in zip(results, expected)
+            )
+            print(f'{label:<24} {batch_time * 1000:8.1f} ms/message, {server.requests / len(runs):5.2f} requests/message, '
+                  f'{single_time / batch_time:.2f}x, {batcher.stats()}, '
+                  f'runs differ from per-run audio by up to {difference} samples')
+            await batcher.close()
+    finally:
+        await client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark batched TTS synthesis')
+    parser.add_argument('--messages', type=int, default=100)
+    parser.add_argument('--overhead', type=float, default=0.05, help='Stand-in server time per request in seconds')
+    parser.add_argument('--char-latency', type=float, default=0.0005, help='Stand-in server time per character')
+    parser.add_argument('--group', type=int, default=3, help='Messages rendered together in the cross-message mode')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    server = StandInTTSServer(latency=args.overhead, char_latency=args.char_latency, serial=True)
+    server.start_background()
+    try:
+        asyncio.run(run(args, server.url, server))
+    finally:
+        server.stop_background()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Exercise the TTS client against several stand-in servers with injected slow
+responses and failures.
+
+Compares segment latency of a single backend, the balanced pool and the pool
+with hedged requests, and prints the per-backend statistics of each run.
+Run with `python -m benchmarks.tts_pool` from the repository root.
+"""
+import argparse
+import asyncio
+import json
+import time
+from benchmarks.stand_in_tts import StandInTTSServer
+from tts_client import TTSClient
+
+
+TEXTS = ['siema wszystkim.', 'to jest dłuższa wiadomość.', 'dwa tysiące sto trzydzieści siedem.', 'ale śmieszne!']
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+async def run_scenario(urls, args, hedge_percentile):
+    client = TTSClient(urls, timeout=args.timeout, retries=2, concurrency=args.concurrency,
+                       deadline=args.deadline, hedge_percentile=hedge_percentile,
+                       health_interval=1.0, breaker_failures=3, breaker_cooldown=2.0)
+    latencies = []
+    failed = 0
+
+    async def segment(i):
+        nonlocal failed
+        start = time.perf_counter()
+        audio = await client.synthesize(TEXTS[i % len(TEXTS)])
+        latencies.append(time.perf_counter() - start)
+        failed += audio is None
+
+    try:
+        start = time.perf_counter()
+        # Segments arrive at a steady rate, like chat does
+        tasks = []
+        for i in range(args.segments):
+            tasks.append(asyncio.create_task(segment(i)))
+            await asyncio.sleep(1 / args.rate)
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    finally:
+        await client.close()
+
+    return {
+        'segments_per_second': round(args.segments / elapsed, 1),
+        'failed': failed,
+        **{f'p{p}_ms': round(percentile(latencies, p) * 1000, 1) for p in (50, 95, 99)},
+        'backends': client.stats(),
+    }
+
+
+async def run(args):
+    servers = {
+        'healthy': StandInTTSServer(latency=args.latency, seed=1),
+        'slow tail': StandInTTSServer(latency=args.latency, slow_rate=args.slow_rate, slow_latency=args.slow_latency, seed=2),
+        'failing': StandInTTSServer(latency=args.latency, failure_rate=args.failure_rate, seed=3),
+    }
+    for server in servers.values():
+        await server.start()
+
+    try:
+        urls = [server.url for server in servers.values()]
+        scenarios = [
+            ('single backend (slow tail)', [servers['slow tail'].url], 0.0),
+            ('pool', urls, 0.0),
+            (f'pool + hedging at p{args.hedge_percentile:g}', urls, args.hedge_percentile),
+        ]
+        results = {}
+        for name, scenario_urls, hedge_percentile in scenarios:
+            result = await run_scenario(scenario_urls, args, hedge_percentile)
+            results[name] = result
+            print(f'{name:<32} {result["segments_per_second"]:>6} seg/s  p50 {result["p50_ms"]:>7} ms  '
+                  f'p95 {result["p95_ms"]:>7} ms  p99 {result["p99_ms"]:>7} ms  failed {result["failed"]}')
+            if args.verbose:
+                print(json.dumps(result['backends'], indent=2))
+    finally:
+        for server in servers.values():
+            await server.stop()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exercise the TTS client against faulty stand-in servers')
+    parser.add_argument('--segments', type=int, default=300)
+    parser.add_argument('--rate', type=float, default=50.0, help='Segments started per second')
+    parser.add_argument('--concurrency', type=int, default=4, help='Requests in flight per backend')
+    parser.add_argument('--latency', type=float, default=0.05, help='Regular server delay in seconds')
+    parser.add_argument('--slow-rate', type=float, default=0.1, help='Fraction of slow responses of the slow server')
+    parser.add_argument('--slow-latency', type=float, default=1.0, help='Delay of slow responses in seconds')
+    parser.add_argument('--failure-rate', type=float, default=0.5, help='Fraction of failures of the failing server')
+    parser.add_argument('--hedge-percentile', type=float, default=90.0)
+    parser.add_argument('--timeout', type=float, default=5.0, help='Seconds per request')
+    parser.add_argument('--deadline', type=float, default=10.0, help='Seconds per segment')
+    parser.add_argument('--verbose', action='store_true', help='Print per-backend statistics')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark TTS requests: one curl process per segment vs the pooled TTSClient.
+
+Run with `python -m benchmarks.tts_requests` from the repository root.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import tempfile
+import time
+import urllib.parse
+from benchmarks.stand_in_tts import StandInTTSServer
+from platform import system
+from tts_client import TTSClient
+
+
+CURL_COMMAND = 'curl.exe' if system() == 'Windows' else 'curl'
+
+SEGMENTS = [
+    'siema wszystkim.',
+    'to jest dłuższa wiadomość do przeczytania przez bota.',
+    'dwa tysiące sto trzydzieści siedem.',
+    'ale śmieszne!',
+]
+
+
+def run_curl(url, texts, tmp_dir):
+    """
+    Old path - sequential curl subprocesses writing to files.
+    """
+    for i, text in enumerate(texts):
+        temp_filename = os.path.join(tmp_dir, f'{i}.wav')
+        subprocess.run(
+            [CURL_COMMAND, '-s', f'{url}?text={urllib.parse.quote_plus(text)}', '-o', temp_filename],
+            capture_output=True,
+            text=True
+        )
+
+
+async def run_client(url, texts, concurrency):
+    """
+    New path - pooled keep-alive client with concurrent requests.
+    """
+    client = TTSClient(url, concurrency=concurrency)
+    try:
+        results = await asyncio.gather(*(client.synthesize(text) for text in texts))
+    finally:
+        await client.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark TTS request paths')
+    parser.add_argument('--segments', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.0, help='Stand-in server delay per request in seconds')
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+
+    texts = [SEGMENTS[i % len(SEGMENTS)] for i in range(args.segments)]
+    server = StandInTTSServer(latency=args.latency)
+    server.start_background()
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            start = time.perf_counter()
+            run_curl(server.url, texts, tmp_dir)
+            curl_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = asyncio.run(run_client(server.url, texts, args.concurrency))
+        client_time = time.perf_counter() - start
+    finally:
+        server.stop_background()
+
+    failed = sum(1 for result in results if result is None)
+    print(f'segments: {args.segments}, server latency: {args.latency}s, concurrency: {args.concurrency}')
+    print(f'curl:      {args.segments / curl_time:8.1f} segments/s ({curl_time:.3f}s)')
+    print(f'TTSClient: {args.segments / client_time:8.1f} segments/s ({client_time:.3f}s, {failed} failed)')
+    print(f'speedup:   {curl_time / client_time:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+import re
+from collections import Counter
+from effects import EFFECT_NAMES
+from logger import logger
+
+
+# Sound references, effect blocks, and words
+TOKEN_PATTERN = re.compile(r'\[([^\]]*)\]|\{([^\}]*)\}|[^\[\]\{\} ]+')
+
+
+class TextRun:
+    """Consecutive words spoken by TTS."""
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+    def __repr__(self):
+        return f'TextRun({self.text!r})'
+
+
+class SoundRef:
+    """A sound from the sounds directory, already looked up."""
+    __slots__ = ('name', 'info')
+
+    def __init__(self, name, info):
+        self.name = name
+        self.info = info
+
+    def __repr__(self):
+        return f'SoundRef({self.name!r})'
+
+
+class EffectPush:
+    """`{n}` - adds effect n to the effects of the following segments."""
+    __slots__ = ('effect_id',)
+
+    def __init__(self, effect_id):
+        self.effect_id = effect_id
+
+    def __repr__(self):
+        return f'EffectPush({self.effect_id})'
+
+
+class EffectReset:
+    """`{.}` - clears all effects."""
+    __slots__ = ()
+
+    def __repr__(self):
+        return 'EffectReset()'
+
+
+class Segment:
+    """Text runs and sounds rendered together with the same effects."""
+    __slots__ = ('items', 'effects')
+
+    def __init__(self, items, effects):
+        """
+        Args:
+            items (list): TextRun and SoundRef tokens, in message order
+            effects (Counter): Effect ID -> number of repetitions, in chain order
+        """
+        self.items = items
+        self.effects = effects
+
+    @property
+    def passthrough(self):
+        """True for sounds without effects - their clips can be played as they are."""
+        return not self.effects and all(isinstance(item, SoundRef) for item in self.items)
+
+    def __repr__(self):
+        return f'Segment({self.items!r}, {dict(self.effects)!r})'
+
+
+class MessagePlan:
+    """Compiled message - typed tokens and the segments to render."""
+    __slots__ = ('tokens', 'segments')
+
+    def __init__(self, tokens, segments):
+        self.tokens = tokens
+        self.segments = segments
+
+    def __repr__(self):
+        return f'MessagePlan({self.segments!r})'
+
+
+def compile_message(text, sounds, sound_cap, max_effect_repetitions=None, warn=True):
+    """
+    Compile a message into typed tokens and render segments in a single pass.
+
+    Sounds are looked up and the sound cap and effect repetition limits are
+    applied here, so rendering doesn't need to re-parse anything:
+    - `[name]` of a known sound becomes a SoundRef, dropped above the sound cap;
+      unknown names are spoken as text
+    - `{n}` of a known effect becomes an EffectPush, dropped above the repetition limit
+    - `{.}` becomes an EffectReset
+    - other words are merged into TextRuns
+
+    Args:
+        text (str): The message
+        sounds (dict): Available sounds, name -> SoundInfo
+        sound_cap (int): Maximum number of sounds in the message
+        max_effect_repetitions (int): Maximum repetitions of a single effect, None for no limit
+        warn (bool): Log invalid input and unknown effects, False for passes that only inspect the message
+
+    Returns:
+        MessagePlan: The compiled message
+    """
+    if not text or not isinstance(text, str):
+        if warn:
+            logger.warning(f"Invalid input to compile_message: {text}")
+        return MessagePlan([], [])
+
+    tokens = []
+    segments = []
+    items = []
+    effects = Counter()
+    words = []
+    sound_count = 0
+
+    def end_text():
+        if words:
+            run = TextRun(' '.join(words))
+            tokens.append(run)
+            items.append(run)
+            words.clear()
+
+    def end_segment():
+        nonlocal items
+        end_text()
+        if items:
+            segments.append(Segment(items, effects.copy()))
+            items = []
+
+    for match in TOKEN_PATTERN.finditer(text):
+        sound_name, effect = match.group(1, 2)
+
+        if sound_name is not None:
+            end_text()
+            info = sounds.get(sound_name)
+            if info is None:
+                run = TextRun(match.group())
+                tokens.append(run)
+                items.append(run)
+            elif sound_count < sound_cap:
+                sound = SoundRef(sound_name, info)
+                tokens.append(sound)
+                items.append(sound)
+                sound_count += 1
+
+        elif effect is not None:
+            if effect == '.':
+                end_segment()
+                tokens.append(EffectReset())
+                effects.clear()
+            elif effect.isdigit() and effect.isascii():
+                end_segment()
+                effect_id = int(effect)
+                if effect_id not in EFFECT_NAMES:
+                    if warn:
+                        logger.warning(f"Unknown effect ID: {effect_id}")
+                elif max_effect_repetitions is None or effects[effect_id] < max_effect_repetitions:
+                    tokens.append(EffectPush(effect_id))
+                    effects[effect_id] += 1
+            else:
+                end_text()
+                run = TextRun(match.group())
+                tokens.append(run)
+                items.append(run)
+
+        else:
+            words.append(match.group())
+
+    end_segment()
+    return MessagePlan(tokens, segments)
@@ -0,0 +1,343 @@
+import logging
+import os
+import numpy as np
+from audio import resample
+from logger import logger
+from platform import system
+
+
+if system() == 'Windows':
+    sox_path = r'sox'
+    os.environ['PATH'] = sox_path + ';' + os.environ['PATH']
+    import sox
+else:
+    import sox
+
+logging.getLogger('sox').setLevel(logging.ERROR)
+
+
+EFFECT_NAMES = {
+    1: 'room echo',
+    2: 'hall echo',
+    3: 'outside echo',
+    4: 'pitch down',
+    5: 'pitch up',
+    6: 'telephone',
+    7: 'muffled',
+    8: 'quieter',
+    9: 'ghost',
+    10: 'chorus',
+    11: 'slow down',
+    12: 'speed up',
+}
+
+# Frame length of the phase vocoder time stretcher
+STRETCH_FRAME = 1024
+
+
+def _fft_size(n):
+    """Smallest power of two not less than n."""
+    return 1 << (int(n) - 1).bit_length()
+
+
+def _db_to_gain(db):
+    return 10 ** (db / 20)
+
+
+# Building blocks - all operate on float32 mono samples
+
+def gain(samples, db):
+    return samples * np.float32(_db_to_gain(db))
+
+
+def pad(samples, sample_rate, start, end):
+    return np.concatenate([
+        np.zeros(int(start * sample_rate), dtype=np.float32),
+        samples,
+        np.zeros(int(end * sample_rate), dtype=np.float32),
+    ])
+
+
+def reverse(samples):
+    return samples[::-1].copy()
+
+
+def _biquad(samples, b, a, tail=2048):
+    """
+    Apply a biquad filter by multiplying the spectrum with its frequency response.
+
+    The signal is zero padded by `tail` samples so the decaying impulse response
+    doesn't wrap around.
+    """
+    n = _fft_size(len(samples) + tail)
+    z = np.exp(-1j * np.linspace(0, np.pi, n // 2 + 1))
+    response = (b[0] + b[1] * z + b[2] * z ** 2) / (a[0] + a[1] * z + a[2] * z ** 2)
+    return np.fft.irfft(np.fft.rfft(samples, n) * response, n)[:len(samples)].astype(np.float32)
+
+
+def highpass(samples, sample_rate, frequency, q=0.707):
+    """Two-pole Butterworth high-pass filter, like sox `highpass`."""
+    w0 = 2 * np.pi * frequency / sample_rate
+    alpha = np.sin(w0) / (2 * q)
+    cos_w0 = np.cos(w0)
+    b = ((1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2)
+    a = (1 + alpha, -2 * cos_w0, 1 - alpha)
+    return _biquad(samples, b, a)
+
+
+def lowpass(samples, sample_rate, frequency, q=0.707):
+    """Two-pole Butterworth low-pass filter, like sox `lowpass`."""
+    w0 = 2 * np.pi * frequency / sample_rate
+    alpha = np.sin(w0) / (2 * q)
+    cos_w0 = np.cos(w0)
+    b = ((1 - cos_w0) / 2, 1 - cos_w0, (1 - cos_w0) / 2)
+    a = (1 + alpha, -2 * cos_w0, 1 - alpha)
+    return _biquad(samples, b, a)
+
+
+def reverb(samples, sample_rate, reverberance=50, high_freq_damping=50, room_scale=100, pre_delay=0, wet_gain=0):
+    """
+    Reverb by FFT convolution with a synthetic, exponentially decaying impulse response.
+
+    Parameters follow sox `reverb`. Output keeps the input length, like sox.
+    """
+    if not len(samples):
+        return samples
+
+    rt60 = 0.05 + 3.0 * (reverberance / 100) * np.sqrt(room_scale / 100)
+    ir_length = int(rt60 * sample_rate)
+    t = np.arange(ir_length, dtype=np.float32) / sample_rate
+    rng = np.random.default_rng(ir_length)
+    ir = rng.standard_normal(ir_length).astype(np.float32) * np.exp(-6.9 * t / rt60)
+
+    # High frequencies decay faster with more damping
+    ir_spectrum = np.fft.rfft(ir)
+    frequencies = np.fft.rfftfreq(ir_length, 1 / sample_rate)
+    cutoff = 12000 - 100 * high_freq_damping
+    ir = np.fft.irfft(ir_spectrum / (1 + (frequencies / cutoff) ** 2), ir_length).astype(np.float32)
+    ir /= np.sqrt(np.sum(ir ** 2))
+
+    delay = int(pre_delay / 1000 * sample_rate)
+    n = _fft_size(len(samples) + ir_length + delay)
+    wet = np.fft.irfft(np.fft.rfft(samples, n) * np.fft.rfft(np.pad(ir, (delay, 0)), n), n)[:len(samples)]
+    return (samples + wet.astype(np.float32) * np.float32(0.5 * _db_to_gain(wet_gain))) / np.float32(1.5)
+
+
+def _overlap_add(frames, hop):
+    """
+    Overlap-add frames spaced `hop` samples apart.
+
+    With frame length a multiple of hop, every n-th frame tiles the output
+    contiguously, so each of the n groups is added as one flat array.
+    """
+    n_frames, frame = frames.shape
+    overlap = frame // hop
+    out = np.zeros((n_frames - 1) * hop + frame, dtype=np.float32)
+    for offset in range(overlap):
+        group = frames[offset::overlap].ravel()
+        out[offset * hop:offset * hop + len(group)] += group
+    return out
+
+
+def time_stretch(samples, factor, frame=STRETCH_FRAME):
+    """
+    Change duration by `factor` without changing pitch, using a phase vocoder.
+
+    Magnitudes are interpolated between analysis frames and phases accumulated
+    with a cumulative sum, so the whole stretch is vectorized.
+    """
+    if not len(samples):
+        return samples
+
+    hop = frame // 4
+    window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(frame) / frame)).astype(np.float32)
+    out_length = int(round(len(samples) * factor))
+
+    # Analysis - frames centered on multiples of hop
+    padded = np.pad(samples, (frame // 2, frame // 2 + hop))
+    n_frames = (len(padded) - frame) // hop + 1
+    starts = np.arange(n_frames) * hop
+    spectrum = np.fft.rfft(padded[starts[:, None] + np.arange(frame)] * window, axis=1)
+
+    # Fractional analysis positions of the output frames
+    steps = np.arange(0, n_frames - 1, 1 / factor)
+    index = steps.astype(np.int64)
+    alpha = (steps - index)[:, None].astype(np.float32)
+    magnitude = (1 - alpha) * np.abs(spectrum[index]) + alpha * np.abs(spectrum[index + 1])
+
+    # Phase advance per frame, deviation from the bin frequency wrapped to [-pi, pi]
+    expected = 2 * np.pi * hop * np.arange(frame // 2 + 1) / frame
+    angles = np.angle(spectrum)
+    deviation = angles[index + 1] - angles[index] - expected
+    deviation -= 2 * np.pi * np.round(deviation / (2 * np.pi))
+    phase = np.empty_like(deviation)
+    phase[0] = angles[0]
+    phase[1:] = angles[0] + np.cumsum(expected + deviation[:-1], axis=0)
+
+    # Synthesis - Hann squared at 75% overlap sums to 1.5
+    frames = np.fft.irfft(magnitude * np.exp(1j * phase), frame, axis=1).astype(np.float32) * window
+    out = _overlap_add(frames, hop) / np.float32(1.5)
+    return out[frame // 2:frame // 2 + out_length]
+
+
+def pitch(samples, semitones):
+    """Shift pitch without changing duration, like sox `pitch`."""
+    ratio = 2 ** (semitones / 12)
+    return resample(time_stretch(samples, ratio), len(samples))
+
+
+def tempo(samples, factor):
+    """Change speed without changing pitch, like sox `tempo`."""
+    return time_stretch(samples, 1 / factor)
+
+
+def chorus(samples, sample_rate, gain_in=0.5, gain_out=0.9, n_voices=3, seed=0):
+    """
+    Chorus made of modulated delay lines, with sox `chorus` default parameter ranges.
+
+    Voice parameters are seeded so renders are reproducible.
+    """
+    if not len(samples):
+        return samples
+    rng = np.random.default_rng(seed)
+    t = np.arange(len(samples), dtype=np.float32)
+    out = samples * np.float32(gain_in)
+
+    for _ in range(n_voices):
+        delay = rng.uniform(40, 60) / 1000 * sample_rate
+        decay = rng.uniform(0.3, 0.4)
+        speed = rng.uniform(0.25, 0.4)
+        depth = rng.uniform(1, 3) / 1000 * sample_rate
+        positions = t - delay - depth * np.sin(2 * np.pi * speed * t / sample_rate)
+        out += np.float32(decay) * np.interp(positions, t, samples, left=0).astype(np.float32)
+
+    return out * np.float32(gain_out)
+
+
+def ghost(samples, sample_rate):
+    """Reverse reverb - pad, reverse, reverb, reverse, reverb."""
+    samples = pad(samples, sample_rate, 0.5, 0.5)
+    samples = reverse(reverb(reverse(samples), sample_rate, reverberance=50, wet_gain=1))
+    return reverb(samples, sample_rate)
+
+
+EFFECTS = {
+    1: lambda x, rate: reverb(x, rate, 50, room_scale=25),
+    2: lambda x, rate: reverb(x, rate, 75, room_scale=75, wet_gain=1),
+    3: lambda x, rate: reverb(x, rate, 5, room_scale=5),
+    4: lambda x, rate: pitch(x, -5),
+    5: lambda x, rate: pitch(x, 5),
+    6: lambda x, rate: gain(highpass(x, rate, 800), 2),
+    7: lambda x, rate: gain(lowpass(x, rate, 1200), 1),
+    8: lambda x, rate: gain(x, -20),
+    9: ghost,
+    10: lambda x, rate: chorus(x, rate),
+    11: lambda x, rate: tempo(x, 0.5),
+    12: lambda x, rate: tempo(x, 1.5),
+}
+
+
+def apply_effects(samples, sample_rate, effect_counts):
+    """
+    Apply effects in memory with NumPy.
+
+    Args:
+        samples (np.ndarray): float32 mono samples
+        sample_rate (int): Sample rate in Hz
+        effect_counts (Counter): Effect ID -> number of repetitions, in chain order
+
+    Returns:
+        np.ndarray: Processed float32 samples
+    """
+    for effect_id, count in effect_counts.items():
+        effect = EFFECTS.get(effect_id)
+        if effect is None:
+            logger.warning(f"Unknown effect ID: {effect_id}")
+            continue
+        for _ in range(count):
+            samples = effect(samples, sample_rate)
+    return samples
+
+
+def sox_transformer(effect_counts):
+    """
+    Build the equivalent sox effect chain.
+
+    Args:
+        effect_counts (Counter): Effect ID -> number of repetitions, in chain order
+
+    Returns:
+        sox.Transformer: Transformer with all effects added
+    """
+    tfm = sox.Transformer()
+
+    for effect_id, count in effect_counts.items():
+        for _ in range(count):
+            if effect_id == 1:
+                # room echo
+                tfm.reverb(50, room_scale=25)
+            elif effect_id == 2:
+                # hall echo
+                tfm.reverb(75, room_scale=75, wet_gain=1)
+            elif effect_id == 3:
+                # outside echo
+                tfm.reverb(5, room_scale=5)
+            elif effect_id == 4:
+                # pitch down
+                tfm.pitch(-5)  # half an octave
+            elif effect_id == 5:
+                # pitch up
+                tfm.pitch(5)  # half an octave
+            elif effect_id == 6:
+                # telephone
+                tfm.highpass(800).gain(2)
+            elif effect_id == 7:
+                # muffled
+                tfm.lowpass(1200).gain(1)
+            elif effect_id == 8:
+                # quieter
+                tfm.gain(-20)
+            elif effect_id == 9:
+                # ghost
+                (tfm
+                    .pad(0.5, 0.5)
+                    .reverse()
+                    .reverb(reverberance=50, wet_gain=1)
+                    .reverse()
+                    .reverb())
+            elif effect_id == 10:
+                # chorus
+                tfm.chorus()
+            elif effect_id == 11:
+                # slow down
+                tfm.tempo(0.5)
+            elif effect_id == 12:
+                # speed up
+                tfm.tempo(1.5)
+            else:
+                logger.warning(f"Unknown effect ID: {effect_id}")
+
+    return tfm
+
+
+def render(samples, sample_rate, effect_counts, backend='numpy'):
+    """
+    Apply effects with the selected backend.
+
+    Blocking - meant to run in an executor.
+
+    Args:
+        samples (np.ndarray): float32 mono samples
+        sample_rate (int): Sample rate in Hz
+        effect_counts (Counter): Effect ID -> number of repetitions, in chain order
+        backend (str): numpy or sox
+
+    Returns:
+        np.ndarray: Processed float32 samples
+    """
+    if backend == 'sox':
+        # Audio goes through sox stdin/stdout pipes, not files
+        return sox_transformer(effect_counts).build_array(
+            input_array=samples, sample_rate_in=sample_rate
+        ).reshape(-1).astype(np.float32)
+    return apply_effects(samples, sample_rate, effect_counts)
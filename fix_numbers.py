@@ -1,46 +1,50 @@
+import re
+from functools import lru_cache
 from num2words import num2words
 from logger import logger
 
 
-async def fix_numbers(text):
+# Runs of digits
+NUMBER_PATTERN = re.compile(r'\d+')
+
+
+@lru_cache(maxsize=4096)
+def number_to_words(digits, max_digits):
+    """
+    Convert a run of digits to words. Results are memoized, chat repeats the same numbers a lot.
+
+    Runs longer than max_digits are read digit by digit instead, and only up to
+    max_digits digits - a huge number would otherwise turn into a minutes long TTS request.
+
+    Args:
+        digits (str): Run of digits
+        max_digits (int): Longest run converted as a whole number
+
+    Returns:
+        str: The number in words
+    """
+    try:
+        if len(digits) > max_digits:
+            return ' '.join(num2words(int(digit), lang='pl') for digit in digits[:max_digits])
+        return num2words(int(digits), lang='pl')
+    except (ValueError, NotImplementedError, OverflowError) as e:
+        logger.warning(f"Could not convert number '{digits}': {e}")
+        return digits
+
+
+async def fix_numbers(text, max_digits=15):
     """
     Convert numeric digits in text to their word representation.
 
     Args:
         text (str): Text containing numeric digits to convert
+        max_digits (int): Longest run of digits converted as a whole number
 
     Returns:
         str: Text with numeric digits converted to words
     """
     try:
-        symbols = []
-        symbol_buffer = ''
-
-        for symbol in text:
-            if symbol.isnumeric():
-                # Add numeric symbol to buffer because it might contain more numbers
-                symbol_buffer += symbol
-            else:
-                if symbol_buffer:
-                    # Convert number to word and add to list of symbols
-                    try:
-                        symbols.append(num2words(int(symbol_buffer), lang='pl'))
-                    except ValueError as e:
-                        logger.warning(f"Could not convert number '{symbol_buffer}': {e}")
-                        symbols.append(symbol_buffer)
-                    symbol_buffer = ''
-                symbols.append(symbol)
-
-        # Don't forget to process any remaining numbers in the buffer
-        if symbol_buffer:
-            try:
-                symbols.append(num2words(int(symbol_buffer), lang='pl'))
-            except ValueError as e:
-                logger.warning(f"Could not convert number '{symbol_buffer}': {e}")
-                symbols.append(symbol_buffer)
-
-        # Join list of symbols back into a string
-        return ''.join(symbols)
+        return NUMBER_PATTERN.sub(lambda match: number_to_words(match.group(), max_digits), text)
 
     except Exception as e:
         logger.error(f"Error in fix_numbers: {e}")
@@ -0,0 +1,226 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from logger import logger
+
+
+JOURNAL_PATH = os.path.join('cache', 'journal.log')
+
+# Fields an add record needs to be replayed
+ADD_FIELDS = {'id', 'text', 'sender', 'lane', 'at'}
+
+
+class Journal:
+    """
+    Append-only journal of accepted messages and their completion, for replay after a crash.
+
+    Every accepted message is written as an `add` record, and a `done` record
+    follows once it is played or dropped. Records are buffered and written with a
+    single fsync every `flush_interval` seconds on an executor thread, so
+    ingestion never waits for the disk. On start, `replay` returns the messages
+    added but not done. Once most of the file is finished messages, it is
+    rewritten with the undelivered ones only.
+    """
+
+    def __init__(self, path=JOURNAL_PATH, flush_interval=0.05, compact_bytes=1024 * 1024):
+        """
+        Initialize the journal.
+
+        Args:
+            path (str): Journal file
+            flush_interval (float): Seconds between writes, the most recent messages lost in a crash
+            compact_bytes (int): File size after which it is compacted
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.compact_bytes = compact_bytes
+
+        self.live = {}  # journal ID -> add record line of undelivered messages
+        self.live_bytes = 0
+        self.buffer = []  # Record lines not written yet
+        self.size = 0  # Bytes in the file
+        self.next_id = 1
+        self.file = None
+
+        # Writes happen one at a time, off the event loop
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='journal')
+        self.writing = None
+
+        self.flushes = 0
+        self.compactions = 0
+
+    def replay(self):
+        """
+        Read the journal and open it for appending.
+
+        Returns:
+            list: add records (dicts with id, text, sender, lane, redemption_id and at) of undelivered messages, oldest first
+        """
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b''
+
+        records = {}
+        valid_bytes = 0
+        for line in data.splitlines(keepends=True):
+            try:
+                if not line.endswith(b'\n'):
+                    raise ValueError('incomplete record')
+                record = json.loads(line)
+                journal_id = record['id']
+                if not isinstance(journal_id, int) or record['op'] not in ('add', 'done'):
+                    raise ValueError('invalid record')
+                if record['op'] == 'add' and not (ADD_FIELDS <= record.keys() and isinstance(record['text'], str)):
+                    raise ValueError('invalid add record')
+            except (ValueError, KeyError, TypeError):
+                # A record torn by a crash, or cut short by a compaction, can only be the last one
+                logger.warning(f'Ignoring damaged end of journal {self.path} at byte {valid_bytes}')
+                break
+            valid_bytes += len(line)
+            self.next_id = max(self.next_id, journal_id + 1)
+            if record['op'] == 'add':
+                records[journal_id] = record
+                self.live[journal_id] = line.decode('utf-8').rstrip('\n')
+                self.live_bytes += len(line)
+            elif journal_id in records:
+                del records[journal_id]
+                self.live_bytes -= len(self.live.pop(journal_id).encode('utf-8')) + 1
+
+        self.file = open(self.path, 'ab')
+        if valid_bytes < len(data):
+            self.file.truncate(valid_bytes)
+        self.size = valid_bytes
+        return list(records.values())
+
+    def add(self, job):
+        """
+        Record an accepted message.
+
+        Args:
+            job (MessageJob): The message
+
+        Returns:
+            int: Journal ID of the message
+        """
+        journal_id = self.next_id
+        self.next_id += 1
+        line = json.dumps({
+            'op': 'add', 'id': journal_id, 'text': job.text, 'sender': job.sender, 'lane': job.lane,
+            'redemption_id': job.redemption_id, 'at': time.time(),
+        }, ensure_ascii=False)
+        self.live[journal_id] = line
+        self.live_bytes += len(line.encode('utf-8')) + 1
+        self.buffer.append(line)
+        return journal_id
+
+    def done(self, journal_id):
+        """
+        Record that a message was played or dropped.
+
+        Args:
+            journal_id (int): Journal ID of the message, None for messages not in the journal
+        """
+        line = self.live.pop(journal_id, None)
+        if line is not None:
+            self.live_bytes -= len(line.encode('utf-8')) + 1
+            self.buffer.append(json.dumps({'op': 'done', 'id': journal_id}))
+
+    def _append(self, lines):
+        data = ''.join(f'{line}\n' for line in lines).encode('utf-8')
+        self.file.write(data)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return len(data)
+
+    def _rewrite(self, lines):
+        """
+        Replace the journal with the given records, atomically.
+        """
+        temp_path = f'{self.path}.tmp'
+        data = ''.join(f'{line}\n' for line in lines).encode('utf-8')
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self.file.close()
+        os.replace(temp_path, self.path)
+        self.file = open(self.path, 'ab')
+        return len(data)
+
+    def _write(self):
+        """
+        Take the buffered records and build the write to make.
+
+        Returns:
+            tuple: (function, lines) to run on the executor, or None if there is nothing to write
+        """
+        if not self.buffer:
+            return None
+        lines, self.buffer = self.buffer, []
+        if self.size + sum(len(line) + 1 for line in lines) > self.compact_bytes and self.live_bytes * 2 < self.compact_bytes:
+            # The undelivered messages include everything buffered, the rest is done
+            self.compactions += 1
+            return self._rewrite, list(self.live.values())
+        return self._append, lines
+
+    async def flush(self):
+        """
+        Write and fsync the buffered records.
+        """
+        write = self._write()
+        if write is None:
+            return
+        function, lines = write
+        self.writing = self.executor.submit(function, lines)
+        try:
+            written = await asyncio.wrap_future(self.writing)
+        except OSError as e:
+            logger.error(f'Could not write journal {self.path}: {e}')
+            return
+        self.size = written if function == self._rewrite else self.size + written
+        self.flushes += 1
+
+    async def run(self):
+        """
+        Flush the journal periodically until cancelled, then flush what is left.
+        """
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Write the buffered records and close the file.
+        """
+        if self.file is None:
+            return
+        try:
+            if self.writing:
+                # A write cancelled on the event loop still finishes on its thread
+                self.writing.result()
+            write = self._write()
+            if write is not None:
+                function, lines = write
+                function(lines)
+        except OSError as e:
+            logger.error(f'Could not write journal {self.path}: {e}')
+        self.file.close()
+        self.file = None
+        self.executor.shutdown()
+
+    def stats(self):
+        """
+        Get journal counters.
+
+        Returns:
+            dict: Undelivered messages, file size, flushes and compactions
+        """
+        return {'undelivered': len(self.live), 'bytes': self.size, 'flushes': self.flushes, 'compactions': self.compactions}
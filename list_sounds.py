@@ -1,40 +1,171 @@
+import hashlib
+import json
 import os
+import struct
+from collections import namedtuple
+from audio import WAVE_FORMAT_IEEE_FLOAT, WAVE_FORMAT_PCM, parse_wav_header
+from concurrent.futures import ThreadPoolExecutor
 from logger import logger
-from platform import system
 
 
-system = system()
-if system == 'Windows':
-    sox_path = r'sox'
-    os.environ['PATH'] = sox_path + ';' + os.environ['PATH']
-    import sox
-else:
-    import sox
+SOUNDS_DIRECTORY = 'sounds'
+MANIFEST_PATH = os.path.join('cache', 'sounds_manifest.json')
+MANIFEST_VERSION = 2
+
+REQUIRED_CHANNELS = 1
+REQUIRED_SAMPLE_RATE = 22050
+
+# Formats the decoder understands - integer PCM and IEEE float
+SUPPORTED_FORMATS = (WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT)
+
+
+class SoundInfo(namedtuple('SoundInfo', 'path size mtime_ns format_tag channels sample_rate bits_per_sample data_offset data_size')):
+    """
+    Header information of a sound file, as stored in the manifest.
+    """
+    __slots__ = ()
+
+    @property
+    def frames(self):
+        return self.data_size // (self.channels * self.bits_per_sample // 8)
+
+    @property
+    def duration(self):
+        return self.frames / self.sample_rate
+
+
+def read_wav_header(path):
+    """
+    Read the format and data location of a WAV file without decoding it.
+
+    Args:
+        path (str): Path to the WAV file
+
+    Returns:
+        tuple: (format_tag, channels, sample_rate, bits_per_sample, data_offset, data_size),
+            with the subformat as format tag of WAVE_FORMAT_EXTENSIBLE files
+    """
+    with open(path, 'rb') as f:
+        return parse_wav_header(f)
+
+
+def probe_sound(path, size, mtime_ns):
+    """
+    Probe a sound file for the manifest.
+
+    Returns:
+        SoundInfo: Header information, or None if the file can't be read
+    """
+    try:
+        return SoundInfo(path, size, mtime_ns, *read_wav_header(path))
+    except (OSError, ValueError, struct.error) as e:
+        logger.error(f'Error analyzing sound file {path}: {e}')
+        return None
+
+
+def load_manifest():
+    """
+    Load the sound manifest from the previous run.
+
+    Returns:
+        dict: path -> SoundInfo
+    """
+    try:
+        with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') != MANIFEST_VERSION:
+            return {}
+        return {entry[0]: SoundInfo(*entry) for entry in manifest['sounds']}
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.warning(f'Could not load sound manifest, rescanning all sounds: {e}')
+        return {}
+
+
+def save_manifest(infos):
+    """
+    Save the sound manifest for the next run.
+
+    Args:
+        infos (list): SoundInfo of every readable sound file
+    """
+    try:
+        os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+        temp_path = f'{MANIFEST_PATH}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'sounds': [list(info) for info in infos]}, f)
+        os.replace(temp_path, MANIFEST_PATH)
+    except OSError as e:
+        logger.warning(f'Could not save sound manifest: {e}')
+
+
+def sounds_fingerprint(sounds):
+    """
+    Identify the state of the sound library - changes when any sound is added, removed or modified.
+
+    Args:
+        sounds (dict): sound name -> SoundInfo, from list_sounds
+
+    Returns:
+        str: Hex digest of the names, sizes and modification times
+    """
+    digest = hashlib.sha256()
+    for name in sorted(sounds):
+        info = sounds[name]
+        digest.update(f'{name}\0{info.size}\0{info.mtime_ns}\n'.encode('utf-8'))
+    return digest.hexdigest()
 
 
 def list_sounds():
-    sounds = []
-    sounds_directory = "sounds"
+    """
+    Index the sounds directory.
+
+    Files unchanged since the last run (same size and modification time) are taken
+    from the manifest, only new or changed files have their headers read.
+
+    Returns:
+        dict: sound name (without brackets) -> SoundInfo of every valid sound
+    """
+    sounds = {}
     logger.info('Loading sounds...')
-    
+
     # Check if sounds directory exists
-    if not os.path.exists(sounds_directory):
-        logger.warning(f'Sounds directory {sounds_directory} does not exist. Creating it.')
-        os.makedirs(sounds_directory)
-        
+    if not os.path.exists(SOUNDS_DIRECTORY):
+        logger.warning(f'Sounds directory {SOUNDS_DIRECTORY} does not exist. Creating it.')
+        os.makedirs(SOUNDS_DIRECTORY)
+
     try:
-        for filename in os.listdir(sounds_directory):
-            if filename.endswith('.wav'):
-                fullpath = f'{sounds_directory}/{filename}'
-
-                try:
-                    # Check number of channels and sample rate
-                    if sox.file_info.channels(fullpath) == 1 and sox.file_info.sample_rate(fullpath) == 22050.0:
-                        sounds.append(f'[{filename[:-4]}]')
-                    else:
-                        logger.error(f'File {fullpath} is not mono channel or has wrong samplerate.')
-                except Exception as e:
-                    logger.error(f'Error analyzing sound file {fullpath}: {e}')
+        manifest = load_manifest()
+        infos = []
+        to_probe = []
+
+        for entry in os.scandir(SOUNDS_DIRECTORY):
+            if entry.name.endswith('.wav') and entry.is_file():
+                fullpath = f'{SOUNDS_DIRECTORY}/{entry.name}'
+                stat = entry.stat()
+                info = manifest.get(fullpath)
+                if info and info.size == stat.st_size and info.mtime_ns == stat.st_mtime_ns:
+                    infos.append(info)
+                else:
+                    to_probe.append((fullpath, stat.st_size, stat.st_mtime_ns))
+
+        if to_probe:
+            logger.info(f'Analyzing {len(to_probe)} new or changed sounds...')
+            with ThreadPoolExecutor() as executor:
+                probed = executor.map(lambda args: probe_sound(*args), to_probe)
+                infos.extend(info for info in probed if info)
+
+        if to_probe or len(infos) != len(manifest):
+            save_manifest(infos)
+
+        for info in infos:
+            if info.format_tag not in SUPPORTED_FORMATS:
+                logger.warning(f'File {info.path} has unsupported WAV format {info.format_tag:#06x}, skipping it.')
+            elif info.channels == REQUIRED_CHANNELS and info.sample_rate == REQUIRED_SAMPLE_RATE:
+                sounds[os.path.basename(info.path)[:-4]] = info
+            else:
+                logger.error(f'File {info.path} is not mono channel or has wrong samplerate.')
     except Exception as e:
         logger.error(f'Error listing sounds directory: {e}')
 
@@ -1,50 +1,99 @@
 import os
 import sys
-import time
+import json
+import queue
+import atexit
 import logging
-import glob
+import multiprocessing
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 
-def truncate_logs(logs_folder, max_files=10):
-    log_files = glob.glob(f"{logs_folder}/*.log")
-    if len(log_files) >= max_files:
-        oldest_file = min(log_files, key=os.path.getctime)
-        os.remove(oldest_file)
+LOG_FORMAT = '%(asctime)s - %(filename)s:%(lineno)d - %(levelname)s - %(message)s'
+LOG_FILE = 'bezio.log'
 
+# The log file is rotated at this size, keeping LOG_BACKUPS older files
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUPS = 9
 
-def setup_external_loggers(file_handler, debug_mode):
-    loggers_to_configure = [
-        "twitchAPI.twitch",
-        "twitchAPI.eventsub",
-        "twitchAPI.pubsub",
-        "twitchAPI.chat",
-        "twitchAPI.oauth",
-    ]
+EXTERNAL_LOGGERS = [
+    "twitchAPI.twitch",
+    "twitchAPI.eventsub",
+    "twitchAPI.pubsub",
+    "twitchAPI.chat",
+    "twitchAPI.oauth",
+]
 
+# Handlers the listener threads write to, set by setup_logging
+log_handlers = []
+
+# Queue and listener of records logged in worker processes, see worker_log_queue
+worker_queue = None
+worker_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line, for log processing tools.
+    """
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'file': record.filename,
+            'line': record.lineno,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Queue handler that leaves formatting to the listener thread.
+
+    QueueHandler formats the message before queueing it, so it can be pickled.
+    The queue never leaves the process, so the record is queued as it is and the
+    event loop thread only pays for the put. Log arguments must not be changed
+    after the call.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def setup_external_loggers(handler, debug_mode):
     log_level = logging.DEBUG if debug_mode else logging.INFO
-    formatter = logging.Formatter('%(asctime)s - %(filename)s:%(lineno)d - %(levelname)s - %(message)s')
 
-    for logger_name in loggers_to_configure:
+    for logger_name in EXTERNAL_LOGGERS:
         external_logger = logging.getLogger(logger_name)
         external_logger.setLevel(log_level)
+        external_logger.addHandler(handler)
 
-        # Add console handler
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(log_level)
-        console_handler.setFormatter(formatter)
-        external_logger.addHandler(console_handler)
 
-        # Add the shared file handler
-        external_logger.addHandler(file_handler)
+def setup_logging(debug_mode, json_format=False, logs_folder=None):
+    """
+    Set up logging to the console and a size-rotated file in `logs_folder`.
 
+    Loggers only put records on a queue. A listener thread formats them and
+    does the console and file I/O, so logging never blocks the event loop.
 
-def setup_logging(debug_mode):
+    Args:
+        debug_mode (bool): Log debug messages, with file and line of every message
+        json_format (bool): Write the log file as JSON lines
+        logs_folder (str): Folder of the log file, logs in the working directory if not given
+
+    Returns:
+        logging.Logger: The bot's logger
+    """
     logger = logging.getLogger(__name__)
 
     if debug_mode:
         logger.setLevel(logging.DEBUG)
         log_level = logging.DEBUG
-        formatter = logging.Formatter('%(asctime)s - %(filename)s:%(lineno)d - %(levelname)s - %(message)s')
+        formatter = logging.Formatter(LOG_FORMAT)
     else:
         logger.setLevel(logging.INFO)
         log_level = logging.INFO
@@ -53,25 +102,84 @@ def setup_logging(debug_mode):
     console_handler = logging.StreamHandler()
     console_handler.setLevel(log_level)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    console_handler.addFilter(lambda record: not record.name.startswith('twitchAPI'))
+
+    # twitchAPI messages always show where they come from on the console
+    external_console_handler = logging.StreamHandler()
+    external_console_handler.setLevel(log_level)
+    external_console_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    external_console_handler.addFilter(logging.Filter('twitchAPI'))
 
-    logs_folder = os.path.join(os.getcwd(), 'logs')
+    logs_folder = logs_folder or os.path.join(os.getcwd(), 'logs')
     if not os.path.exists(logs_folder):
         os.makedirs(logs_folder)
 
-    truncate_logs(logs_folder)
-
-    start_time = time.strftime("%Y-%m-%d_%H-%M-%S")
-    filename = os.path.join(logs_folder, f"logs_{start_time}.log")
-    file_handler = logging.FileHandler(filename, encoding='utf-8')
+    filename = os.path.join(logs_folder, LOG_FILE)
+    file_handler = RotatingFileHandler(filename, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding='utf-8')
     file_handler.setLevel(log_level)
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+    file_handler.setFormatter(JsonFormatter() if json_format else formatter)
 
-    setup_external_loggers(file_handler, debug_mode)
+    log_handlers[:] = [console_handler, external_console_handler, file_handler]
+    if worker_listener:
+        worker_listener.handlers = tuple(log_handlers)
+
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, *log_handlers, respect_handler_level=True)
+    listener.start()
+    # Write out what is still queued when the bot exits
+    atexit.register(listener.stop)
+
+    queue_handler = DeferredQueueHandler(log_queue)
+    logger.addHandler(queue_handler)
+
+    setup_external_loggers(queue_handler, debug_mode)
 
     return logger
 
 
+def worker_log_queue():
+    """
+    Queue for worker processes to log through, drained by a listener thread of
+    this process into the handlers of setup_logging.
+
+    Returns:
+        multiprocessing.Queue: Queue to pass to setup_worker_logging in the workers
+    """
+    global worker_queue, worker_listener
+
+    if worker_queue is None:
+        worker_queue = multiprocessing.Queue()
+        worker_listener = QueueListener(worker_queue, *log_handlers, respect_handler_level=True)
+        worker_listener.start()
+        atexit.register(worker_listener.stop)
+    return worker_queue
+
+
+def setup_worker_logging(log_queue, log_level):
+    """
+    Log through the main process from a worker process.
+
+    Forked workers inherit the handlers of the main process, whose listener
+    thread does not run in them, so these are replaced. Records are formatted
+    in the worker and pickled onto the queue.
+
+    Args:
+        log_queue (multiprocessing.Queue): Queue from worker_log_queue
+        log_level (int): Level of the bot's logger in the main process
+    """
+    queue_handler = QueueHandler(log_queue)
+    for logger_name in [__name__, *EXTERNAL_LOGGERS]:
+        target = logging.getLogger(logger_name)
+        for handler in list(target.handlers):
+            target.removeHandler(handler)
+        target.setLevel(log_level)
+        target.addHandler(queue_handler)
+
+
 debug_mode = 'debug'.lower() in sys.argv
-logger = setup_logging(debug_mode)
+json_logs = 'json_logs'.lower() in sys.argv
+# Only the main process writes the log file - worker processes log through it
+if multiprocessing.parent_process() is None:
+    logger = setup_logging(debug_mode, json_logs)
+else:
+    logger = logging.getLogger(__name__)
@@ -0,0 +1,91 @@
+import asyncio
+import heapq
+import time
+from logger import logger
+
+
+class LoopLagMonitor:
+    """
+    Measures event loop stalls.
+
+    Sleeps for a short interval and compares the actual wake-up time with the
+    expected one - the difference is time the loop was blocked by other work.
+    """
+
+    def __init__(self, interval=0.05, report_interval=300, warn_threshold=0.25, top=5):
+        """
+        Initialize the monitor.
+
+        Args:
+            interval (float): Sampling interval in seconds
+            report_interval (float): Seconds between reports of the longest stalls
+            warn_threshold (float): Stalls longer than this are logged immediately
+            top (int): Number of longest stalls kept per report
+        """
+        self.interval = interval
+        self.report_interval = report_interval
+        self.warn_threshold = warn_threshold
+        self.top = top
+
+        self.max_lag = 0.0
+        self.longest = []  # min-heap of (lag, wall clock time)
+        self.samples = 0
+        self.total_lag = 0.0
+
+    def record(self, lag):
+        """
+        Record a single lag measurement.
+
+        Args:
+            lag (float): Seconds the loop woke up late
+        """
+        self.samples += 1
+        self.total_lag += lag
+        self.max_lag = max(self.max_lag, lag)
+
+        entry = (lag, time.strftime('%H:%M:%S'))
+        if len(self.longest) < self.top:
+            heapq.heappush(self.longest, entry)
+        elif lag > self.longest[0][0]:
+            heapq.heapreplace(self.longest, entry)
+
+        if lag > self.warn_threshold:
+            logger.warning(f'Event loop was blocked for {lag * 1000:.0f} ms')
+
+    def stats(self):
+        """
+        Get lag statistics since the last report.
+
+        Returns:
+            dict: Sample count, average and maximum lag and the longest stalls
+        """
+        return {
+            'samples': self.samples,
+            'avg_lag_ms': self.total_lag / self.samples * 1000 if self.samples else 0.0,
+            'max_lag_ms': self.max_lag * 1000,
+            'longest_ms': [(round(lag * 1000, 1), at) for lag, at in sorted(self.longest, reverse=True)],
+        }
+
+    def reset(self):
+        self.max_lag = 0.0
+        self.longest = []
+        self.samples = 0
+        self.total_lag = 0.0
+
+    async def run(self):
+        """
+        Sample event loop lag until cancelled, periodically reporting the longest stalls.
+        """
+        loop = asyncio.get_running_loop()
+        last_report = loop.time()
+
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            now = loop.time()
+            self.record(max(0.0, now - expected))
+
+            if now - last_report >= self.report_interval:
+                logger.info(f'Event loop lag: {self.stats()}')
+                self.reset()
+                last_report = now
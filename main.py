@@ -1,36 +1,93 @@
 import os
 import sys
-import json
 import asyncio
+import logging
+import multiprocessing
 import traceback
 import time
+import aiohttp
+from admission import AdmissionQueue
 from clean_tmp import clean_tmp
-from functools import partial
+from collections import OrderedDict
+from journal import Journal
 from list_sounds import list_sounds
 from logger import logger
+from loop_monitor import LoopLagMonitor
+from message_job import MessageJob
+from metrics import metrics
 from parsed_config import parsed_config
 from platform import system
 from sound_play import sound_play
-from twitchAPI.helper import first
+from twitchAPI.helper import TWITCH_API_BASE_URL, first
 from twitchAPI.oauth import UserAuthenticator, UserAuthenticationStorageHelper
 from twitchAPI.pubsub import PubSub, PubSubListenTimeoutException
 from twitchAPI.twitch import Twitch
-from twitchAPI.type import AuthScope
+from twitchAPI.type import AuthScope, EventSubSubscriptionConflict
 from twitchAPI.eventsub.websocket import EventSubWebsocket
 from twitchAPI.object.eventsub import ChannelPointsCustomRewardRedemptionAddEvent
 from uuid import UUID
 
 
+# Endpoints of the Twitch CLI mock API and websocket server (`local` mode), and of Twitch
+LOCAL_ENDPOINTS = {
+    'base_url': 'http://localhost:8080/mock/',
+    'auth_base_url': 'http://localhost:8080/auth/',
+    'connection_url': 'ws://127.0.0.1:4000/ws',
+    'subscription_url': 'http://127.0.0.1:4000/',
+}
+TWITCH_ENDPOINTS = {
+    'base_url': 'https://api.twitch.tv/helix/',
+    'auth_base_url': 'https://id.twitch.tv/oauth2/',
+    'connection_url': None,
+    'subscription_url': None,
+}
+
+# Seconds between checks of the EventSub connections, when the session has no keepalive timeout to go by
+CONNECTION_CHECK_INTERVAL = 10.0
+
+# Seconds a connection may stay closed, e.g. while twitchAPI reconnects it, before it is replaced -
+# checks are a keepalive timeout apart, so a connection must be missing in two checks in a row
+CONNECTION_GRACE = 2.0
+
+# Consecutive checks Twitch may fail to answer before the connections are treated as lost
+MAX_FAILED_CHECKS = 3
+
+# Seconds to wait for Twitch to list the EventSub subscriptions in a connection check
+CONNECTION_CHECK_TIMEOUT = 2.0
+
+# EventSub subscription type of channel point redemptions
+REDEMPTION_SUBSCRIPTION = 'channel.channel_points_custom_reward_redemption.add'
+
+# Seconds to wait for a websocket to connect or stop before giving up on it
+CONNECT_TIMEOUT = 30.0
+STOP_TIMEOUT = 5.0
+
+# Seconds between retries of a standby connection that failed to start
+STANDBY_RETRY_DELAY = 30.0
+
+# Seconds between user token refreshes
+TOKEN_REFRESH_INTERVAL = 1800
+
+# Redemption IDs remembered to drop events received twice
+SEEN_REDEMPTIONS = 10000
+
+
 class TwitchTTSBot:
     """
     Main class for the Twitch TTS Bot application.
     Handles Twitch connection, authentication, and event subscription.
     """
 
-    def __init__(self):
-        """Initialize the TwitchTTSBot with configuration and system settings."""
+    def __init__(self, cfg=None, sounds=None):
+        """
+        Initialize the TwitchTTSBot with configuration and system settings.
+
+        Args:
+            cfg (Config): Configuration, read from config.txt if not given
+            sounds (dict): Available sounds, indexed from the sounds directory if not given
+        """
         # Load configuration
-        self.cfg = parsed_config()
+        self.cfg = cfg or parsed_config()
 
         # Check if configuration is valid
         if not self.cfg:
@@ -44,7 +101,11 @@ class TwitchTTSBot:
         self.target_channel = self.cfg.twitch.channel
         self.auth_file = self.cfg.twitch.auth_file
         self.mock_user_id = self.cfg.twitch.mock_user_id
+        self.standby_enabled = self.cfg.twitch.eventsub_standby
         self.reward_name = self.cfg.tts.reward_name
+        # Several rewards can be listed comma separated, the whole value also matches titles containing commas
+        self.reward_names = frozenset([self.reward_name, *(name.strip() for name in self.reward_name.split(',') if name.strip())])
+        self.priority_users = {user.strip().lower() for user in self.cfg.tts.priority_users.split(',') if user.strip()}
 
         # Auth scopes
         self.pubsub_scope = [AuthScope.CHAT_READ, AuthScope.CHANNEL_READ_REDEMPTIONS, AuthScope.WHISPERS_READ]
@@ -53,28 +114,91 @@ class TwitchTTSBot:
         # System detection
         self.system = system()
 
-        # Determine curl command based on platform
-        if self.system == 'Windows':
-            self.curl_command = "curl.exe"
-        else:
-            self.curl_command = "curl"
+        # API endpoints - the Twitch CLI mock API and websocket server in local mode
+        self.local = 'local'.lower() in sys.argv
+        endpoints = LOCAL_ENDPOINTS if self.local else TWITCH_ENDPOINTS
+        self.base_url = endpoints['base_url']
+        self.auth_base_url = endpoints['auth_base_url']
+        self.connection_url = endpoints['connection_url']
+        self.subscription_url = endpoints['subscription_url']
 
         # Twitch API objects
         self.twitch = None
         self.pubsub = None
         self.eventsub = None
-
-        # Queue for sound messages
-        self.sound_queue = asyncio.Queue()
+        self.standby = None  # Second EventSub connection receiving the same events, when enabled
+        self.standby_task = None
+        self.standby_retry_at = 0.0
 
         # Connection state
         self.running = False
         self.reconnect_attempts = 0
         self.max_reconnect_attempts = 10
-        self.reconnect_delay = 5  # Initial delay in seconds
+        self.reconnect_delay = 5  # Delay of the second attempt in seconds, the first one is immediate
+        self.full_reconnect = True  # Rebuild the Twitch client and authenticate again on the next connect
+        self.generation = 0  # Incremented on every teardown, so late standby connections know they are stale
+        self.disconnected_at = None
+        self.down_since = {}  # Connection -> time it was first seen closed
+        self.failed_checks = 0  # Consecutive connection checks Twitch did not answer
+        self.user_ids = {}  # Login, None for the authenticated user -> user ID, kept across reconnects
+        self.user_id = None  # ID of the channel listened to
+        self.background_tasks = set()
+        self.loop = None
+        self.http = None  # Session of the connection checks
+
+        # Redemptions already queued, to drop events delivered by both connections or again after a reconnect
+        self.seen_redemptions = OrderedDict()
+        self.duplicates = 0
+        metrics.gauge('tts_duplicate_redemptions', lambda: self.duplicates)
 
         # Load available sounds
-        self.sounds_list = list_sounds()
+        self.sounds = sounds if sounds is not None else list_sounds()
+
+        # Journal of accepted messages, replayed after a crash or restart
+        self.journal = Journal(
+            flush_interval=self.cfg.tts.journal_flush_interval,
+            compact_bytes=int(self.cfg.tts.journal_compact_mb * 1024 * 1024),
+        ) if self.cfg.tts.journal else None
+
+        # Queue for sound messages, with admission control against redemption floods and fair scheduling
+        self.sound_queue = AdmissionQueue(self.sounds, self.cfg, self.journal)
+
+        # Event loop stall tracking
+        self.loop_monitor = LoopLagMonitor()
+        metrics.gauge('tts_loop_lag_max_seconds', lambda: self.loop_monitor.max_lag)
+
+    def lane_for(self, sender):
+        """
+        Get the scheduling lane of a redemption.
+
+        Args:
+            sender (str): Display name of the user who redeemed
+
+        Returns:
+            str: priority for priority users, normal for everyone else
+        """
+        return 'priority' if sender and sender.lower() in self.priority_users else 'normal'
+
+    def is_duplicate(self, redemption_id):
+        """
+        Check whether a redemption was received before, by the other EventSub connection or before a reconnect.
+
+        Args:
+            redemption_id (str): Redemption ID, None for events without one
+
+        Returns:
+            bool: True if the redemption was already received
+        """
+        if redemption_id is None:
+            return False
+        if redemption_id in self.seen_redemptions:
+            self.duplicates += 1
+            logger.debug('Ignoring duplicate redemption %s', redemption_id)
+            return True
+        self.seen_redemptions[redemption_id] = None
+        if len(self.seen_redemptions) > SEEN_REDEMPTIONS:
+            self.seen_redemptions.popitem(last=False)
+        return False
 
     async def callback_wrapped(self, uuid: UUID, data: dict) -> None:
         """
@@ -85,24 +209,36 @@ class TwitchTTSBot:
             data (dict): Event data
         """
         try:
-            callback = json.loads(json.dumps(data))
-            logger.debug(callback)
+            ingest_start = time.perf_counter()
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(data)
 
             if 'whispers'.lower() in sys.argv:
-                if 'body' in callback['data_object']:
-                    message = callback['data_object']['body']
-                    logger.info(f'message: {message}')
-                    await self.sound_queue.put(message)
-                    logger.debug(f'callback_wrapped_priv - Added "{message}" to queue. Queue size: {self.sound_queue.qsize()}')
+                whisper = data['data_object']
+                if 'body' in whisper:
+                    message = whisper['body']
+                    # Whispers share the priority lane, so each whisperer gets their own fair share of it
+                    sender = whisper.get('tags', {}).get('display_name') or str(whisper.get('from_id', ''))
+                    logger.info('%s whispered: %s', sender, message)
+                    if self.sound_queue.admit(MessageJob(message, sender, 'priority')):
+                        metrics.stage('ingest', time.perf_counter() - ingest_start)
+                        logger.debug('callback_wrapped_priv - Added "%s" to queue. Queue size: %d, predicted wait: %.1fs',
+                                     message, self.sound_queue.qsize(), self.sound_queue.predicted_wait())
             else:
-                if callback['data']['redemption']['reward']['title'] == self.reward_name:
-                    message = callback['data']['redemption']['user_input']
-                    sender = callback['data']['redemption']['user']['display_name']
-                    logger.info(f'{sender} said: {message}')
-                    await self.sound_queue.put(message)
-                    logger.debug(f'callback_wrapped - Added "{message}" to queue. Queue size: {self.sound_queue.qsize()}')
+                redemption = data['data']['redemption']
+                if redemption['reward']['title'] in self.reward_names:
+                    redemption_id = redemption.get('id')
+                    if self.is_duplicate(redemption_id):
+                        return
+                    message = redemption['user_input']
+                    sender = redemption['user']['display_name']
+                    logger.info('%s said: %s', sender, message)
+                    if self.sound_queue.admit(MessageJob(message, sender, self.lane_for(sender), redemption_id)):
+                        metrics.stage('ingest', time.perf_counter() - ingest_start)
+                        logger.debug('callback_wrapped - Added "%s" to queue. Queue size: %d, predicted wait: %.1fs',
+                                     message, self.sound_queue.qsize(), self.sound_queue.predicted_wait())
         except KeyError as e:
-            logger.error(f'callback_wrapped - Error in message Body - {callback}: {e}')
+            logger.error(f'callback_wrapped - Error in message Body - {data}: {e}')
         except Exception as e:
             logger.error(f'callback_wrapped - Unexpected error: {e}')
 
@@ -114,101 +250,238 @@ class TwitchTTSBot:
             data (ChannelPointsCustomRewardRedemptionAddEvent): Event data
         """
         try:
-            callback = json.loads(json.dumps(data.to_dict()))
-            logger.debug(callback)
-
-            if 'title' in callback['event']['reward']:
-                if callback['event']['reward']['title'] == self.reward_name:
-                    sender = callback['event']['user_name']
-                    message = callback['event']['user_input']
-                    logger.info(f'{sender} said: {message}')
-                    await self.sound_queue.put(message)
-                    logger.debug(f'eventsub_on_bezio - Added "{message}" to queue. Queue size: {self.sound_queue.qsize()}')
-        except KeyError as e:
+            ingest_start = time.perf_counter()
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(data.to_dict())
+
+            # Fields missing from the payload are missing from the event object too
+            event = data.event
+            if getattr(event.reward, 'title', None) in self.reward_names:
+                if self.is_duplicate(event.id):
+                    return
+                sender = event.user_name
+                message = event.user_input
+                logger.info('%s said: %s', sender, message)
+                if self.sound_queue.admit(MessageJob(message, sender, self.lane_for(sender), event.id)):
+                    metrics.stage('ingest', time.perf_counter() - ingest_start)
+                    logger.debug('eventsub_on_bezio - Added "%s" to queue. Queue size: %d, predicted wait: %.1fs',
+                                 message, self.sound_queue.qsize(), self.sound_queue.predicted_wait())
+        except AttributeError as e:
             logger.error(f'eventsub_on_bezio - Error in message Body: {e}')
         except Exception as e:
             logger.error(f'eventsub_on_bezio - Unexpected error: {e}')
 
+    async def forward_eventsub(self, data: ChannelPointsCustomRewardRedemptionAddEvent) -> None:
+        """
+        EventSub callback, run on the websocket thread - hands the event to the main event loop.
+        """
+        asyncio.run_coroutine_threadsafe(self.eventsub_on_bezio(data), self.loop)
+
+    async def forward_pubsub(self, uuid: UUID, data: dict) -> None:
+        """
+        PubSub callback, run on the PubSub thread - hands the event to the main event loop.
+        """
+        asyncio.run_coroutine_threadsafe(self.callback_wrapped(uuid, data), self.loop)
+
+    def spawn(self, awaitable):
+        """
+        Run a coroutine or future in the background, keeping a reference until it is done.
+        """
+        task = asyncio.ensure_future(awaitable)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+        return task
+
+    async def authenticate(self):
+        """
+        Authenticate the Twitch client with the scopes of the runner.
+        """
+        if self.default_runner == 'eventsub' and self.local:
+            self.twitch.auto_refresh_auth = False
+            authenticated_twitch = UserAuthenticator(self.twitch, self.eventsub_scope, auth_base_url=self.auth_base_url)
+            token = await authenticated_twitch.mock_authenticate(self.mock_user_id)
+            await self.twitch.set_user_authentication(token, self.eventsub_scope)
+        else:
+            scope = self.eventsub_scope if self.default_runner == 'eventsub' else self.pubsub_scope
+            authenticated_twitch = UserAuthenticationStorageHelper(self.twitch, scope, storage_path=self.auth_file)
+            await authenticated_twitch.bind()
+
+    async def resolve_user_id(self, login):
+        """
+        Get the ID of a user, looked up once and cached across reconnects.
+
+        Args:
+            login (str): User login, None for the authenticated user
+
+        Returns:
+            str: User ID
+        """
+        if login not in self.user_ids:
+            user = await first(self.twitch.get_users(logins=login) if login else self.twitch.get_users())
+            self.user_ids[login] = user.id
+        return self.user_ids[login]
+
+    async def start_eventsub(self, user_id):
+        """
+        Open an EventSub websocket and subscribe it to redemptions.
+
+        Args:
+            user_id (str): ID of the channel
+
+        Returns:
+            EventSubWebsocket: The connection
+        """
+        eventsub = EventSubWebsocket(self.twitch, connection_url=self.connection_url, subscription_url=self.subscription_url)
+        # start() blocks until the websocket is welcomed, so it runs off the event loop
+        try:
+            await asyncio.wait_for(asyncio.to_thread(eventsub.start), CONNECT_TIMEOUT)
+        except asyncio.TimeoutError:
+            # The socket thread keeps connecting after the wait is abandoned, so the websocket is stopped.
+            # start() would then wait for a welcome forever, holding an executor thread that blocks the
+            # exit - twitchAPI has no way to abort it, so its startup flag is set to let it return
+            logger.warning(f'EventSub websocket did not connect within {CONNECT_TIMEOUT:.0f}s')
+            await self.stop_connection(eventsub)
+            eventsub._startup_complete = True
+            raise
+        try:
+            await eventsub.listen_channel_points_custom_reward_redemption_add(user_id, self.forward_eventsub)
+        except Exception:
+            await self.stop_connection(eventsub)
+            raise
+        return eventsub
+
+    async def run_standby(self, user_id, generation):
+        """
+        Start the standby EventSub connection.
+
+        Args:
+            user_id (str): ID of the channel
+            generation (int): Connection generation it belongs to, it is stopped if a teardown happened meanwhile
+        """
+        try:
+            standby = await self.start_eventsub(user_id)
+        except EventSubSubscriptionConflict as e:
+            logger.warning(f'Standby EventSub connection refused, continuing without it: {e}')
+            self.standby_enabled = False
+            return
+        except Exception as e:
+            logger.warning(f'Could not start standby EventSub connection, retrying in {STANDBY_RETRY_DELAY:.0f}s: {e}')
+            self.standby_retry_at = time.monotonic() + STANDBY_RETRY_DELAY
+            return
+        if generation != self.generation or not self.eventsub:
+            await self.stop_connection(standby)
+            return
+        self.standby = standby
+        logger.info('Standby EventSub connection ready')
+
+    def start_standby(self, user_id):
+        """
+        Start the standby connection in the background, if it is enabled and not running or starting.
+        """
+        if self.standby_enabled and self.standby is None and (self.standby_task is None or self.standby_task.done()):
+            self.standby_task = self.spawn(self.run_standby(user_id, self.generation))
+
+    @staticmethod
+    def _stop_blocking(stop):
+        # EventSubWebsocket.stop is a coroutine, PubSub.stop is not
+        result = stop()
+        if asyncio.iscoroutine(result):
+            asyncio.run(result)
+
+    async def stop_connection(self, connection):
+        """
+        Stop an EventSub or PubSub connection.
+
+        twitchAPI stops wait for the socket thread to finish, so they run on a
+        worker thread and several connections stop in parallel.
+
+        Args:
+            connection (EventSubWebsocket|PubSub): The connection
+        """
+        self.down_since.pop(connection, None)
+        try:
+            await asyncio.wait_for(asyncio.to_thread(self._stop_blocking, connection.stop), STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f'{type(connection).__name__} did not stop within {STOP_TIMEOUT:.0f}s, abandoning it')
+        except Exception as e:
+            logger.debug(f'Error stopping {type(connection).__name__}: {e}')
+
+    async def teardown(self, keep_client=False, wait=True):
+        """
+        Stop all connections in parallel.
+
+        Args:
+            keep_client (bool): Keep the authenticated Twitch client for a fast reconnect
+            wait (bool): Wait for the connections to stop, instead of stopping them while the new ones connect
+        """
+        self.generation += 1
+        self.failed_checks = 0
+        connections = [connection for connection in (self.eventsub, self.standby, self.pubsub) if connection]
+        self.eventsub = self.standby = self.pubsub = None
+        stops = [self.stop_connection(connection) for connection in connections]
+        if self.twitch and not keep_client:
+            stops.append(self.twitch.close())
+            self.twitch = None
+        if wait:
+            await asyncio.gather(*stops)
+        elif stops:
+            self.spawn(asyncio.gather(*stops))
+
     async def connect_to_twitch(self):
         """
         Connect to Twitch API and set up event subscriptions.
 
+        After a lost connection, the authenticated client and user ID from the
+        previous connection are reused, so only the websocket is opened again.
+        A failed attempt makes the next one start from scratch.
+
         Returns:
             bool: True if connection was successful, False otherwise
         """
+        if self.default_runner not in ('eventsub', 'pubsub'):
+            logger.error('No valid DEFAULT_RUNNER config found!')
+            return False
+
         try:
-            # Reset Twitch API objects if they exist
-            if self.twitch:
-                await self.twitch.close()
-                self.twitch = None
-
-            if self.pubsub:
-                await self.pubsub.stop()
-                self.pubsub = None
-
-            if self.eventsub:
-                await self.eventsub.stop()
-                self.eventsub = None
-
-            # Determine API endpoints based on mode
-            if 'local'.lower() in sys.argv:
-                base_url = 'http://localhost:8080/mock/'
-                auth_base_url = 'http://localhost:8080/auth/'
-                connection_url = 'ws://127.0.0.1:4000/ws'
-                subscription_url = 'http://127.0.0.1:4000/'
-            else:
-                base_url = 'https://api.twitch.tv/helix/'
-                auth_base_url = 'https://id.twitch.tv/oauth2/'
-                connection_url = None
-                subscription_url = None
+            self.loop = asyncio.get_running_loop()
+            if self.http is None:
+                self.http = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=CONNECTION_CHECK_TIMEOUT))
+            keep_client = self.twitch is not None and not self.full_reconnect
+            # Old connections may still deliver events while they stop, duplicates are dropped
+            await self.teardown(keep_client, wait=False)
+            self.full_reconnect = True
+
+            if not keep_client:
+                self.twitch = await Twitch(self.app_id, self.app_secret, base_url=self.base_url, auth_base_url=self.auth_base_url)
+                await self.authenticate()
 
-            # Initialize Twitch API
-            self.twitch = await Twitch(self.app_id, self.app_secret, base_url=base_url, auth_base_url=auth_base_url)
+            # Local mode listens to the mocked user itself
+            user_id = await self.resolve_user_id(None if self.default_runner == 'eventsub' and self.local else self.target_channel)
 
-            # Set up authentication and subscription based on runner
             if self.default_runner == 'eventsub':
-                # Local mode authentication
-                if 'local'.lower() in sys.argv:
-                    self.twitch.auto_refresh_auth = False
-                    authenticated_twitch = UserAuthenticator(self.twitch, self.eventsub_scope, auth_base_url=auth_base_url)
-                    token = await authenticated_twitch.mock_authenticate(self.mock_user_id)
-                    await self.twitch.set_user_authentication(token, self.eventsub_scope)
-                    user = await first(self.twitch.get_users())
-                # Production mode authentication
-                else:
-                    authenticated_twitch = UserAuthenticationStorageHelper(self.twitch, self.eventsub_scope, storage_path=self.auth_file)
-                    await authenticated_twitch.bind()
-                    user = await first(self.twitch.get_users(logins=self.target_channel))
-
-                # Set up EventSub
-                self.eventsub = EventSubWebsocket(self.twitch, connection_url=connection_url, subscription_url=subscription_url)
-                callback = partial(self.eventsub_on_bezio)
-                self.eventsub.start()
-                await self.eventsub.listen_channel_points_custom_reward_redemption_add(user.id, callback)
-
-            elif self.default_runner == 'pubsub':
-                # Authentication for PubSub
-                authenticated_twitch = UserAuthenticationStorageHelper(self.twitch, self.pubsub_scope, storage_path=self.auth_file)
-                await authenticated_twitch.bind()
-                user = await first(self.twitch.get_users(logins=self.target_channel))
-
-                # Set up PubSub
+                self.eventsub = await self.start_eventsub(user_id)
+                # The standby connects in the background, the primary already receives events
+                self.start_standby(user_id)
+            else:
                 self.pubsub = PubSub(self.twitch)
                 self.pubsub.start()
-
-                callback = partial(self.callback_wrapped)
                 if 'whispers'.lower() in sys.argv:
-                    await self.pubsub.listen_whispers(user.id, callback)
+                    await self.pubsub.listen_whispers(user_id, self.forward_pubsub)
                 else:
-                    await self.pubsub.listen_channel_points(user.id, callback)
-            else:
-                logger.error('No valid DEFAULT_RUNNER config found!')
-                return False
+                    await self.pubsub.listen_channel_points(user_id, self.forward_pubsub)
 
             # Connection successful
-            logger.info('Connected to Twitch successfully')
+            self.user_id = user_id
+            self.full_reconnect = False
             self.reconnect_attempts = 0
             self.reconnect_delay = 5
+            if self.disconnected_at is not None:
+                elapsed = time.perf_counter() - self.disconnected_at
+                self.disconnected_at = None
+                metrics.stage('reconnect', elapsed)
+                logger.info(f'Reconnected to Twitch in {elapsed:.2f}s')
+            else:
+                logger.info('Connected to Twitch successfully')
             return True
 
         except Exception as e:
@@ -216,6 +489,104 @@ class TwitchTTSBot:
             logger.debug(traceback.format_exc())
             return False
 
+    async def live_sessions(self):
+        """
+        Ask Twitch which EventSub websocket sessions it delivers redemptions to.
+
+        twitchAPI exposes no connection state of its websockets, so Twitch's own
+        view is used - Get EventSub Subscriptions lists every websocket
+        subscription with its session and status. Twitch's client method for it
+        uses the app token, which only lists webhook subscriptions, so the
+        endpoint is requested with the user token.
+
+        Returns:
+            set: Session IDs with an enabled redemption subscription, None if Twitch could not be asked
+        """
+        url = f'{self.subscription_url or TWITCH_API_BASE_URL}eventsub/subscriptions'
+        headers = {'Client-ID': self.twitch.app_id, 'Authorization': f'Bearer {self.twitch.get_user_auth_token()}'}
+        try:
+            async with self.http.get(url, headers=headers, params={'type': REDEMPTION_SUBSCRIPTION}) as response:
+                if response.status != 200:
+                    logger.debug('Listing EventSub subscriptions failed with status %d', response.status)
+                    return None
+                body = await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.debug('Listing EventSub subscriptions failed: %s', e)
+            return None
+        return {
+            subscription['transport'].get('session_id') for subscription in body.get('data', [])
+            if subscription.get('status') == 'enabled'
+        }
+
+    def connection_down(self, connection, sessions, now):
+        """
+        Check whether an EventSub connection has been without an enabled subscription for longer than CONNECTION_GRACE.
+
+        Args:
+            connection (EventSubWebsocket): The connection
+            sessions (set): Session IDs from live_sessions
+            now (float): Monotonic time of the check
+        """
+        session = connection.active_session
+        if session is not None and session.id in sessions:
+            self.down_since.pop(connection, None)
+            return False
+        return now - self.down_since.setdefault(connection, now) >= CONNECTION_GRACE
+
+    def connection_check_interval(self):
+        """
+        Get the seconds until the next connection check - the keepalive timeout of the
+        primary session, the time Twitch itself allows a websocket to stay silent.
+
+        Returns:
+            float: Seconds to wait
+        """
+        session = self.eventsub.active_session if self.eventsub else None
+        if session is not None and session.keepalive_timeout_seconds:
+            return float(session.keepalive_timeout_seconds)
+        return CONNECTION_CHECK_INTERVAL
+
+    async def check_connections(self):
+        """
+        Check the EventSub connections, promoting the standby when the primary is down
+        and replacing a standby that went down.
+
+        Returns:
+            bool: False if no connection is left and a reconnect is needed
+        """
+        if not self.eventsub:
+            # PubSub reconnects on its own
+            return True
+        sessions = await self.live_sessions()
+        if not self.eventsub:
+            # A reconnect started meanwhile
+            return True
+        if sessions is None:
+            # A connection that died while Twitch is unreachable must still be replaced eventually
+            self.failed_checks += 1
+            if self.failed_checks >= MAX_FAILED_CHECKS:
+                logger.warning(f'Could not check the EventSub connections {self.failed_checks} times in a row')
+                self.failed_checks = 0
+                return False
+            return True
+        self.failed_checks = 0
+        now = time.monotonic()
+        if self.connection_down(self.eventsub, sessions, now):
+            if not self.standby or self.connection_down(self.standby, sessions, now):
+                return False
+            # The standby already receives every event, so nothing was missed
+            logger.warning('EventSub connection lost, the standby connection took over')
+            metrics.stage('failover', now - self.down_since.get(self.eventsub, now))
+            self.spawn(self.stop_connection(self.eventsub))
+            self.eventsub, self.standby = self.standby, None
+        elif self.standby and self.connection_down(self.standby, sessions, now):
+            logger.warning('Standby EventSub connection lost, replacing it')
+            self.spawn(self.stop_connection(self.standby))
+            self.standby = None
+        if now >= self.standby_retry_at:
+            self.start_standby(self.user_id)
+        return True
+
     async def run_chat(self):
         """
         Main loop for handling Twitch connection, with automatic reconnection.
@@ -231,14 +602,22 @@ class TwitchTTSBot:
 
                 logger.info('Ready')
 
-                # Keep connection alive
+                # Watch the connection and keep it alive
+                next_refresh = time.monotonic() + TOKEN_REFRESH_INTERVAL
                 while self.running:
                     try:
+                        await asyncio.sleep(self.connection_check_interval())
+                        if not await self.check_connections():
+                            logger.warning("EventSub connection lost. Reconnecting...")
+                            self.disconnected_at = time.perf_counter()
+                            break
                         # Refresh auth token periodically
-                        await asyncio.sleep(1800)  # 30 minutes
-                        await self.twitch.get_refreshed_user_auth_token()
+                        if time.monotonic() >= next_refresh:
+                            next_refresh = time.monotonic() + TOKEN_REFRESH_INTERVAL
+                            await self.twitch.get_refreshed_user_auth_token()
                     except PubSubListenTimeoutException:
                         logger.warning("PubSub connection timeout. Reconnecting...")
+                        self.disconnected_at = time.perf_counter()
                         break
                     except asyncio.CancelledError:
                         self.running = False
@@ -246,6 +625,8 @@ class TwitchTTSBot:
                     except Exception as e:
                         logger.error(f"Error in connection: {e}")
                         logger.debug(traceback.format_exc())
+                        self.disconnected_at = time.perf_counter()
+                        self.full_reconnect = True
                         break
 
             except asyncio.CancelledError:
@@ -261,7 +642,7 @@ class TwitchTTSBot:
 
     async def handle_reconnect(self):
         """
-        Handle reconnection with exponential backoff.
+        Handle reconnection with exponential backoff, retrying at once the first time.
         """
         self.reconnect_attempts += 1
 
@@ -271,7 +652,10 @@ class TwitchTTSBot:
             return
 
         # Calculate delay with exponential backoff (capped at 5 minutes)
-        delay = min(self.reconnect_delay * (2 ** (self.reconnect_attempts - 1)), 300)
+        if self.reconnect_attempts == 1:
+            delay = 0
+        else:
+            delay = min(self.reconnect_delay * (2 ** (self.reconnect_attempts - 2)), 300)
 
         logger.warning(f"Connection failed. Reconnecting in {delay} seconds (attempt {self.reconnect_attempts}/{self.max_reconnect_attempts})...")
 
@@ -287,26 +671,59 @@ class TwitchTTSBot:
         logger.info("Cleaning up resources...")
 
         try:
-            if self.eventsub:
-                await self.eventsub.stop()
-
-            if self.pubsub:
-                await self.pubsub.stop()
-
-            if self.twitch:
-                await self.twitch.close()
+            await self.teardown()
+            await asyncio.gather(*self.background_tasks, return_exceptions=True)
+            if self.http:
+                await self.http.close()
+                self.http = None
         except Exception as e:
             logger.error(f"Error during cleanup: {e}")
 
+    def replay_journal(self):
+        """
+        Queue the messages left undelivered by the previous run.
+
+        Messages older than `max_queue_latency` are marked done instead. Audio
+        rendered before the restart is still in the TTS and render caches.
+        """
+        if not self.journal:
+            return
+        max_age = self.cfg.tts.max_queue_latency
+        replayed = skipped = 0
+        for record in self.journal.replay():
+            if max_age and time.time() - record['at'] > max_age:
+                self.journal.done(record['id'])
+                skipped += 1
+                continue
+            job = MessageJob(record['text'], record['sender'], record['lane'], record.get('redemption_id'))
+            job.journal_id = record['id']
+            # Twitch may deliver the redemption again after the restart
+            self.is_duplicate(job.redemption_id)
+            self.sound_queue.restore(job)
+            replayed += 1
+        if replayed or skipped:
+            logger.info(f'Replayed {replayed} undelivered messages from the journal, skipped {skipped} older than {max_age:.0f}s')
+
     async def start_tasks(self):
         """
         Start all required tasks.
         """
+        self.replay_journal()
+
         # Create tasks for chat and sound processing
         chat_task = asyncio.create_task(self.run_chat())
-        sound_task = asyncio.create_task(sound_play(self.sound_queue, self.sounds_list))
+        sound_task = asyncio.create_task(sound_play(self.sound_queue, self.sounds, self.cfg))
+        monitor_task = asyncio.create_task(self.loop_monitor.run())
 
-        tasks = [chat_task, sound_task]
+        tasks = [chat_task, sound_task, monitor_task]
+        if self.journal:
+            tasks.append(asyncio.create_task(self.journal.run()))
+
+        # Metrics endpoint and periodic snapshots in the logs
+        if self.cfg.tts.metrics_port:
+            tasks.append(asyncio.create_task(metrics.serve(self.cfg.tts.metrics_host, self.cfg.tts.metrics_port)))
+        if self.cfg.tts.metrics_log_interval:
+            tasks.append(asyncio.create_task(metrics.log_snapshots(self.cfg.tts.metrics_log_interval)))
 
         try:
             await asyncio.gather(*tasks, return_exceptions=True)
@@ -330,6 +747,9 @@ async def main():
 
 # Main thread #
 if __name__ == "__main__":
+    # Render workers are spawned on Windows - in a frozen executable they would start the bot again
+    multiprocessing.freeze_support()
+
     # Check folders and config existence
     dir_paths = ["sounds", "tmp"]
     for dir_path in dir_paths:
@@ -0,0 +1,27 @@
+import time
+
+
+class MessageJob:
+    """
+    A chat message accepted for speaking, as it travels through the sound queue.
+    """
+    __slots__ = ('text', 'sender', 'lane', 'redemption_id', 'enqueued_at', 'estimate', 'journal_id')
+
+    def __init__(self, text, sender=None, lane='normal', redemption_id=None):
+        """
+        Args:
+            text (str): The message
+            sender (str): Display name of the user who sent it
+            lane (str): Scheduling lane, e.g. priority or normal
+            redemption_id (str): Twitch redemption ID, None for whispers
+        """
+        self.text = text
+        self.sender = sender
+        self.lane = lane
+        self.redemption_id = redemption_id
+        self.enqueued_at = time.perf_counter()
+        self.estimate = None  # CostEstimate, set on admission
+        self.journal_id = None  # Set once the message is in the journal
+
+    def __repr__(self):
+        return f'MessageJob({self.text!r}, sender={self.sender!r}, lane={self.lane!r})'
@@ -0,0 +1,248 @@
+import asyncio
+import bisect
+import json
+import time
+from aiohttp import web
+from contextlib import contextmanager
+from logger import logger
+
+
+# Upper bounds of the latency histogram buckets in seconds
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in items) + '}'
+
+
+class Histogram:
+    """
+    Cumulative histogram of observed values with fixed buckets.
+    """
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """
+        Estimate a quantile by interpolating within its bucket.
+
+        Args:
+            q (float): Quantile, 0-1
+
+        Returns:
+            float: Estimated value, or None without observations
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class Metrics:
+    """
+    Registry of pipeline metrics - stage latency histograms and gauges.
+
+    Gauges are callbacks read when metrics are collected, so queue depths and
+    cache sizes are never stale. Exposed in Prometheus text format over HTTP and
+    as periodic JSON snapshots in the logs.
+    """
+
+    def __init__(self):
+        self.histograms = {}  # name -> {labels: Histogram}
+        self.gauges = {}  # name -> {labels: callback}
+        self.help = {}  # name -> description
+        self.listeners = []  # Called with every observation, e.g. by benchmarks needing exact values
+
+    def describe(self, name, description):
+        self.help[name] = description
+
+    def add_listener(self, listener):
+        """
+        Register a callback receiving every observation as (name, value, labels).
+
+        Args:
+            listener (callable): The callback
+        """
+        self.listeners.append(listener)
+
+    def observe(self, name, value, **labels):
+        """
+        Add a value to a histogram.
+
+        Args:
+            name (str): Metric name
+            value (float): Observed value, seconds for latencies
+            **labels: Label values of the series
+        """
+        series = self.histograms.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram()
+        histogram.observe(value)
+        for listener in self.listeners:
+            listener(name, value, labels)
+
+    def stage(self, stage, seconds):
+        """
+        Record the duration of a pipeline stage.
+
+        Args:
+            stage (str): Stage name
+            seconds (float): Duration
+        """
+        self.observe('tts_stage_seconds', seconds, stage=stage)
+
+    @contextmanager
+    def span(self, stage):
+        """
+        Time the enclosed block as a pipeline stage.
+
+        Args:
+            stage (str): Stage name
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage(stage, time.perf_counter() - start)
+
+    def gauge(self, name, callback, **labels):
+        """
+        Register a gauge read from a callback at collection time.
+
+        Args:
+            name (str): Metric name
+            callback (callable): Returns the current value
+            **labels: Label values of the series
+        """
+        self.gauges.setdefault(name, {})[tuple(sorted(labels.items()))] = callback
+
+    def _read_gauges(self):
+        values = {}
+        for name, series in self.gauges.items():
+            for labels, callback in series.items():
+                try:
+                    values[(name, labels)] = float(callback())
+                except Exception as e:
+                    logger.debug(f'Could not read gauge {name}: {e}')
+        return values
+
+    def prometheus(self):
+        """
+        Render all metrics in Prometheus text exposition format.
+
+        Returns:
+            str: Metrics text
+        """
+        lines = []
+        for name, series in self.histograms.items():
+            if name in self.help:
+                lines.append(f'# HELP {name} {self.help[name]}')
+            lines.append(f'# TYPE {name} histogram')
+            for labels, histogram in series.items():
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_format_labels(labels, ("le", bound))} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {histogram.sum}')
+                lines.append(f'{name}_count{_format_labels(labels)} {histogram.count}')
+
+        gauges = self._read_gauges()
+        for name, series in self.gauges.items():
+            if name in self.help:
+                lines.append(f'# HELP {name} {self.help[name]}')
+            lines.append(f'# TYPE {name} gauge')
+            for labels in series:
+                if (name, labels) in gauges:
+                    lines.append(f'{name}{_format_labels(labels)} {gauges[(name, labels)]}')
+
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        """
+        Summarize all metrics.
+
+        Returns:
+            dict: Histogram counts, means and p50/p95/p99 in milliseconds, and gauge values
+        """
+        histograms = {}
+        for name, series in self.histograms.items():
+            for labels, histogram in series.items():
+                key = ','.join(str(value) for _, value in labels) or name
+                histograms.setdefault(name, {})[key] = {
+                    'count': histogram.count,
+                    'mean_ms': round(histogram.sum / histogram.count * 1000, 1) if histogram.count else None,
+                    **{
+                        f'p{int(q * 100)}_ms': round(histogram.quantile(q) * 1000, 1) if histogram.count else None
+                        for q in (0.5, 0.95, 0.99)
+                    },
+                }
+
+        gauges = {}
+        for (name, labels), value in self._read_gauges().items():
+            key = ','.join(str(label_value) for _, label_value in labels)
+            gauges[f'{name}[{key}]' if key else name] = value
+
+        return {'histograms': histograms, 'gauges': gauges}
+
+    async def serve(self, host='127.0.0.1', port=9464):
+        """
+        Serve metrics at http://host:port/metrics until cancelled.
+
+        Args:
+            host (str): Address to bind to
+            port (int): Port to bind to
+        """
+        async def handle_metrics(request):
+            return web.Response(text=self.prometheus(), content_type='text/plain', charset='utf-8')
+
+        app = web.Application()
+        app.router.add_get('/metrics', handle_metrics)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        try:
+            site = web.TCPSite(runner, host, port)
+            await site.start()
+            logger.info(f'Serving metrics on http://{host}:{port}/metrics')
+            await asyncio.Event().wait()
+        except OSError as e:
+            logger.error(f'Could not serve metrics on {host}:{port}: {e}')
+        finally:
+            await runner.cleanup()
+
+    async def log_snapshots(self, interval=60.0):
+        """
+        Log a JSON snapshot of all metrics periodically until cancelled.
+
+        Args:
+            interval (float): Seconds between snapshots
+        """
+        while True:
+            await asyncio.sleep(interval)
+            logger.info(f'Metrics: {json.dumps(self.snapshot())}')
+
+
+metrics = Metrics()
+metrics.describe('tts_stage_seconds', 'Duration of TTS pipeline stages in seconds')
@@ -1,11 +1,61 @@
 import os
 import configparser
 from logger import logger
+from scheduler import parse_lane_weights
 
 
 config_path = 'config.txt'
 
 
+def to_bool(value):
+    """
+    Convert a configuration value like true/false or yes/no to bool.
+    """
+    return value.strip().lower() in ('true', 'yes', 'on', '1')
+
+
+# Types of non-string configuration values
+value_types = {
+    'twitch': {
+        'eventsub_standby': to_bool,
+    },
+    'tts': {
+        'sound_cap': int,
+        'max_effect_repetitions': int,
+        'max_number_digits': int,
+        'max_queued_audio': float,
+        'max_queue_latency': float,
+        'speech_seconds_per_char': float,
+        'journal': to_bool,
+        'journal_flush_interval': float,
+        'journal_compact_mb': float,
+        'render_lookahead': int,
+        'tts_timeout': float,
+        'tts_retries': int,
+        'tts_concurrency': int,
+        'tts_deadline': float,
+        'tts_hedge_percentile': float,
+        'tts_health_interval': float,
+        'tts_breaker_failures': int,
+        'tts_breaker_cooldown': float,
+        'tts_batching': to_bool,
+        'tts_batch_window': float,
+        'tts_batch_max_chars': int,
+        'tts_batch_min_gap': float,
+        'tts_cache_memory_mb': float,
+        'tts_cache_disk_mb': float,
+        'render_cache_memory_mb': float,
+        'render_cache_disk_mb': float,
+        'streaming_playback': to_bool,
+        'audio_sink_buffer': float,
+        'render_threads': int,
+        'render_workers': int,
+        'metrics_port': int,
+        'metrics_log_interval': float,
+    }
+}
+
+
 class ConfigSection:
     """
     Class to represent a section of the configuration.
@@ -64,7 +114,49 @@ def validate_config(cfg):
     # Optional fields that should be present with default values if not specified
     optional_fields = {
         'twitch': {
-            'mock_user_id': '1234567890'  # Default mock user ID
+            'mock_user_id': '1234567890',  # Default mock user ID
+            'eventsub_standby': False,  # Keep a second EventSub connection that takes over when the first one drops
+        },
+        'tts': {
+            'max_number_digits': 15,  # Longer numbers are read digit by digit
+            'admission_policy': 'reject',  # reject, truncate or drop_oldest once the queue is full
+            'max_queued_audio': 300.0,  # Seconds of audio waiting to be played, 0 for no limit
+            'max_queue_latency': 600.0,  # Seconds a message may wait before it starts playing, 0 for no limit
+            'speech_seconds_per_char': 0.07,  # Initial speech rate estimate, learned from synthesized audio
+            'journal': True,  # Keep accepted messages in cache/journal.log and replay them after a restart
+            'journal_flush_interval': 0.05,  # Seconds between journal writes, at most this much is lost in a crash
+            'journal_compact_mb': 1.0,  # Journal size that triggers rewriting it with undelivered messages only
+            'lane_weights': 'priority=4,normal=1',  # Share of playback time of each lane while both are busy
+            'priority_users': '',  # Comma separated users in the priority lane, e.g. moderators; whispers always are
+            'render_lookahead': 2,  # Messages rendered ahead of the one playing
+            'effects_backend': 'numpy',  # numpy or sox
+            'render_threads': 4,  # Threads for decoding and file reads
+            'render_workers': 0,  # Effect rendering processes, 0 for one per CPU core
+            'streaming_playback': True,  # Start playing before all segments are rendered
+            'audio_sink': 'auto',  # auto, aplay, simplesound, file, null or tcp
+            'audio_sink_target': '',  # File path for file, host:port for tcp, realtime for null
+            'audio_sink_buffer': 2.0,  # Seconds of audio buffered ahead of the output
+            'tts_url': 'http://localhost:5002/api/tts',  # Comma separated for several TTS servers
+            'tts_timeout': 30.0,  # Seconds per TTS request
+            'tts_retries': 2,
+            'tts_concurrency': 4,  # Parallel TTS requests per server
+            'tts_deadline': 60.0,  # Seconds per segment across retries and hedged requests
+            'tts_hedge_percentile': 0.0,  # Duplicate requests slower than this latency percentile, 0 disables
+            'tts_health_interval': 10.0,  # Seconds between health checks of idle or failing servers, 0 disables
+            'tts_breaker_failures': 3,  # Consecutive failures that take a server out of rotation
+            'tts_breaker_cooldown': 15.0,  # Seconds before a failing server is tried again
+            'tts_batching': False,  # Synthesize all text runs of a message in one request, split at sentence pauses
+            'tts_batch_window': 0.0,  # Seconds to wait for more text runs to batch, e.g. from the next messages
+            'tts_batch_max_chars': 500,  # Longest text of a single batched request
+            'tts_batch_min_gap': 0.3,  # Shortest silence in seconds counted as the pause between sentences
+            'tts_voice': 'default',  # Voice/model identity, part of the TTS cache key
+            'tts_cache_memory_mb': 64.0,
+            'tts_cache_disk_mb': 512.0,
+            'render_cache_memory_mb': 64.0,  # Rendered sound and effect combinations
+            'render_cache_disk_mb': 256.0,
+            'metrics_host': '127.0.0.1',
+            'metrics_port': 0,  # Prometheus endpoint at http://metrics_host:metrics_port/metrics, 0 disables it
+            'metrics_log_interval': 300.0  # Seconds between metrics snapshots in the logs, 0 disables them
         }
     }
 
@@ -90,6 +182,13 @@ def validate_config(cfg):
                 if not hasattr(section_obj, field):
                     setattr(section_obj, field, default_value)
 
+    if hasattr(cfg, 'tts'):
+        try:
+            parse_lane_weights(cfg.tts.lane_weights)
+        except ValueError as e:
+            logger.error(f"Invalid tts.lane_weights in config: {e}")
+            is_valid = False
+
     return is_valid
 
 
@@ -118,8 +217,9 @@ def parsed_config():
             config_dict[section] = {}
             for key, value in parser.items(section):
                 # Convert numeric values
-                if section == 'tts' and key in ['sound_cap', 'max_effect_repetitions']:
-                    config_dict[section][key] = int(value)
+                value_type = value_types.get(section, {}).get(key)
+                if value_type:
+                    config_dict[section][key] = value_type(value)
                 else:
                     config_dict[section][key] = value
 
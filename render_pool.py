@@ -0,0 +1,133 @@
+import asyncio
+import os
+import numpy as np
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from effects import render
+from logger import logger, setup_worker_logging, worker_log_queue
+from multiprocessing import resource_tracker, shared_memory
+
+
+def _ready():
+    return os.getpid()
+
+
+def _render_worker(input_name, length, sample_rate, effect_counts, backend):
+    """
+    Render effects in a worker process.
+
+    Input samples are read from the caller's shared memory block, the result is
+    written to a new block which the caller takes ownership of.
+
+    Returns:
+        tuple: (output block name, number of output samples)
+    """
+    input_block = shared_memory.SharedMemory(name=input_name)
+    try:
+        samples = np.ndarray((length,), dtype=np.float32, buffer=input_block.buf).copy()
+    finally:
+        input_block.close()
+
+    result = np.ascontiguousarray(render(samples, sample_rate, Counter(effect_counts), backend), dtype=np.float32)
+    output_block = shared_memory.SharedMemory(create=True, size=max(1, result.nbytes))
+    np.ndarray(result.shape, dtype=np.float32, buffer=output_block.buf)[:] = result
+    output_block.close()
+    return output_block.name, len(result)
+
+
+def _discard_output(work):
+    """
+    Unlink the output block of a render whose caller stopped waiting for it.
+
+    Args:
+        work (concurrent.futures.Future): The render in the worker process
+    """
+    if work.cancelled() or work.exception() is not None:
+        return
+    output_name, _ = work.result()
+    try:
+        output_block = shared_memory.SharedMemory(name=output_name)
+    except FileNotFoundError:
+        return
+    output_block.close()
+    output_block.unlink()
+
+
+class RenderPool:
+    """
+    Pool of worker processes rendering effects on all cores.
+
+    Audio is passed to and from the workers through shared memory blocks, only
+    block names and effect parameters are pickled.
+    """
+
+    def __init__(self, workers=0):
+        """
+        Initialize the pool. Worker processes start with `start`, or on first use.
+
+        Args:
+            workers (int): Number of worker processes, 0 for one per CPU core
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=setup_worker_logging,
+            initargs=(worker_log_queue(), logger.getEffectiveLevel()),
+        )
+
+    async def start(self):
+        """
+        Start the worker processes now instead of on first use.
+
+        Must run before the audio sink opens - forked workers would inherit its pipes
+        and keep them open, e.g. aplay would never see the end of its input.
+        """
+        # Workers share the resource tracker of this process, otherwise each one starts
+        # its own and reports the blocks it attached to as leaked. Windows has no tracker.
+        if os.name == 'posix':
+            resource_tracker.ensure_running()
+
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, _ready) for _ in range(self.workers)))
+
+    async def render(self, samples, sample_rate, effect_counts, backend='numpy'):
+        """
+        Render effects in a worker process.
+
+        Args:
+            samples (np.ndarray): float32 mono samples
+            sample_rate (int): Sample rate in Hz
+            effect_counts (Counter): Effect ID -> number of repetitions, in chain order
+            backend (str): numpy or sox
+
+        Returns:
+            np.ndarray: Processed float32 samples
+        """
+        samples = np.ascontiguousarray(samples, dtype=np.float32)
+        input_block = shared_memory.SharedMemory(create=True, size=max(1, samples.nbytes))
+        try:
+            np.ndarray(samples.shape, dtype=np.float32, buffer=input_block.buf)[:] = samples
+            work = self.executor.submit(
+                _render_worker, input_block.name, len(samples), sample_rate, dict(effect_counts), backend
+            )
+            try:
+                output_name, length = await asyncio.wrap_future(work)
+            except asyncio.CancelledError:
+                # A render already running finishes anyway, its output block is unlinked once it is done
+                work.add_done_callback(_discard_output)
+                raise
+        finally:
+            input_block.close()
+            input_block.unlink()
+
+        output_block = shared_memory.SharedMemory(name=output_name)
+        try:
+            return np.ndarray((length,), dtype=np.float32, buffer=output_block.buf).copy()
+        finally:
+            output_block.close()
+            output_block.unlink()
+
+    def shutdown(self):
+        """
+        Stop the worker processes.
+        """
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,178 @@
+import heapq
+import itertools
+
+
+DEFAULT_LANE = 'normal'
+
+# Cost of a message with no audio estimate, so it still uses up its sender's share
+MIN_COST = 0.1
+
+
+def parse_lane_weights(text):
+    """
+    Parse lane weights like `priority=4,normal=1`.
+
+    Returns:
+        dict: Lane name -> weight
+
+    Raises:
+        ValueError: If a weight is malformed or not positive
+    """
+    weights = {}
+    for part in text.split(','):
+        if part.strip():
+            lane, separator, weight = part.partition('=')
+            if not separator:
+                raise ValueError(f'expected lane=weight, got "{part.strip()}"')
+            lane, weight = lane.strip(), float(weight)
+            # A lane's virtual time advances by cost / weight
+            if not weight > 0:
+                raise ValueError(f'weight of lane "{lane}" must be positive, got {weight:g}')
+            weights[lane] = weight
+    weights.setdefault(DEFAULT_LANE, 1.0)
+    return weights
+
+
+class Lane:
+    """
+    Messages of one priority lane, ordered by start-time fair queueing across senders.
+
+    Every message gets a virtual start tag - the later of the lane's virtual time
+    and the finish tag of its sender's previous message. A message finishes its
+    cost (estimated seconds of audio) later. Serving messages in start tag order
+    gives each sender an equal share of air time, however many messages they
+    queue, at O(log n) per message.
+    """
+    __slots__ = ('name', 'weight', 'heap', 'size', 'virtual_time', 'finish', 'pending', 'passed')
+
+    def __init__(self, name, weight):
+        self.name = name
+        self.weight = weight
+        self.heap = []  # (start tag, sequence, entry)
+        self.size = 0  # Queued messages, the heap also holds removed ones
+        self.virtual_time = 0.0
+        self.finish = {}  # sender -> finish tag of their last queued message
+        self.pending = {}  # sender -> number of queued messages
+        self.passed = 0.0  # Weighted service received, for scheduling between lanes
+
+
+class FairScheduler:
+    """
+    Storage of the sound queue - weighted priority lanes with per-sender fairness.
+
+    Lanes share playback time in proportion to their weights (stride scheduling),
+    senders within a lane share it equally. All operations are O(log n) in the
+    number of queued messages; messages removed out of order are deleted lazily.
+    """
+
+    def __init__(self, lane_weights):
+        """
+        Args:
+            lane_weights (dict): Lane name -> weight, must include DEFAULT_LANE
+        """
+        self.lanes = {name: Lane(name, weight) for name, weight in lane_weights.items()}
+        self.by_age = []  # (sequence, entry), for removing the oldest message
+        self.sequence = itertools.count()
+        self.passed = 0.0  # Service of the last lane served
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return (entry[2] for _, entry in self.by_age if entry[3])
+
+    def lane_of(self, job):
+        return self.lanes.get(job.lane) or self.lanes[DEFAULT_LANE]
+
+    def push(self, job):
+        """
+        Add a message.
+
+        Args:
+            job (MessageJob): The message, with its lane and cost estimate set
+        """
+        lane = self.lane_of(job)
+        if not lane.size:
+            # An idle lane doesn't bank service for when it gets busy again
+            lane.passed = max(lane.passed, self.passed)
+        cost = max(job.estimate.audio_seconds if job.estimate else 0.0, MIN_COST)
+        start = max(lane.virtual_time, lane.finish.get(job.sender, 0.0))
+        lane.finish[job.sender] = start + cost
+        lane.pending[job.sender] = lane.pending.get(job.sender, 0) + 1
+        lane.size += 1
+
+        sequence = next(self.sequence)
+        entry = [lane, job.sender, job, True]  # The last item is cleared when the message leaves the queue
+        heapq.heappush(lane.heap, (start, sequence, entry))
+        heapq.heappush(self.by_age, (sequence, entry))
+        self.size += 1
+
+    def _discard(self, entry):
+        """
+        Mark a message as gone, forgetting its sender in the lane once they have nothing queued.
+        """
+        lane, sender = entry[0], entry[1]
+        entry[3] = False
+        self.size -= 1
+        lane.size -= 1
+        lane.pending[sender] -= 1
+        if not lane.pending[sender]:
+            del lane.pending[sender]
+            del lane.finish[sender]
+
+    @staticmethod
+    def _skip_removed(heap, index):
+        while heap and not heap[0][index][3]:
+            heapq.heappop(heap)
+
+    def _compact(self):
+        """
+        Rebuild the age heap once removed messages make up most of it.
+
+        Messages leave in fair order, not by age, so removed ones pile up behind
+        the oldest queued message. Rebuilding at twice the queue size keeps the
+        cost amortized O(1) per message.
+        """
+        if len(self.by_age) > 2 * self.size + 64:
+            self.by_age = [item for item in self.by_age if item[1][3]]
+            heapq.heapify(self.by_age)
+
+    def pop(self):
+        """
+        Remove the next message to play - from the lane furthest behind its share,
+        the earliest start tag within the lane.
+
+        Returns:
+            MessageJob: The message
+        """
+        for lane in self.lanes.values():
+            self._skip_removed(lane.heap, 2)
+        lane = min((lane for lane in self.lanes.values() if lane.heap), key=lambda lane: lane.passed)
+
+        start, _, entry = heapq.heappop(lane.heap)
+        job = entry[2]
+        lane.virtual_time = start
+        lane.passed += max(job.estimate.audio_seconds if job.estimate else 0.0, MIN_COST) / lane.weight
+        self.passed = lane.passed
+        self._discard(entry)
+        self._skip_removed(self.by_age, 1)
+        self._compact()
+        return job
+
+    def pop_oldest(self):
+        """
+        Remove the message that has been queued the longest, regardless of lanes.
+
+        Returns:
+            MessageJob: The message
+        """
+        self._skip_removed(self.by_age, 1)
+        _, entry = heapq.heappop(self.by_age)
+        self._discard(entry)
+        # The message stays in its lane heap until it reaches the top
+        lane = entry[0]
+        if len(lane.heap) > 2 * lane.size + 64:
+            lane.heap = [item for item in lane.heap if item[2][3]]
+            heapq.heapify(lane.heap)
+        return entry[2]
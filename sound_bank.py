@@ -0,0 +1,175 @@
+import json
+import mmap
+import os
+import shutil
+import struct
+import numpy as np
+from audio import float_to_pcm16, load_sound
+from logger import logger
+
+
+BANK_PATH = os.path.join('cache', 'sounds.bank')
+BANK_MAGIC = b'TTSBANK2'
+
+# Magic, the position and length of the JSON index at the end of the file, then the start of the 16-bit PCM
+HEADER = struct.Struct('<8sQQQ')
+
+# Start of the sample data - aligned, so slices can be viewed as float32 directly
+DATA_OFFSET = 64
+
+
+class SoundBank:
+    """
+    The whole sound library packed into one memory-mapped file.
+
+    The file holds float32 samples of every sound for rendering, the same samples
+    as 16-bit PCM for playing sounds without effects, and a JSON index, so a sound
+    is a zero-copy slice of the mapping. Sounds that changed since the bank was
+    built are not served from it - callers fall back to the individual files.
+    """
+
+    def __init__(self, path, mapping, index, sample_count, pcm_offset):
+        self.path = path
+        self.mapping = mapping
+        self.index = index  # name -> (offset in samples, length in samples, size, mtime_ns)
+        self.samples = np.frombuffer(mapping, dtype=np.float32, count=sample_count, offset=DATA_OFFSET)
+        self.pcm = np.frombuffer(mapping, dtype='<i2', count=sample_count, offset=pcm_offset)
+
+    @classmethod
+    def open(cls, path=BANK_PATH):
+        """
+        Map a bank built by `build`.
+
+        Args:
+            path (str): Path of the bank file
+
+        Returns:
+            SoundBank: The mapped bank, or None if there is no valid bank
+        """
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, 'rb') as f:
+                magic, index_offset, index_length, pcm_offset = HEADER.unpack(f.read(HEADER.size))
+                if magic != BANK_MAGIC:
+                    if magic.startswith(BANK_MAGIC[:-1]):
+                        logger.warning(f'{path} was built by an older version, rebuild it with `make bank`')
+                    else:
+                        logger.warning(f'{path} is not a sound bank, ignoring it')
+                    return None
+                f.seek(index_offset)
+                index = json.loads(f.read(index_length).decode('utf-8'))
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning(f'Could not open sound bank {path}: {e}')
+            return None
+
+        bank = cls(path, mapping, {name: tuple(entry) for name, entry in index.items()},
+                   (pcm_offset - DATA_OFFSET) // 4, pcm_offset)
+        logger.info(f'Loaded sound bank - {len(bank.index)} sounds, {index_offset / 1024 / 1024:.1f} MB')
+        return bank
+
+    def locate(self, name, info):
+        """
+        Returns:
+            slice: Samples of the current version of a sound, or None if the bank doesn't have it
+        """
+        entry = self.index.get(name)
+        if entry is None:
+            return None
+        offset, length, size, mtime_ns = entry
+        if size != info.size or mtime_ns != info.mtime_ns:
+            return None
+        return slice(offset, offset + length)
+
+    def get(self, name, info):
+        """
+        Get the samples of a sound if the bank has its current version.
+
+        Args:
+            name (str): Sound name
+            info (SoundInfo): Current header information from list_sounds
+
+        Returns:
+            np.ndarray: Read-only float32 view into the bank, or None
+        """
+        samples = self.locate(name, info)
+        return None if samples is None else self.samples[samples]
+
+    def get_pcm(self, name, info):
+        """
+        Get a sound as 16-bit PCM ready for the audio sink, if the bank has its current version.
+
+        Args:
+            name (str): Sound name
+            info (SoundInfo): Current header information from list_sounds
+
+        Returns:
+            np.ndarray: Read-only int16 view into the bank, or None
+        """
+        samples = self.locate(name, info)
+        return None if samples is None else self.pcm[samples]
+
+    def close(self):
+        self.samples = None
+        self.pcm = None
+        try:
+            self.mapping.close()
+        except BufferError:
+            # Slices are still in use, the mapping is closed once they are gone
+            pass
+
+
+def build(sounds, path=BANK_PATH):
+    """
+    Pack sounds into a bank file.
+
+    Args:
+        sounds (dict): sound name -> SoundInfo, from list_sounds
+        path (str): Path of the bank file
+
+    Returns:
+        int: Number of packed sounds
+    """
+    index = {}
+    offset = 0
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f'{path}.tmp'
+    pcm_path = f'{path}.pcm.tmp'
+    with open(temp_path, 'wb') as f, open(pcm_path, 'w+b') as pcm:
+        # Sounds are streamed one by one, their PCM to a second file appended after
+        # the float32 samples. The header is filled in at the end.
+        f.write(b'\0' * DATA_OFFSET)
+        for name, info in sorted(sounds.items()):
+            try:
+                samples = load_sound(info)
+            except Exception as e:
+                logger.error(f'Could not pack {info.path}: {e}')
+                continue
+            f.write(samples.astype(np.float32, copy=False).tobytes())
+            pcm.write(float_to_pcm16(samples).tobytes())
+            index[name] = [offset, len(samples), info.size, info.mtime_ns]
+            offset += len(samples)
+
+        pcm_offset = f.tell()
+        pcm.seek(0)
+        shutil.copyfileobj(pcm, f)
+
+        index_data = json.dumps(index).encode('utf-8')
+        index_offset = f.tell()
+        f.write(index_data)
+        f.seek(0)
+        f.write(HEADER.pack(BANK_MAGIC, index_offset, len(index_data), pcm_offset))
+    os.remove(pcm_path)
+    os.replace(temp_path, path)
+
+    return len(index)
+
+
+if __name__ == '__main__':
+    from list_sounds import list_sounds
+
+    count = build(list_sounds())
+    logger.info(f'Packed {count} sounds into {BANK_PATH} ({os.path.getsize(BANK_PATH) / 1024 / 1024:.1f} MB)')
@@ -1,35 +1,43 @@
 import asyncio
+import hashlib
 import logging
 import os
 import re
-import shutil
-import urllib
-import uuid
-import subprocess
-from clean_tmp import clean_tmp
+import time
+import numpy as np
+from audio import SAMPLE_RATE, decode_wav, float_to_pcm16, load_sound, load_sound_pcm
+from audio_cache import AudioCache
+from audio_sink import create_sink
 from fix_numbers import fix_numbers
+from list_sounds import sounds_fingerprint
 from logger import logger
+from metrics import metrics
 from parsed_config import parsed_config
-from platform import system
-from simpleSound import play
-from split_message import split_message
-from collections import Counter
+from render_pool import RenderPool
+from sound_bank import SoundBank
+from tts_batch import TTSBatcher
+from tts_client import TTSClient
+from collections import deque
+from compile_message import SoundRef, compile_message
+from concurrent.futures import ThreadPoolExecutor
 
 
-# System detection
-SYSTEM = system()
+class RenderJob:
+    """
+    A message being rendered.
 
-# Configure sox and curl based on platform
-if SYSTEM == 'Windows':
-    sox_path = r'sox'
-    os.environ['PATH'] = sox_path + ';' + os.environ['PATH']
-    CURL_COMMAND = 'curl.exe'
-    import sox
-else:
-    CURL_COMMAND = 'curl'
-    import sox
+    Segment tasks finish in any order, playback consumes them in message order.
+    """
 
-logging.getLogger('sox').setLevel(logging.ERROR)
+    def __init__(self, message, segments):
+        """
+        Args:
+            message (MessageJob): The message being rendered
+            segments (list): asyncio.Task per segment, resolving to samples or None
+        """
+        self.message = message
+        self.segments = segments
+        self.started_at = time.perf_counter()
 
 
 class SoundProcessor:
@@ -37,52 +45,189 @@ class SoundProcessor:
     Handles sound processing and playback for TTS messages.
     """
     
-    def __init__(self, sounds_list):
+    def __init__(self, sounds, cfg=None):
         """
         Initialize the sound processor.
         
         Args:
-            sounds_list (list): List of available sound effects
+            sounds (dict): Available sound effects, name -> SoundInfo
+            cfg (Config): Configuration, read from config.txt if not given
         """
         # Load configuration
-        cfg = parsed_config()
+        cfg = cfg or parsed_config()
         self.sound_cap = cfg.tts.sound_cap
         self.max_effect_repetitions = cfg.tts.max_effect_repetitions
-        self.sounds_list = sounds_list
-        self.current_sound_cap = 0
+        self.max_number_digits = cfg.tts.max_number_digits
+        self.render_lookahead = cfg.tts.render_lookahead
+        self.effects_backend = cfg.tts.effects_backend
+        self.streaming_playback = cfg.tts.streaming_playback
+        self.sounds = sounds
+
+        # Packed sound library, sounds missing from it are read from their files
+        self.sound_bank = SoundBank.open()
+
+        self.tts_client = TTSClient(
+            cfg.tts.tts_url,
+            timeout=cfg.tts.tts_timeout,
+            retries=cfg.tts.tts_retries,
+            concurrency=cfg.tts.tts_concurrency,
+            deadline=cfg.tts.tts_deadline,
+            hedge_percentile=cfg.tts.tts_hedge_percentile,
+            health_interval=cfg.tts.tts_health_interval,
+            breaker_failures=cfg.tts.tts_breaker_failures,
+            breaker_cooldown=cfg.tts.tts_breaker_cooldown,
+        )
+
+        # Text runs synthesized close together share a single TTS request
+        self.tts_batcher = None
+        if cfg.tts.tts_batching:
+            self.tts_batcher = TTSBatcher(
+                self.tts_client,
+                window=cfg.tts.tts_batch_window,
+                max_chars=cfg.tts.tts_batch_max_chars,
+                min_gap=cfg.tts.tts_batch_min_gap,
+            )
+
+        # Bounded executor for blocking work, so the event loop never stalls on rendering
+        self.executor = ThreadPoolExecutor(max_workers=cfg.tts.render_threads, thread_name_prefix='render')
+
+        # Synthesized speech cache, keyed by voice and normalized text
+        self.tts_voice = cfg.tts.tts_voice
+        self.tts_cache = AudioCache(
+            os.path.join('cache', 'tts'),
+            memory_bytes=int(cfg.tts.tts_cache_memory_mb * 1024 * 1024),
+            disk_bytes=int(cfg.tts.tts_cache_disk_mb * 1024 * 1024),
+            name='TTS cache',
+            executor=self.executor,
+        )
+
+        # Rendered effects cache, keyed by effect chain and input audio.
+        # Cleared when the sound library changes.
+        self.render_cache = AudioCache(
+            os.path.join('cache', 'render'),
+            memory_bytes=int(cfg.tts.render_cache_memory_mb * 1024 * 1024),
+            disk_bytes=int(cfg.tts.render_cache_disk_mb * 1024 * 1024),
+            name='Render cache',
+            generation=sounds_fingerprint(sounds),
+            executor=self.executor,
+        )
+
+        # Worker processes rendering effects of all segments in flight on all cores
+        self.render_pool = RenderPool(cfg.tts.render_workers)
+
+        # Long-lived audio output
+        self.sink = create_sink(cfg.tts.audio_sink, cfg.tts.audio_sink_target, cfg.tts.audio_sink_buffer)
+
+        # Seconds from the start of rendering to the first audio of recent messages
+        self.time_to_first_sound = deque(maxlen=100)
         
-        # Ensure tmp directory exists
+        # Ensure tmp directory exists - only used by audio sinks that need files
         if not os.path.exists('tmp'):
             os.makedirs('tmp')
 
     async def sound_play_loop(self, sound_queue):
         """
         Main loop that processes messages from the queue.
-        
+
+        Rendering and playback run as two separate stages connected by a bounded
+        queue, so the next messages are synthesized while the current one plays.
+
         Args:
-            sound_queue (asyncio.Queue): Queue containing messages to process
+            sound_queue (AdmissionQueue): Queue containing MessageJobs to process
+        """
+        rendered_queue = asyncio.Queue(maxsize=self.render_lookahead)
+        self.register_gauges(sound_queue, rendered_queue)
+        await self.render_pool.start()
+        await self.sink.start()
+        await asyncio.gather(
+            self.render_loop(sound_queue, rendered_queue),
+            self.playback_loop(sound_queue, rendered_queue),
+        )
+
+    async def render_loop(self, sound_queue, rendered_queue):
+        """
+        Render stage - starts rendering queued messages ahead of playback.
+
+        Blocks once `render_lookahead` messages are waiting to be played.
+
+        Args:
+            sound_queue (AdmissionQueue): Queue containing MessageJobs to process
+            rendered_queue (asyncio.Queue): Queue receiving render jobs
         """
         logger.debug('sound_play - waiting for item in queue.')
         while True:
             try:
                 message = await asyncio.wait_for(sound_queue.get(), timeout=1)
-                logger.debug(f'sound_play - Executing "{message}" from queue. Queue size: {sound_queue.qsize()}')
+                metrics.stage('queue_wait', time.perf_counter() - message.enqueued_at)
+                if sound_queue.expired(message):
+                    sound_queue.finish(message)
+                    continue
+                logger.debug('sound_play - Rendering "%s" from queue. Queue size: %d', message.text, sound_queue.qsize())
 
+                segments = []
                 try:
-                    # Process and play the message
-                    await self.process_message(message)
+                    segments = await self.process_message(message.text)
                 except Exception as e:
                     logger.error(f'Error processing message: {e}')
-                
-                # Release the queue item
-                sound_queue.task_done()
-                logger.debug(f'sound_play - Task done. Queue size: {sound_queue.qsize()}')
-                
+
+                await rendered_queue.put(RenderJob(message, segments))
+                logger.debug('sound_play - Rendering "%s" started. Rendered queue size: %d', message.text, rendered_queue.qsize())
+
             except asyncio.TimeoutError:
                 # No new messages in queue, continue waiting
                 pass
             except Exception as e:
-                logger.error(f'Unexpected error in sound play loop: {e}')
+                logger.error(f'Unexpected error in sound render loop: {e}')
+
+    async def playback_loop(self, sound_queue, rendered_queue):
+        """
+        Playback stage - writes render jobs to the audio sink in queue order.
+
+        In streaming mode each segment is written as soon as it is rendered,
+        otherwise the message is written once all segments are rendered.
+
+        Args:
+            sound_queue (AdmissionQueue): Queue containing MessageJobs to process
+            rendered_queue (asyncio.Queue): Queue containing render jobs
+        """
+        while True:
+            try:
+                job = await rendered_queue.get()
+
+                try:
+                    if self.streaming_playback:
+                        segments = job.segments
+                    else:
+                        buffers = await asyncio.gather(*job.segments)
+                        with metrics.span('combine'):
+                            segments = [self.combine_buffers(buffers)]
+
+                    playback_start = None
+                    for segment in segments:
+                        audio = await segment if isinstance(segment, asyncio.Task) else segment
+                        if audio is None:
+                            continue
+                        if playback_start is None:
+                            self.record_first_sound(job)
+                            playback_start = time.perf_counter()
+                        await self.sink.write(audio if isinstance(audio, bytes) else float_to_pcm16(audio).tobytes())
+
+                    await self.sink.end_clip(self.clip_done_callback(job, playback_start))
+                except Exception as e:
+                    logger.error(f'Error playing message: {e}')
+
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug('sound_play - TTS cache: %s', self.tts_cache.stats())
+                    logger.debug('sound_play - Render cache: %s', self.render_cache.stats())
+                    logger.debug('sound_play - TTS backends: %s', self.tts_client.stats())
+
+                # Release the queue items
+                rendered_queue.task_done()
+                sound_queue.finish(job.message)
+                logger.debug('sound_play - Task done. Queue size: %d', sound_queue.qsize())
+
+            except Exception as e:
+                logger.error(f'Unexpected error in sound playback loop: {e}')
 
     async def process_message(self, message):
         """
@@ -90,285 +235,307 @@ class SoundProcessor:
         
         Args:
             message (str): The message to process
+
+        Returns:
+            list: asyncio.Task per segment, resolving to samples, PCM bytes or None
         """
-        # Reset sound cap for this message
-        self.current_sound_cap = 0
-        
-        # Split message into tokens
-        tokens = await split_message(message)
-        logger.debug(f'sound_play - tokens - {tokens}')
+        with metrics.span('compile'):
+            plan = compile_message(message, self.sounds, self.sound_cap, self.max_effect_repetitions)
+        logger.debug('sound_play - plan - %s', plan)
 
-        if not tokens:
+        if not plan.segments:
             logger.warning("No tokens found in message")
-            return
-
-        wavs = []
-        segment = []
-        effect_ids = []
-
-        for token in tokens:
-            if re.match(r'\{\d+\}', token):
-                if segment:
-                    wavs.append(await self.process_segment(segment, effect_ids))
-                    segment = []
-                effect_ids.append(int(token[1:-1]))
-            elif token == '{.}':
-                if segment:
-                    wavs.append(await self.process_segment(segment, effect_ids))
-                    segment = []
-                effect_ids = []
-            else:
-                segment.append(token)
-                
-        logger.debug(f'sound_play - processing last segment: {segment}')
-        if segment:
-            wavs.append(await self.process_segment(segment, effect_ids))
-            logger.debug(f'sound_play - processed last segment, resulting wav: {wavs}')
-
-        logger.debug(f'sound_play - files are {wavs}')
-
-        await self.combine_and_play_wavs(wavs)
-
-    async def process_segment(self, segment, effect_ids):
-        """
-        Process a segment of tokens into a single audio file.
+            return []
+
+        # Segments render concurrently so their TTS requests overlap, and the first
+        # segment can start playing while later ones are still rendering.
+        # Sounds without effects skip rendering and go to the sink as they are.
+        return [
+            asyncio.create_task(self.passthrough_segment(segment) if segment.passthrough else self.process_segment(segment))
+            for segment in plan.segments
+        ]
+
+    async def passthrough_segment(self, segment):
+        """
+        Get the audio of a segment of sounds without effects, with no decoding or rendering.
+
+        Args:
+            segment (Segment): Sounds only, no effects
+
+        Returns:
+            bytes: 16-bit PCM of the sounds, or None on failure
+        """
+        try:
+            return b''.join([await self.load_sound_pcm(sound) for sound in segment.items])
+        except Exception as e:
+            logger.error(f'Error in passthrough_segment: {e}')
+            return None
+
+    async def process_segment(self, segment):
+        """
+        Process a segment of a compiled message into a single audio buffer.
         
         Args:
-            segment (list): List of text/sound tokens
-            effect_ids (list): List of effects to apply
+            segment (Segment): Text runs and sounds with their effects
             
         Returns:
-            str: Path to the processed audio file
+            np.ndarray: Processed samples, or None if nothing was rendered
         """
-        logger.debug(f'process_segment - segment: {segment}, effect_ids: {effect_ids}')
+        logger.debug('process_segment - segment: %s', segment)
 
-        input_files = []
-        
         try:
-            for text in segment:
-                if text.startswith('[') and text.endswith(']') and text in self.sounds_list:
-                    if self.current_sound_cap < self.sound_cap:
-                        input_files.append(f'sounds/{text[1:-1]}.wav')
-                        self.current_sound_cap += 1
+            # Sounds and text are loaded concurrently
+            inputs = []
+            for item in segment.items:
+                if isinstance(item, SoundRef):
+                    inputs.append(asyncio.create_task(self.load_sound(item)))
                 else:
-                    try:
-                        # Process text-to-speech
-                        text = await fix_numbers(text)
-                        if not bool(re.match(r'.*(\.|!|\?)$', text)):
-                            text += '.'
-
-                        url = f'http://localhost:5002/api/tts?text={urllib.parse.quote_plus(text)}'
-                        temp_filename = f'tmp/{uuid.uuid4()}.wav'
-                        
-                        result = subprocess.run(
-                            [CURL_COMMAND, '-s', url, '-o', temp_filename], 
-                            capture_output=True, 
-                            text=True
-                        )
-                        
-                        if result.returncode == 0 and os.path.exists(temp_filename) and os.path.getsize(temp_filename) > 0:
-                            input_files.append(temp_filename)
-                        else:
-                            logger.error(f'Error while making request to TTS server: {result.stderr}')
-                    except Exception as e:
-                        logger.error(f'Error processing text: {e}')
-
-            logger.debug(f'process_segment - input_files: {input_files}')
-            
-            if not input_files:
-                logger.warning("No input files generated for segment")
+                    inputs.append(asyncio.create_task(self.synthesize_text(item.text)))
+
+            input_buffers = []
+            for item in inputs:
+                item = await item
+                if item is not None:
+                    input_buffers.append(item)
+
+            if not input_buffers:
+                logger.warning("No audio generated for segment")
                 return None
-                
-            output_file = f'tmp/{uuid.uuid4()}.wav'
-            await self.apply_effect(effect_ids, input_files, output_file)
-
-            # Clean up temporary input files
-            for input_file in input_files:
-                if not input_file.startswith('sounds/') and os.path.exists(input_file):
-                    try:
-                        os.remove(input_file)
-                    except Exception as e:
-                        logger.error(f'Error removing temporary file {input_file}: {e}')
-
-            return output_file
+
+            return await self.apply_effect(segment.effects, input_buffers)
             
         except Exception as e:
             logger.error(f'Error in process_segment: {e}')
             return None
 
-    async def apply_effect(self, effect_ids, input_files, output_file):
+    async def load_sound(self, sound):
         """
-        Apply audio effects to the input files.
-        
+        Get the samples of a sound, from the sound bank when it has the current version.
+
+        Args:
+            sound (SoundRef): The sound
+
+        Returns:
+            np.ndarray: float32 samples, read-only when taken from the bank
+        """
+        if self.sound_bank:
+            samples = self.sound_bank.get(sound.name, sound.info)
+            if samples is not None:
+                return samples
+        return await asyncio.get_running_loop().run_in_executor(self.executor, load_sound, sound.info)
+
+    async def load_sound_pcm(self, sound):
+        """
+        Get a sound as 16-bit PCM, from the sound bank when it has the current version.
+
         Args:
-            effect_ids (list): List of effect IDs to apply
-            input_files (list): List of input audio files
-            output_file (str): Path to the output file
+            sound (SoundRef): The sound
+
+        Returns:
+            bytes-like: 16-bit mono PCM, a read-only view when taken from the bank
+        """
+        if self.sound_bank:
+            pcm = self.sound_bank.get_pcm(sound.name, sound.info)
+            if pcm is not None:
+                return pcm
+        return await asyncio.get_running_loop().run_in_executor(self.executor, load_sound_pcm, sound.info)
+
+    async def synthesize_text(self, text):
+        """
+        Synthesize a text token using the TTS server.
+
+        Args:
+            text (str): Text to synthesize
+
+        Returns:
+            np.ndarray: Synthesized samples, or None on failure
         """
         try:
-            tfm = sox.Transformer()
-            
-            # Skip if no input files
-            if not input_files:
-                logger.warning("No input files to apply effects to")
-                return
-                
-            # Concatenate input files
-            combined_input = 'tmp/combined_input.wav'
-            
-            combiner = sox.Combiner()
-            if len(input_files) > 1:
-                combiner.build(input_files, combined_input, 'concatenate')
-            elif len(input_files) == 1:
-                shutil.copy(input_files[0], combined_input)
-            else:
-                logger.warning("No input files to combine")
-                return
-
-            # Limit effect repetitions based on configuration
-            effect_counts = Counter(effect_ids)
-            if self.max_effect_repetitions is not None:
-                for effect_id, count in effect_counts.items():
-                    if count > self.max_effect_repetitions:
-                        effect_counts[effect_id] = self.max_effect_repetitions
-
-            # Apply effects
-            for effect_id, count in effect_counts.items():
-                for _ in range(count):
-                    if effect_id == 1:
-                        # room echo
-                        tfm.reverb(50, room_scale=25)
-                    elif effect_id == 2:
-                        # hall echo
-                        tfm.reverb(75, room_scale=75, wet_gain=1)
-                    elif effect_id == 3:
-                        # outside echo
-                        tfm.reverb(5, room_scale=5)
-                    elif effect_id == 4:
-                        # pitch down
-                        tfm.pitch(-5)  # half an octave
-                    elif effect_id == 5:
-                        # pitch up
-                        tfm.pitch(5)  # half an octave
-                    elif effect_id == 6:
-                        # telephone
-                        tfm.highpass(800).gain(2)
-                    elif effect_id == 7:
-                        # muffled
-                        tfm.lowpass(1200).gain(1)
-                    elif effect_id == 8:
-                        # quieter
-                        tfm.gain(-20)
-                    elif effect_id == 9:
-                        # ghost
-                        (tfm
-                            .pad(0.5, 0.5)
-                            .reverse()
-                            .reverb(reverberance=50, wet_gain=1)
-                            .reverse()
-                            .reverb())
-                    elif effect_id == 10:
-                        # chorus
-                        tfm.chorus()
-                    elif effect_id == 11:
-                        # slow down
-                        tfm.tempo(0.5)
-                    elif effect_id == 12:
-                        # speed up
-                        tfm.tempo(1.5)
+            with metrics.span('normalize'):
+                text = await fix_numbers(text, self.max_number_digits)
+            if not bool(re.match(r'.*(\.|!|\?)$', text)):
+                text += '.'
+
+            # Cache hits skip the TTS server entirely
+            key = AudioCache.make_key(self.tts_voice, text)
+            audio = await self.tts_cache.get(key)
+            if audio is None:
+                with metrics.span('tts'):
+                    if self.tts_batcher:
+                        audio = await self.tts_batcher.synthesize(text)
                     else:
-                        logger.warning(f"Unknown effect ID: {effect_id}")
+                        audio = await self.tts_client.synthesize(text)
+                if audio is None:
+                    return None
+                self.tts_cache.put(key, audio)
 
-            # Build the final output
-            tfm.build(combined_input, output_file)
-            
-            # Clean up the combined input file
-            if os.path.exists(combined_input):
-                os.remove(combined_input)
-                
+            with metrics.span('decode'):
+                samples = await asyncio.get_running_loop().run_in_executor(self.executor, decode_wav, audio)
+            # Speech rate for the cost estimates of admission control
+            metrics.observe('tts_speech_seconds_per_char', len(samples) / SAMPLE_RATE / len(text))
+            return samples
         except Exception as e:
-            logger.error(f'Error applying effects: {e}')
+            logger.error(f'Error processing text: {e}')
+            return None
 
-    async def combine_and_play_wavs(self, wavs):
+    async def apply_effect(self, effect_counts, input_buffers):
         """
-        Combine multiple WAV files and play the result.
+        Apply audio effects to the input buffers.
         
         Args:
-            wavs (list): List of WAV file paths to combine and play
+            effect_counts (Counter): Effect ID -> number of repetitions, limits already applied
+            input_buffers (list): List of input sample buffers, concatenated before processing
+
+        Returns:
+            np.ndarray: Processed samples, or None on failure
         """
         try:
-            # Skip if no WAV files
-            if not wavs or all(w is None for w in wavs):
-                logger.warning("No valid WAV files to play")
-                return
-                
-            # Remove None entries
-            wavs = [w for w in wavs if w is not None]
-            
-            output_file = 'output.wav'
-            
-            # Combine WAVs if there are multiple files
-            if len(wavs) > 1:
-                combiner = sox.Combiner()
-                combiner.build(wavs, output_file, 'concatenate')
-            elif len(wavs) == 1:
-                shutil.copy(wavs[0], output_file)
-            else:
-                logger.warning("No WAV files to combine")
-                return
-
-            # Play the combined WAV
-            task = asyncio.to_thread(self.play_audio, output_file)
-            await asyncio.create_task(task)
-            
-            # Clean up temporary WAV files
-            for wav in wavs:
-                if os.path.exists(wav):
-                    try:
-                        os.remove(wav)
-                    except Exception as e:
-                        logger.error(f'Error removing temporary WAV file {wav}: {e}')
-                        
+            # Skip if no input
+            if not input_buffers:
+                logger.warning("No input audio to apply effects to")
+                return None
+
+            with metrics.span('combine'):
+                samples = np.concatenate(input_buffers)
+            if not effect_counts:
+                return samples
+
+            # Repeated sound and effect combinations are copied from the cache
+            loop = asyncio.get_running_loop()
+            key = await loop.run_in_executor(self.executor, self.render_key, samples, effect_counts, self.effects_backend)
+            cached = await self.render_cache.get(key)
+            if cached is not None:
+                return np.frombuffer(cached, dtype=np.float32).copy()
+
+            with metrics.span('render'):
+                result = await self.render_pool.render(samples, SAMPLE_RATE, effect_counts, self.effects_backend)
+            self.render_cache.put(key, result.tobytes())
+            return result
+
         except Exception as e:
-            logger.error(f'Error combining and playing WAVs: {e}')
+            logger.error(f'Error applying effects: {e}')
+            return None
 
-    def play_audio(self, file_path):
+    @staticmethod
+    def render_key(samples, effect_counts, backend):
         """
-        Play an audio file.
+        Build the render cache key of an effect chain applied to some audio.
+
+        Args:
+            samples (np.ndarray): float32 input samples
+            effect_counts (Counter): Effect ID -> number of repetitions, limits already applied
+            backend (str): Effects backend, numpy and sox output differ slightly
+
+        Returns:
+            str: Cache key
+        """
+        # Chain order is part of the signature - effects don't commute
+        signature = ','.join(f'{effect_id}x{count}' for effect_id, count in effect_counts.items())
+        content = hashlib.sha256(np.ascontiguousarray(samples, dtype=np.float32)).hexdigest()
+        return AudioCache.make_key(backend, signature, SAMPLE_RATE, content)
+
+    def combine_buffers(self, buffers):
+        """
+        Join segment buffers into a single buffer ready for playback.
         
         Args:
-            file_path (str): Path to the audio file to play
+            buffers (list): Segment samples or PCM bytes, None for failed segments
+
+        Returns:
+            bytes: Combined 16-bit PCM, or None if there was nothing to combine
         """
-        try:
-            if SYSTEM == 'Windows':
-                logger.debug(f'Playing sound on {SYSTEM}')
-                play(file_path)
-            elif SYSTEM == 'Linux':
-                logger.debug(f'Playing sound on {SYSTEM}')
-                result = subprocess.run(['aplay', '-q', file_path], capture_output=True, text=True)
-                if result.returncode != 0:
-                    logger.error(f'Error playing sound on Linux: {result.stderr}')
-            else:
-                logger.error(f'Unsupported system: {SYSTEM}')
-                
-            # Clean up the played file
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                
-            # Clean temporary files
-            clean_tmp()
-            
-        except Exception as e:
-            logger.error(f'Error playing audio: {e}')
+        # Remove None entries
+        buffers = [b for b in buffers if b is not None]
+
+        if not buffers:
+            logger.warning("No valid audio to play")
+            return None
+
+        return b''.join(buffer if isinstance(buffer, bytes) else float_to_pcm16(buffer).tobytes() for buffer in buffers)
+
+    @staticmethod
+    def clip_done_callback(job, playback_start):
+        """
+        Build the callback recording playback and end-to-end time once the sink is done with a message.
+
+        Args:
+            job (RenderJob): The message being played
+            playback_start (float): perf_counter time of its first sound, None if nothing played
+
+        Returns:
+            callable: The callback, or None if there is nothing to record
+        """
+        if playback_start is None:
+            return None
+
+        def done():
+            now = time.perf_counter()
+            metrics.stage('playback', now - playback_start)
+            metrics.stage('end_to_end', now - job.message.enqueued_at)
+        return done
+
+    def register_gauges(self, sound_queue, rendered_queue):
+        """
+        Expose queue depths, audio buffer fill, cache sizes and TTS load as gauges.
+
+        Args:
+            sound_queue (AdmissionQueue): Queue containing MessageJobs to process
+            rendered_queue (asyncio.Queue): Queue containing render jobs
+        """
+        metrics.gauge('tts_queue_depth', sound_queue.qsize, queue='sound')
+        metrics.gauge('tts_queue_depth', rendered_queue.qsize, queue='rendered')
+        metrics.gauge('tts_sink_buffered_chunks', self.sink.buffer.qsize)
+        for cache in (self.tts_cache, self.render_cache):
+            name = cache.name.lower().replace(' ', '_')
+            for stat in ('hit_rate', 'memory_bytes', 'disk_bytes', 'memory_entries', 'disk_entries'):
+                metrics.gauge(f'tts_cache_{stat}', lambda cache=cache, stat=stat: cache.stats()[stat], cache=name)
+        for backend in self.tts_client.backends:
+            metrics.gauge('tts_backend_outstanding', lambda backend=backend: backend.outstanding, backend=backend.url)
+
+    def record_first_sound(self, job):
+        """
+        Track time to first sound of a message.
+
+        Args:
+            job (RenderJob): The message starting to play
+        """
+        elapsed = time.perf_counter() - job.started_at
+        self.time_to_first_sound.append(elapsed)
+        metrics.stage('first_sound', elapsed)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                'sound_play - Time to first sound: %.3fs (avg %.3fs, max %.3fs over last %d)',
+                elapsed, sum(self.time_to_first_sound) / len(self.time_to_first_sound),
+                max(self.time_to_first_sound), len(self.time_to_first_sound),
+            )
 
 
-async def sound_play(sound_queue, sounds_list):
+async def sound_play(sound_queue, sounds, cfg=None):
     """
     Main entry point for sound processing.
     
     Args:
-        sound_queue (asyncio.Queue): Queue containing messages to process
-        sounds_list (list): List of available sound effects
+        sound_queue (AdmissionQueue): Queue containing MessageJobs to process
+        sounds (dict): Available sound effects, name -> SoundInfo
+        cfg (Config): Configuration, read from config.txt if not given
     """
-    processor = SoundProcessor(sounds_list)
-    await processor.sound_play_loop(sound_queue)
+    processor = SoundProcessor(sounds, cfg)
+    try:
+        await processor.sound_play_loop(sound_queue)
+    finally:
+        await processor.sink.close()
+        if processor.tts_batcher:
+            await processor.tts_batcher.close()
+        await processor.tts_client.close()
+        await processor.tts_cache.close()
+        await processor.render_cache.close()
+        processor.executor.shutdown(wait=False, cancel_futures=True)
+        processor.render_pool.shutdown()
+        if processor.sound_bank:
+            processor.sound_bank.close()
+        logger.info(f'TTS cache: {processor.tts_cache.stats()}')
+        logger.info(f'Render cache: {processor.render_cache.stats()}')
+        logger.info(f'TTS backends: {processor.tts_client.stats()}')
+        if processor.tts_batcher:
+            logger.info(f'TTS batching: {processor.tts_batcher.stats()}')
+        logger.info(f'Admission: {sound_queue.stats()}')
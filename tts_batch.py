@@ -0,0 +1,259 @@
+import asyncio
+import io
+import re
+import struct
+import wave
+import numpy as np
+from audio import WAVE_FORMAT_PCM, float_to_pcm16, parse_wav_header, pcm_to_float
+from logger import logger
+
+
+# Sentence ends - tts-server synthesizes sentences separately and joins them with silence
+SENTENCE_END_PATTERN = re.compile(r'[.!?]+(?=\s|$)')
+
+# Samples quieter than this count as silence (16-bit scale)
+SILENCE_THRESHOLD = 64
+
+# Pieces whose speech rate differs from the batch's by more than this factor mean a bad split
+MAX_RATE_DEVIATION = 3.0
+
+
+def read_pcm16(data):
+    """
+    Read a WAV as 16-bit mono samples, converting only when it is in another format.
+
+    Args:
+        data (bytes): WAV file contents
+
+    Returns:
+        tuple: (np.ndarray int16 samples, sample rate), or None for formats audio.py can't decode
+    """
+    try:
+        f = io.BytesIO(data)
+        format_tag, channels, sample_rate, bits_per_sample, _, data_size = parse_wav_header(f)
+        frames = f.read(data_size)
+        if format_tag == WAVE_FORMAT_PCM and bits_per_sample == 16 and channels == 1:
+            return np.frombuffer(frames[:len(frames) & ~1], dtype='<i2'), sample_rate
+        return float_to_pcm16(pcm_to_float(frames, bits_per_sample // 8, channels, format_tag)), sample_rate
+    except (ValueError, struct.error):
+        return None
+
+
+def write_pcm16(samples, sample_rate):
+    """
+    Write 16-bit mono samples as WAV bytes.
+
+    Returns:
+        bytes: WAV file contents
+    """
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+def find_gaps(samples, min_frames):
+    """
+    Find stretches of silence between sounds.
+
+    Args:
+        samples (np.ndarray): int16 samples
+        min_frames (int): Shortest silence counted as a gap
+
+    Returns:
+        list: (start, end) sample ranges of the gaps, leading and trailing silence excluded
+    """
+    silent = np.abs(samples.astype(np.int32)) < SILENCE_THRESHOLD
+    # Edges of silent stretches, padded so stretches touching the ends are closed
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], silent, [False])).astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+    return [
+        (int(start), int(end)) for start, end in zip(starts, ends)
+        if end - start >= min_frames and start > 0 and end < len(samples)
+    ]
+
+
+def split_batch(samples, texts, min_frames):
+    """
+    Split the audio of a batch back into the audio of its texts.
+
+    Every sentence is followed by a gap, so the text boundaries are the gaps after
+    the last sentence of each text. The split is refused when the number of gaps
+    doesn't match the sentences, or a piece is far too long or short for its text.
+
+    Args:
+        samples (np.ndarray): int16 samples of the whole batch
+        texts (list): Texts of the batch, in order
+        min_frames (int): Shortest silence counted as a sentence gap
+
+    Returns:
+        list: int16 samples per text, or None if the split is ambiguous
+    """
+    sentences = [max(1, len(SENTENCE_END_PATTERN.findall(text))) for text in texts]
+    gaps = find_gaps(samples, min_frames)
+    if len(gaps) != sum(sentences) - 1:
+        return None
+
+    pieces = []
+    start = 0
+    boundary = -1
+    for count in sentences[:-1]:
+        boundary += count
+        gap_start, gap_end = gaps[boundary]
+        pieces.append(samples[start:gap_start])
+        start = gap_end
+    pieces.append(samples[start:])
+
+    rate = sum(len(piece) for piece in pieces) / sum(len(text) for text in texts)
+    for piece, text in zip(pieces, texts):
+        piece_rate = len(piece) / len(text)
+        if not rate / MAX_RATE_DEVIATION <= piece_rate <= rate * MAX_RATE_DEVIATION:
+            return None
+    return pieces
+
+
+class TTSBatcher:
+    """
+    Combines TTS requests made close together into single synthesis requests.
+
+    Requests made within `window` seconds of each other - all text runs of a
+    message, or of several messages rendered together - are joined into one text.
+    The audio is split back per request at the silences the server puts between
+    sentences. When the split is ambiguous, or the batch fails, every request is
+    sent on its own.
+    """
+
+    def __init__(self, client, window=0.0, max_chars=500, min_gap=0.3):
+        """
+        Initialize the batcher.
+
+        Args:
+            client (TTSClient): Client making the requests
+            window (float): Seconds to wait for more requests, 0 batches requests made in the same event loop step
+            max_chars (int): Longest text of a single batch
+            min_gap (float): Shortest silence in seconds counted as a sentence gap
+        """
+        self.client = client
+        self.window = window
+        self.max_chars = max_chars
+        self.min_gap = min_gap
+        self.pending = []  # (text, future)
+        self.flush_handle = None
+        self.tasks = set()
+
+        self.batches = 0
+        self.batched_texts = 0
+        self.fallbacks = 0
+
+    async def synthesize(self, text):
+        """
+        Synthesize speech as part of a batch.
+
+        Args:
+            text (str): Text to synthesize, ending with sentence punctuation
+
+        Returns:
+            bytes: WAV audio of the text, or None on failure
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((text, future))
+        if self.flush_handle is None:
+            self.flush_handle = loop.call_later(self.window, self._flush) if self.window else loop.call_soon(self._flush)
+        return await future
+
+    def _flush(self):
+        """
+        Send the pending requests, in batches of up to `max_chars` characters.
+        """
+        self.flush_handle = None
+        pending = [(text, future) for text, future in self.pending if not future.done()]
+        self.pending = []
+
+        batch = []
+        length = 0
+        for text, future in pending:
+            if batch and length + len(text) + 1 > self.max_chars:
+                self._start(batch)
+                batch = []
+                length = 0
+            batch.append((text, future))
+            length += len(text) + 1
+        if batch:
+            self._start(batch)
+
+    def _start(self, batch):
+        task = asyncio.create_task(self._send(batch))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    @staticmethod
+    def _resolve(future, result):
+        if not future.done():
+            future.set_result(result)
+
+    async def _send_each(self, batch):
+        results = await asyncio.gather(*(self.client.synthesize(text) for text, _ in batch))
+        for (_, future), result in zip(batch, results):
+            self._resolve(future, result)
+
+    async def _send(self, batch):
+        """
+        Synthesize a batch, falling back to one request per text if it can't be split.
+        """
+        try:
+            if len(batch) == 1:
+                await self._send_each(batch)
+                return
+
+            texts = [text for text, _ in batch]
+            pieces = None
+            try:
+                audio = await self.client.synthesize(' '.join(texts))
+                if audio is not None:
+                    decoded = read_pcm16(audio)
+                    if decoded is not None:
+                        samples, sample_rate = decoded
+                        pieces = split_batch(samples, texts, int(self.min_gap * sample_rate))
+            except Exception as e:
+                # The texts can still be synthesized one by one
+                logger.warning(f'Error splitting batched TTS audio: {e!r}')
+                pieces = None
+
+            if pieces is None:
+                self.fallbacks += 1
+                logger.debug('Could not split batched TTS audio of %d texts, synthesizing them one by one', len(batch))
+                await self._send_each(batch)
+                return
+
+            self.batches += 1
+            self.batched_texts += len(batch)
+            for (_, future), piece in zip(batch, pieces):
+                self._resolve(future, write_pcm16(piece, sample_rate))
+        except Exception as e:
+            logger.error(f'Error in batched TTS request: {e!r}')
+            for _, future in batch:
+                self._resolve(future, None)
+
+    async def close(self):
+        """
+        Cancel batches in flight.
+        """
+        if self.flush_handle:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def stats(self):
+        """
+        Get batching counters.
+
+        Returns:
+            dict: Batches split successfully, texts they carried, and batches sent one by one instead
+        """
+        return {'batches': self.batches, 'batched_texts': self.batched_texts, 'fallbacks': self.fallbacks}
@@ -0,0 +1,401 @@
+import asyncio
+import time
+import aiohttp
+from collections import deque
+from logger import logger
+
+
+class NoBackendAvailable(Exception):
+    """
+    Every TTS backend is failing and its circuit breaker is open.
+    """
+
+
+class TTSBackend:
+    """
+    A single TTS server with its load, latency history and circuit breaker.
+
+    The breaker opens after a number of consecutive failures. While open, the
+    backend gets no traffic. After the cooldown a single trial request is let
+    through (half-open) - success closes the breaker, failure opens it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, url, breaker_failures=3, breaker_cooldown=15.0):
+        """
+        Initialize the backend.
+
+        Args:
+            url (str): TTS server endpoint, e.g. http://localhost:5002/api/tts
+            breaker_failures (int): Consecutive failures that open the circuit breaker
+            breaker_cooldown (float): Seconds the breaker stays open before a trial request
+        """
+        self.url = url
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+
+        self.outstanding = 0
+        self.latencies = deque(maxlen=200)  # Seconds of recent successful requests
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.trial_in_flight = False
+        self.last_success = 0.0
+
+        self.requests = 0
+        self.failures = 0
+        self.hedges = 0
+        self.hedges_won = 0
+
+    @property
+    def state(self):
+        if self.consecutive_failures < self.breaker_failures:
+            return self.CLOSED
+        if time.monotonic() < self.open_until:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def available(self):
+        """
+        Check if the backend may take a request now.
+
+        Returns:
+            bool: True if the breaker is closed, or half-open without a trial in flight
+        """
+        state = self.state
+        return state == self.CLOSED or (state == self.HALF_OPEN and not self.trial_in_flight)
+
+    def record_success(self, latency=None):
+        """
+        Record a successful request, closing the circuit breaker.
+
+        Args:
+            latency (float): Request duration in seconds, None for health checks
+        """
+        if self.consecutive_failures >= self.breaker_failures:
+            logger.info(f'TTS backend {self.url} recovered')
+        self.consecutive_failures = 0
+        self.last_success = time.monotonic()
+        if latency is not None:
+            self.latencies.append(latency)
+
+    def record_failure(self, health_check=False):
+        """
+        Record a failed request, opening the circuit breaker after too many in a row.
+
+        Args:
+            health_check (bool): The request was a health check, not counted in the statistics
+        """
+        if not health_check:
+            self.failures += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.breaker_failures:
+            if self.consecutive_failures == self.breaker_failures:
+                logger.warning(f'TTS backend {self.url} failed {self.consecutive_failures} times in a row, '
+                               f'pausing it for {self.breaker_cooldown} seconds')
+            self.open_until = time.monotonic() + self.breaker_cooldown
+
+    def percentile(self, percent):
+        """
+        Get a percentile of recent request latencies.
+
+        Args:
+            percent (float): Percentile, 0-100
+
+        Returns:
+            float: Latency in seconds, or None without any samples
+        """
+        if not self.latencies:
+            return None
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percent / 100))]
+
+    def stats(self):
+        """
+        Get backend counters and latency percentiles.
+
+        Returns:
+            dict: Load, breaker state, counters and p50/p95/p99 latency in milliseconds
+        """
+        return {
+            'state': self.state,
+            'outstanding': self.outstanding,
+            'requests': self.requests,
+            'failures': self.failures,
+            'hedges': self.hedges,
+            'hedges_won': self.hedges_won,
+            **{
+                f'p{percent}_ms': round(latency * 1000, 1) if latency is not None else None
+                for percent, latency in ((p, self.percentile(p)) for p in (50, 95, 99))
+            },
+        }
+
+
+class TTSClient:
+    """
+    Asynchronous client for a pool of TTS servers.
+
+    Keeps keep-alive connections open to every backend and sends each request to
+    the available backend with the fewest requests in flight. Failed requests are
+    retried on another backend, and a request still running past the hedging
+    percentile of its backend's latency is duplicated to a second backend - the
+    first answer wins.
+    """
+
+    # Latency samples needed before a backend's percentile is trusted for hedging
+    HEDGE_MIN_SAMPLES = 20
+
+    def __init__(self, urls, timeout=30.0, retries=2, concurrency=4, deadline=60.0, hedge_percentile=0.0,
+                 health_interval=10.0, breaker_failures=3, breaker_cooldown=15.0):
+        """
+        Initialize the TTS client.
+
+        Args:
+            urls (str | list): TTS server endpoints, a list or comma separated,
+                e.g. http://localhost:5002/api/tts
+            timeout (float): Total timeout of a single request in seconds
+            retries (int): Number of retries after a failed request
+            concurrency (int): Maximum number of requests in flight per backend
+            deadline (float): Seconds until synthesis gives up, across all retries and hedges
+            hedge_percentile (float): Latency percentile after which a request is hedged, 0 disables hedging
+            health_interval (float): Seconds between health checks of idle or failing backends, 0 disables them
+            breaker_failures (int): Consecutive failures that take a backend out of rotation
+            breaker_cooldown (float): Seconds before a failing backend gets a trial request
+        """
+        if isinstance(urls, str):
+            urls = [url.strip() for url in urls.split(',') if url.strip()]
+        self.backends = [TTSBackend(url, breaker_failures, breaker_cooldown) for url in urls]
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.retries = retries
+        self.concurrency = concurrency
+        self.deadline = deadline
+        self.hedge_percentile = hedge_percentile
+        self.health_interval = health_interval
+        self.retry_delay = 0.5  # Initial delay in seconds
+        self.semaphore = asyncio.Semaphore(concurrency * len(self.backends))
+        self.session = None
+        self.health_task = None
+
+    def _get_session(self):
+        """
+        Get the HTTP session, creating it and starting health checks on first use.
+
+        The session has to be created inside a running event loop.
+
+        Returns:
+            aiohttp.ClientSession: Session with a keep-alive connection pool
+        """
+        if self.session is None or self.session.closed:
+            # Room for hedged requests on top of the regular ones
+            connector = aiohttp.TCPConnector(
+                limit=self.concurrency * len(self.backends) * 2,
+                limit_per_host=self.concurrency * 2,
+                keepalive_timeout=60,
+            )
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+
+        if self.health_interval and self.health_task is None:
+            self.health_task = asyncio.create_task(self._health_loop())
+        return self.session
+
+    def _pick(self, exclude=()):
+        """
+        Choose the available backend with the fewest requests in flight.
+
+        Args:
+            exclude (set): Backends not to choose, e.g. ones already tried
+
+        Returns:
+            TTSBackend: The backend, or None if none is available
+        """
+        candidates = [backend for backend in self.backends if backend not in exclude and backend.available()]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda backend: (backend.outstanding, backend.percentile(50) or 0.0))
+
+    async def _fetch(self, url, text):
+        """
+        Make a single request to a TTS server.
+
+        Args:
+            url (str): TTS server endpoint
+            text (str): Text to synthesize
+
+        Returns:
+            bytes: WAV audio returned by the server
+        """
+        session = self._get_session()
+        async with session.get(url, params={'text': text}) as response:
+            response.raise_for_status()
+            chunks = []
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                chunks.append(chunk)
+            audio = b''.join(chunks)
+
+        if not audio:
+            raise ValueError('Empty response from TTS server')
+        return audio
+
+    async def _request(self, backend, text):
+        """
+        Make a request to a backend, keeping its load and health up to date.
+
+        Args:
+            backend (TTSBackend): Backend to send the request to
+            text (str): Text to synthesize
+
+        Returns:
+            bytes: WAV audio returned by the server
+        """
+        trial = backend.state == TTSBackend.HALF_OPEN
+        if trial:
+            backend.trial_in_flight = True
+        backend.outstanding += 1
+        backend.requests += 1
+        start = time.monotonic()
+        try:
+            audio = await self._fetch(backend.url, text)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            backend.record_failure()
+            raise
+        finally:
+            backend.outstanding -= 1
+            if trial:
+                backend.trial_in_flight = False
+
+        backend.record_success(time.monotonic() - start)
+        return audio
+
+    def _hedge_delay(self, backend):
+        """
+        Get how long to wait for a backend before hedging a request.
+
+        Returns:
+            float: Seconds, or None if the request shouldn't be hedged
+        """
+        if not self.hedge_percentile or len(self.backends) < 2 or len(backend.latencies) < self.HEDGE_MIN_SAMPLES:
+            return None
+        return backend.percentile(self.hedge_percentile)
+
+    async def _attempt(self, text, tried):
+        """
+        Make one attempt at synthesis, hedged to a second backend if the first one is slow.
+
+        Args:
+            text (str): Text to synthesize
+            tried (set): Backends used by previous attempts, updated with the ones used now
+
+        Returns:
+            bytes: WAV audio
+        """
+        primary = self._pick(tried) or self._pick()
+        if primary is None:
+            raise NoBackendAvailable('All TTS backends are failing')
+        tried.add(primary)
+
+        tasks = {asyncio.create_task(self._request(primary, text)): primary}
+        try:
+            hedge_delay = self._hedge_delay(primary)
+            if hedge_delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+                secondary = None if done else self._pick(tried | {primary})
+                if secondary is not None:
+                    tried.add(secondary)
+                    secondary.hedges += 1
+                    tasks[asyncio.create_task(self._request(secondary, text))] = secondary
+
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if tasks[task] is not primary:
+                            tasks[task].hedges_won += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _synthesize(self, text):
+        tried = set()
+        for attempt in range(self.retries + 1):
+            try:
+                return await self._attempt(text, tried)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, NoBackendAvailable) as e:
+                if attempt < self.retries:
+                    delay = self.retry_delay * (2 ** attempt)
+                    logger.warning(f'TTS request failed: {e!r}. Retrying in {delay} seconds (attempt {attempt + 1}/{self.retries})...')
+                    await asyncio.sleep(delay)
+                else:
+                    logger.error(f'Error while making request to TTS server: {e!r}')
+        return None
+
+    async def synthesize(self, text):
+        """
+        Synthesize speech, retrying failed requests on other backends with exponential backoff.
+
+        Args:
+            text (str): Text to synthesize
+
+        Returns:
+            bytes: WAV audio, or None if all attempts failed or the deadline passed
+        """
+        async with self.semaphore:
+            try:
+                return await asyncio.wait_for(self._synthesize(text), self.deadline)
+            except asyncio.TimeoutError:
+                logger.error(f'TTS request missed its deadline of {self.deadline} seconds')
+                return None
+
+    async def _check(self, backend):
+        """
+        Send a health check request to a backend.
+        """
+        try:
+            await self._fetch(backend.url, 'ok.')
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.debug('TTS backend %s failed health check: %r', backend.url, e)
+            backend.record_failure(health_check=True)
+        else:
+            backend.record_success()
+
+    async def _health_loop(self):
+        """
+        Periodically check backends that had no successful request recently.
+
+        Catches dead backends before traffic does, and brings recovered ones
+        back into rotation without waiting for their breaker cooldown.
+        """
+        while True:
+            await asyncio.sleep(self.health_interval)
+            now = time.monotonic()
+            await asyncio.gather(*(
+                self._check(backend) for backend in self.backends
+                if backend.outstanding == 0 and now - backend.last_success >= self.health_interval
+            ))
+
+    def stats(self):
+        """
+        Get per-backend statistics.
+
+        Returns:
+            dict: Backend URL -> backend statistics
+        """
+        return {backend.url: backend.stats() for backend in self.backends}
+
+    async def close(self):
+        """
+        Stop health checks and close the HTTP session and its pooled connections.
+        """
+        if self.health_task:
+            self.health_task.cancel()
+            await asyncio.gather(self.health_task, return_exceptions=True)
+            self.health_task = None
+        if self.session and not self.session.closed:
+            await self.session.close()
+        self.session = None